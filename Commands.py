@@ -6,6 +6,7 @@ from Argumentor import *
 from grdUtil.StaticUtil import StaticUtil
 
 from enums.CommandHitValues import CommandHitValues
+from Settings import Settings
 
 class Commands():    
     searchQueryArgumentName = "SearchQuery"
@@ -20,6 +21,7 @@ class Commands():
     endIndexArgumentName = "EndIndex"
     streamNameRegexArgumentName = "StreamNameRegex"
     directoryNameArgumentName = "DirectoryName"
+    benchmarkCommandArgumentName = "BenchmarkCommand"
     
     includeSoftDeletedFlagName = "IncludeSoftDeleted"
     permanentlyDeleteFlagName = "PermanentlyDelete"
@@ -37,6 +39,8 @@ class Commands():
     repeatFlagName = "Repeat"
     enableFetchFlagName = "EnableFetch"
     backgroundContentFlagName = "BackgroundContent"
+    concurrentFetchFlagName = "ConcurrentFetch"
+    dryRunFlagName = "DryRun"
     
     def getArgumentor(self):
         searchQueryArgument = Argument(self.searchQueryArgumentName, ["search", "s"], str, 
@@ -44,8 +48,8 @@ class Commands():
             description= "Query to search playlists for.")
         playlistIdsArgument = Argument(self.playlistIdsArgumentName, ["playlistid", "playlistindex", "pi"], list[str], 
             optional= True,
-            defaultValue= [os.environ.get("DEFAULT_PLAYLIST_ID")],
-            useDefaultValue= len(os.environ.get("DEFAULT_PLAYLIST_ID")) > 0,
+            defaultValue= [Settings().defaultPlaylistId],
+            useDefaultValue= len(Settings().defaultPlaylistId) > 0,
             castFunc= castStringToList,
             description= "IDs or index (i + number) of Playlist, can be multiple separated by comma. If None or empty, default to settings.DEFAULT_PLAYLIST_ID.")
         streamSourceIdsArgument = Argument(self.streamSourceIdsArgumentName, ["streamsourceids", "ssi", "ids"], list[str],
@@ -99,6 +103,10 @@ class Commands():
             defaultValue= None, useDefaultValue= True,
             validateFunc= validateDirectory,
             description= "Path (absolute or relative) to directory to export to.")
+        benchmarkCommandArgument = Argument(self.benchmarkCommandArgumentName, ["command", "c"], str,
+            optional= True,
+            defaultValue= "lp", useDefaultValue= True,
+            description= "Command and arguments to time, separated by space, e.g. \"dp pi i1\".")
         
         includeSoftDeletedFlag = BoolFlag(self.includeSoftDeletedFlagName, ["softdeleted", "sd"],
             description= "Include soft deleted items.")
@@ -133,6 +141,10 @@ class Commands():
             description= "Enable fetching new QueueStream from this StreamSource.")
         backgroundContentFlag = BoolFlag(self.backgroundContentFlagName, ["backgroundcontent", "bgc", "bc"],
             description= "QueueStreams from this source is content you would play in the background (music, podcasts etc.).")
+        concurrentFetchFlag = BoolFlag(self.concurrentFetchFlagName, ["concurrent", "parallel", "cf"],
+            description= "Fetch from StreamSources in parallel, limited by FETCH_CONCURRENCY and FETCH_CONCURRENCY_PER_HOST in settings.")
+        dryRunFlag = BoolFlag(self.dryRunFlagName, ["dryrun", "dry"],
+            description= "Only print how many entities would be changed and how long finding them took, without changing anything.")
         
         # General
         helpCommand = Command("Help", ["help", "h", "man"], CommandHitValues.HELP,
@@ -173,15 +185,17 @@ class Commands():
             description= "Prints details about given playlist, with option for including fields of StreamSources and QueueStreams (like datetimes or IDs).")
         fetchPlaylistSourcesCommand = Command("FetchPlaylistSources", ["fetch", "f", "update", "u"], CommandHitValues.FETCH_PLAYLIST,
             arguments= [playlistIdsArgument, takeAfterArgument, takeBeforeArgument],
-            flags= [takeAllFlag],
+            flags= [takeAllFlag, concurrentFetchFlag],
             description= "Fetch new streams from StreamSources in Playlists indicated, e.g. if a Playlist has a YouTube channel as a source, and the channel uploads a new video, this video will be added to the Playlist.")
         prunePlaylistCommand = Command("PrunePlaylist", ["prune"], CommandHitValues.PRUNE_PLAYLIST,
             arguments= [playlistIdsArgument],
-            flags= [includeSoftDeletedFlag, permanentlyDeleteFlag],
+            flags= [includeSoftDeletedFlag, permanentlyDeleteFlag, dryRunFlag],
             description= "Prune Playlists indicated, deleting watched QueueStreams.")
         purgePlaylistCommand = Command("PurgePlaylist", ["purgeplaylists", "pp"], CommandHitValues.PURGE_PLAYLIST,
+            flags= [dryRunFlag],
             description= "Purge all Playlists, removing IDs with no corresponding relation and deleting StreamSources and QueueStreams with no linked IDs in Playlists.")
         purgeCommand = Command("Purge", ["purge"], CommandHitValues.PURGE,
+            flags= [dryRunFlag],
             description= "Purge ALL soft deleted entities.")
         resetPlaylistFetchCommand = Command("ResetPlaylistFetch", ["reset"], CommandHitValues.RESET_PLAYLIST_FETCH,
             arguments= [playlistIdsArgument],
@@ -193,11 +207,14 @@ class Commands():
         exportPlaylistCommand = Command("ExportPlaylist", ["export"], CommandHitValues.EXPORT_PLAYLIST,
             arguments= [playlistIdsArgument, directoryNameArgument],
             description= "Export all sources and streams in a list to a text files.")
-        # unwatchAllPlaylistCommand = Command("UnwatchAllPlaylist", ["unwatchall"], CommandHitValues.UNWATCH_ALL_PLAYLIST,
-        #     arguments= [playlistIdsArgument],
-        #     description= "Mark all streams in a playlist as unwatched.")
+        unwatchAllPlaylistCommand = Command("UnwatchAllPlaylist", ["unwatch", "unwatchall"], CommandHitValues.UNWATCH_ALL_PLAYLIST,
+            arguments= [playlistIdsArgument],
+            description= "Mark all QueueStreams in Playlists indicated as unwatched.")
+        watchAllPlaylistCommand = Command("WatchAllPlaylist", ["watchall", "markwatched"], CommandHitValues.WATCH_ALL_PLAYLIST,
+            arguments= [playlistIdsArgument],
+            description= "Mark all QueueStreams in Playlists indicated as watched.")
         
-        playlistCommands = [addPlaylistCommand, addPlaylistFromYouTubeCommand, deletePlaylistCommand, restorePlaylistCommand, listPlaylistCommands, detailsPlaylistCommand, fetchPlaylistSourcesCommand, prunePlaylistCommand, purgePlaylistCommand, purgeCommand, resetPlaylistFetchCommand, downloadPlaylistCommand, exportPlaylistCommand]
+        playlistCommands = [addPlaylistCommand, addPlaylistFromYouTubeCommand, deletePlaylistCommand, restorePlaylistCommand, listPlaylistCommands, detailsPlaylistCommand, fetchPlaylistSourcesCommand, prunePlaylistCommand, purgePlaylistCommand, purgeCommand, resetPlaylistFetchCommand, downloadPlaylistCommand, exportPlaylistCommand, unwatchAllPlaylistCommand, watchAllPlaylistCommand]
         
         # Playback
         playCommand = Command("Play", ["p"], CommandHitValues.PLAY,
@@ -251,8 +268,13 @@ class Commands():
             description= "Lists all soft deleted entities. Option for simplified, less verbose list.")
         refactorCommand = Command("Refactor", ["refactor"], CommandHitValues.REFACTOR_OLD,
             description= "Refactor old code/data (JSON-file storage only).")
+        importSqliteCommand = Command("ImportSqlite", ["importsqlite"], CommandHitValues.IMPORT_SQLITE,
+            description= "Import all Playlists, QueueStreams, and StreamSources from JSON-files to the SQLite database, replacing entities with the same ID.")
+        importTimeCommand = Command("ImportTime", ["importtime", "it"], CommandHitValues.IMPORT_TIME,
+            arguments= [benchmarkCommandArgument],
+            description= "Time startup of a command, default listing Playlists, and print the slowest imports and any heavy dependencies imported.")
                               
-        metaCommands = [listSettingsCommand, listSoftDeletedCommand, refactorCommand]
+        metaCommands = [listSettingsCommand, listSoftDeletedCommand, refactorCommand, importSqliteCommand, importTimeCommand]
         
         return Argumentor(generalCommands + playlistCommands + playbackCommands + streamCommands + sourceCommands + metaCommands) 
     
@@ -278,7 +300,8 @@ class Commands():
         self.resetPlaylistFetchCommands = ["reset"]
         self.downloadPlaylistCommands = ["downloadplaylist", "dwpl"]
         self.exportPlaylistCommands = ["export"]
-        self.unwatchAllPlaylistCommands = ["unwatchall"]
+        self.unwatchAllPlaylistCommands = ["unwatch", "unwatchall"]
+        self.watchAllPlaylistCommands = ["watchall", "markwatched"]
         
         # Playback
         self.playCommands = ["play", "p"]
@@ -308,6 +331,8 @@ class Commands():
         self.listSettingsCommands = ["settings", "secrets"]
         self.listSoftDeletedCommands = ["listsoftdeleted", "listdeleted", "lsd", "ld"]
         self.refactorCommands = ["refactor"]
+        self.importSqliteCommands = ["importsqlite"]
+        self.importTimeCommands = ["importtime", "it"]
         
     def getHelpString(self) -> str:
         """
@@ -368,15 +393,16 @@ class Commands():
         result += "\n" + str(self.restoreSourceCommands) + " [playlistIds or index: str]: restore soft deleted Playlist from database."
         result += "\n" + str(self.listPlaylistCommands) + " [? includeSoftDeleted: bool]: List Playlists with indices that can be used instead of IDs in other commands."
         result += "\n" + str(self.detailsPlaylistCommands) + " [playlistIds or indices: list] [? includeUri: bool] [? includeId: bool] [? includeDaterTime: bool] [? includeListCount: bool] [? includeSource: bool]: Prints details about given playlist, with option for including fields of StreamSources and QueueStreams (like datetimes or IDs)."
-        result += "\n" + str(self.fetchPlaylistSourcesCommands) + " [playlistIds or indices: list] [? takeAfter: datetime] [? takeBefore: datetime] [? takeNewOnly: bool]: Fetch new streams from StreamSources in Playlists indicated, e.g. if a Playlist has a YouTube channel as a source, and the channel uploads a new video, this video will be added to the Playlist. Optional arguments takeAfter: only fetch QueueStreams after this date, takeBefore: only fetch QueueStreams before this date. Dates formatted like \"2022-01-30\" (YYYY-MM-DD)."
-        result += "\n" + str(self.prunePlaylistCommands) + " [playlistIds or indices: list] [? includeSoftDeleted: bool] [? permanentlyDelete: bool]: Prune Playlists indicated, deleting watched QueueStreams."
-        result += "\n" + str(self.purgePlaylistCommands) + ": Purge all Playlists, removing IDs with no corresponding relation and deleting StreamSources and QueueStreams with no linked IDs in Playlists."
-        result += "\n" + str(self.purgeCommands) + ": Purge all soft deleted entities."
+        result += "\n" + str(self.fetchPlaylistSourcesCommands) + " [playlistIds or indices: list] [? takeAfter: datetime] [? takeBefore: datetime] [? takeNewOnly: bool] [? concurrent: bool]: Fetch new streams from StreamSources in Playlists indicated, e.g. if a Playlist has a YouTube channel as a source, and the channel uploads a new video, this video will be added to the Playlist. Optional arguments takeAfter: only fetch QueueStreams after this date, takeBefore: only fetch QueueStreams before this date, concurrent: fetch from StreamSources in parallel. Dates formatted like \"2022-01-30\" (YYYY-MM-DD)."
+        result += "\n" + str(self.prunePlaylistCommands) + " [playlistIds or indices: list] [? includeSoftDeleted: bool] [? permanentlyDelete: bool] [? dryRun: bool]: Prune Playlists indicated, deleting watched QueueStreams. With dryRun, only print counts and timing."
+        result += "\n" + str(self.purgePlaylistCommands) + " [? dryRun: bool]: Purge all Playlists, removing IDs with no corresponding relation and deleting StreamSources and QueueStreams with no linked IDs in Playlists. With dryRun, only print counts and timing."
+        result += "\n" + str(self.purgeCommands) + " [? dryRun: bool]: Purge all soft deleted entities. With dryRun, only print counts and timing."
         result += "\n" + str(self.resetPlaylistFetchCommands) + " [playlistIds or indices: list]: Resets fetch status of StreamSources in a Playlist and deletes QueueStreams from Playlist."
         result += "\n" + str(self.playCommands) + " [playlistId or index: str] [? startIndex: int] [? shuffle: bool] [? repeat: bool]: Start playing stream from a Playlist, order and automation (like skipping already watched QueueStreams) depending on the input and Playlist."
         result += "\n" + str(self.downloadPlaylistCommands) + " [playlistId or index: str] [? directoryName: str] [? startIndex: int] [? endIndex: int] [? streamNameRegex: str] [? useIndex: bool]: Download streams from web sources for given playlist, with optional directory name (under localStoragePath in settings), start-end index, regex for naming streams (e.g. all streams are named \"Podcast guys: Actual Title\", use regex \": (.*)\", including \"s), and option to add index (+1) on stream names so they naturally sort in order."
         result += "\n" + str(self.exportPlaylistCommands) + " [playlistId or index: str] [? directoryName: str]: Export all sources and streams in a list to a text files."
-        # result += "\n" + str(self.unwatchAllPlaylistCommands) + " [playlistId or index: str]: Mark all streams in a playlist as unwatched."
+        result += "\n" + str(self.unwatchAllPlaylistCommands) + " [playlistIds or indices: list]: Mark all QueueStreams in Playlists indicated as unwatched."
+        result += "\n" + str(self.watchAllPlaylistCommands) + " [playlistIds or indices: list]: Mark all QueueStreams in Playlists indicated as watched."
         result += self.getPlaylistArgumentsHelpString()
         
         return result
@@ -448,6 +474,8 @@ class Commands():
         result += "\n" + str(self.listSettingsCommands) + ": Lists settings currently used by program. These settings can also be found in the file named \".env\" with examples in the file \".env-example\"."
         result += "\n" + str(self.listSoftDeletedCommands) + " [? simplified: bool]: Lists all soft deleted entities. Option for simplified, less verbose list."
         result += "\n" + str(self.refactorCommands) + ": Refactor old code/data (JSON-file storage only)."
+        result += "\n" + str(self.importSqliteCommands) + ": Import all Playlists, QueueStreams, and StreamSources from JSON-files to the SQLite database, replacing entities with the same ID."
+        result += "\n" + str(self.importTimeCommands) + " [? command: str]: Time startup of a command, default listing Playlists, and print the slowest imports and any heavy dependencies imported."
 
         return result
     
@@ -455,7 +483,7 @@ def castStringToList(value: str, separator: str = ",") -> list[str]:
     return value.split(separator) if separator in value else [value]
 
 def castDatetime(value: str) -> datetime:
-    return datetime.strptime(value, os.environ.get("INPUT_DATETIME_FORMAT"))
+    return datetime.strptime(value, Settings().inputDatetimeFormat)
 
 def castIndex(value: str) -> int:
     intValue = int(value)
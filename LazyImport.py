@@ -0,0 +1,61 @@
+import importlib
+import threading
+from types import ModuleType
+
+
+class LazyModule():
+    """
+    Module imported the first time one of its attributes is used, so programs not using it do not pay for importing it.
+    """
+
+    def __init__(self, name: str):
+        self.__dict__["_name"] = name
+        self.__dict__["_module"] = None
+
+    def load(self) -> ModuleType:
+        """
+        Import module, if not already imported.
+
+        Returns:
+            ModuleType: Module.
+        """
+
+        if(self.__dict__["_module"] == None):
+            self.__dict__["_module"] = importlib.import_module(self.__dict__["_name"])
+
+        return self.__dict__["_module"]
+
+    def __getattr__(self, name: str):
+        return getattr(self.load(), name)
+
+    def __setattr__(self, name: str, value: object) -> None:
+        setattr(self.load(), name, value)
+
+
+class LazyService():
+    """
+    Class attribute holding an instance of a service or controller, imported and created the first time the attribute is used.
+    The instance replaces the attribute on the class, so later uses cost the same as a plain class attribute.
+    """
+
+    lock: threading.RLock = threading.RLock()
+
+    def __init__(self, moduleName: str, className: str = None):
+        self.moduleName = moduleName
+        self.className = className if(className != None) else moduleName.split(".")[-1]
+        self.name = None
+
+    def __set_name__(self, owner: type, name: str) -> None:
+        self.name = name
+
+    def __get__(self, instance: object, owner: type) -> object:
+        with LazyService.lock:
+            definingClass = next((_ for _ in owner.__mro__ if _.__dict__.get(self.name) is self), None)
+            if(definingClass == None):
+                # Created by another thread while waiting
+                return getattr(owner, self.name)
+
+            serviceClass = getattr(importlib.import_module(self.moduleName), self.className)
+            value = serviceClass()
+            setattr(definingClass, self.name, value)
+            return value
@@ -1,5 +1,6 @@
 import os
 import sys
+from typing import TYPE_CHECKING
 
 from grdUtil.BashColor import BashColor
 from grdUtil.FileUtil import makeFiles
@@ -8,31 +9,35 @@ from Argumentor import *
 from enums.CommandHitValues import CommandHitValues
 
 from Commands import Commands
-from controllers.PlaylistCliController import PlaylistCliController
-from controllers.QueueStreamCliController import QueueStreamCliController
-from controllers.SharedCliController import SharedCliController
-from controllers.StreamSourceCliController import StreamSourceCliController
-from services.DownloadService import DownloadService
-from services.FetchService import FetchService
-from services.LegacyService import LegacyService
-from services.PlaylistService import PlaylistService
-from services.SharedService import SharedService
-from services.StreamSourceService import StreamSourceService
+from LazyImport import LazyService
 from Settings import Settings
 
+if(TYPE_CHECKING):
+    from controllers.PlaylistCliController import PlaylistCliController
+    from controllers.QueueStreamCliController import QueueStreamCliController
+    from controllers.SharedCliController import SharedCliController
+    from controllers.StreamSourceCliController import StreamSourceCliController
+    from services.DownloadService import DownloadService
+    from services.FetchService import FetchService
+    from services.LegacyService import LegacyService
+    from services.PlaylistService import PlaylistService
+    from services.SharedService import SharedService
+    from services.StreamSourceService import StreamSourceService
+
 class Main:
+    # Services and controllers are imported and created when a command first uses them, so commands only pay for what they use
     commands: Commands = Commands()
     settings: Settings = Settings()
-    downloadService: DownloadService = DownloadService()
-    fetchService: FetchService = FetchService()
-    legacyService: LegacyService = LegacyService()
-    playlistService: PlaylistService = PlaylistService()
-    sharedService: SharedService = SharedService()
-    streamSourceService: StreamSourceService = StreamSourceService()
-    sharedCliController: SharedCliController = SharedCliController()
-    playlistCliController: PlaylistCliController = PlaylistCliController()
-    queueStreamCliController: QueueStreamCliController = QueueStreamCliController()
-    streamSourceCliController: StreamSourceCliController = StreamSourceCliController()
+    downloadService: "DownloadService" = LazyService("services.DownloadService")
+    fetchService: "FetchService" = LazyService("services.FetchService")
+    legacyService: "LegacyService" = LazyService("services.LegacyService")
+    playlistService: "PlaylistService" = LazyService("services.PlaylistService")
+    sharedService: "SharedService" = LazyService("services.SharedService")
+    streamSourceService: "StreamSourceService" = LazyService("services.StreamSourceService")
+    sharedCliController: "SharedCliController" = LazyService("controllers.SharedCliController")
+    playlistCliController: "PlaylistCliController" = LazyService("controllers.PlaylistCliController")
+    queueStreamCliController: "QueueStreamCliController" = LazyService("controllers.QueueStreamCliController")
+    streamSourceCliController: "StreamSourceCliController" = LazyService("controllers.StreamSourceCliController")
 
     def main():
         makeFiles(Main.settings.watchedLogFilepath)
@@ -136,22 +141,28 @@ class Main:
                     takeAfter = result.arguments[Main.commands.takeAfterArgumentName]
                     takeBefore = result.arguments[Main.commands.takeBeforeArgumentName]
                     takeNewOnly = result.arguments[Main.commands.takeAllFlagName]
+                    concurrent = result.arguments[Main.commands.concurrentFetchFlagName]
                     
-                    Main.playlistCliController.fetchPlaylists(playlistIds, Main.settings.fetchLimitSingleSource, takeAfter, takeBefore, takeNewOnly)
+                    Main.playlistCliController.fetchPlaylists(playlistIds, Main.settings.fetchLimitSingleSource, takeAfter, takeBefore, takeNewOnly, concurrent)
                     
                 elif(result.commandHitValue == CommandHitValues.PRUNE_PLAYLIST):
                     playlistIds = result.arguments[Main.commands.playlistIdsArgumentName]
                     includeSoftDeleted = result.arguments[Main.commands.includeSoftDeletedFlagName]
                     permanentlyDelete = result.arguments[Main.commands.permanentlyDeleteFlagName]
+                    dryRun = result.arguments[Main.commands.dryRunFlagName]
                     
                     for id in playlistIds:
-                        Main.sharedCliController.prune(id, includeSoftDeleted, permanentlyDelete)
+                        Main.sharedCliController.prune(id, includeSoftDeleted, permanentlyDelete, dryRun)
                 
                 elif(result.commandHitValue == CommandHitValues.PURGE_PLAYLIST):
-                    Main.sharedCliController.purgePlaylists(True, True)
+                    dryRun = result.arguments[Main.commands.dryRunFlagName]
+                    
+                    Main.sharedCliController.purgePlaylists(True, True, dryRun)
 
                 elif(result.commandHitValue == CommandHitValues.PURGE):
-                    Main.sharedCliController.purge()
+                    dryRun = result.arguments[Main.commands.dryRunFlagName]
+                    
+                    Main.sharedCliController.purge(dryRun)
 
                 elif(result.commandHitValue == CommandHitValues.RESET_PLAYLIST_FETCH):
                     playlistIds = result.arguments[Main.commands.playlistIdsArgumentName]
@@ -177,7 +188,14 @@ class Main:
                 elif(result.commandHitValue == CommandHitValues.UNWATCH_ALL_PLAYLIST):
                     playlistIds = result.arguments[Main.commands.playlistIdsArgumentName]
                     
-                    Main.playlistCliController.unwatchAllInPlaylist(playlistIds[0])
+                    for id in playlistIds:
+                        Main.playlistCliController.setWatchedInPlaylist(id, False)
+
+                elif(result.commandHitValue == CommandHitValues.WATCH_ALL_PLAYLIST):
+                    playlistIds = result.arguments[Main.commands.playlistIdsArgumentName]
+                    
+                    for id in playlistIds:
+                        Main.playlistCliController.setWatchedInPlaylist(id, True)
 
                 # Playback
                 elif(result.commandHitValue == CommandHitValues.PLAY):
@@ -270,8 +288,24 @@ class Main:
                     else:
                         printS("No refactors needed for refactorLastFetchedId.", color = BashColor.OKGREEN)
 
+                elif(result.commandHitValue == CommandHitValues.IMPORT_SQLITE):
+                    nPlaylists = Main.playlistService.importToSqlite()
+                    nQueueStreams = Main.playlistService.queueStreamService.importToSqlite()
+                    nStreamSources = Main.streamSourceService.importToSqlite()
+                    printS("Imported ", nPlaylists, " Playlists, ", nQueueStreams, " QueueStreams, and ", nStreamSources, " StreamSources to ", Main.settings.sqlitePath, ".", color = BashColor.OKGREEN)
+                    if(Main.settings.storageBackend != "sqlite"):
+                        printS("Set STORAGE_BACKEND to \"sqlite\" in .env to use the database.", color = BashColor.WARNING)
+
+                elif(result.commandHitValue == CommandHitValues.IMPORT_TIME):
+                    command = result.arguments[Main.commands.benchmarkCommandArgumentName]
+                    
+                    Main.sharedCliController.printImportTime(command)
+
         except KeyboardInterrupt:
             printS("Program was aborted by user.", color = BashColor.OKGREEN)
+        
+        if(Main.settings.debug):
+            Main.playlistService.printCacheStats()
 
 if __name__ == "__main__":
     Main.main()
@@ -1,15 +1,27 @@
 import os
 import shutil
+import threading
+import time
+from typing import Dict, List
 
 from dotenv import load_dotenv
+from grdException.ArgumentException import ArgumentException
+from grdUtil.BashColor import BashColor
 from grdUtil.PrintUtil import asTable, printS
 
-load_dotenv()
 
+# Parsed and validated once per process, every Settings() is the same read-only instance, reloaded in place when .env changes.
+# Settings used when services are created (e.g. storage path, cache size, number of workers) need a restart to change.
 class Settings():
+    instance: "Settings" = None
+    lock: threading.RLock = threading.RLock()
+    watchThread: threading.Thread = None
+    envFilePath: str = ".env"
+    envFilePathExample: str = ".env-example"
+    envModified: int = None
     debug: bool = None
     localStoragePath: str = None
-    logWatched: str = None
+    logWatched: bool = None
     downloadWebStreams: bool = None
     removeWatchedOnFetch: bool = None
     playedAlwaysWatched: bool = None
@@ -19,26 +31,171 @@ class Settings():
     fetchLimitSingleSource: int = None
     inputDatetimeFormat: str = None
     defaultPlaylistId: str = None
+    entityCacheSize: int = None
+    storageBackend: str = None
+    sqlitePath: str = None
+    journalUpdates: bool = None
+    journalCompactSeconds: int = None
+    fetchConcurrency: int = None
+    fetchConcurrencyPerHost: int = None
+    httpCacheTtlSeconds: int = None
+    httpTimeoutSeconds: int = None
+    httpRetries: int = None
+    httpBackoffSeconds: float = None
+    httpConnectionsPerHost: int = None
+    downloadWorkers: int = None
+    downloadConcurrencyPerHost: int = None
+    downloadBandwidthLimitKbps: int = None
+    fetchSchedulerEnabled: bool = None
+    fetchMinIntervalMinutes: int = None
+    fetchMaxIntervalMinutes: int = None
+    fetchSchedulerBatchSize: int = None
+    fetchSchedulerBatchSpacingSeconds: int = None
+    taskWorkers: int = None
+    playlistPageSize: int = None
     
-    def __init__(self):
-        envFilePath = ".env"
-        envFilePathExample = ".env-example"
-        if(not os.path.exists(envFilePath) and os.path.exists(envFilePathExample)):
-            shutil.copy2(envFilePathExample, envFilePath)
-            printS("Created a setting file, ", envFilePath, ", you may want to update some of the settings for security purposes according to the installation guide in README.md.\n\n", color = BashColor.OKGREEN)
-
-        self.debug = eval(os.environ.get("DEBUG"))
-        self.localStoragePath = os.environ.get("LOCAL_STORAGE_PATH")
-        self.logWatched = eval(os.environ.get("LOG_WATCHED"))
-        self.downloadWebStreams = eval(os.environ.get("DOWNLOAD_WEB_STREAMS"))
-        self.removeWatchedOnFetch = eval(os.environ.get("REMOVE_WATCHED_ON_FETCH"))
-        self.playedAlwaysWatched = eval(os.environ.get("PLAYED_ALWAYS_WATCHED"))
-        self.watchedLogFilepath = os.environ.get("WATCHED_LOG_FILEPATH")
-        self.logDirPath = os.environ.get("LOG_DIR_PATH")
-        self.browserName = os.environ.get("BROWSE_NAME")
-        self.fetchLimitSingleSource =  int(os.environ.get("FETCH_LIMIT_SINGLE_SOURCE"))
-        self.inputDatetimeFormat =  os.environ.get("INPUT_DATETIME_FORMAT")
-        self.defaultPlaylistId =  os.environ.get("DEFAULT_PLAYLIST_ID")
+    def __new__(cls):
+        with Settings.lock:
+            if(Settings.instance == None):
+                instance = super().__new__(cls)
+                instance.load()
+                Settings.instance = instance
+
+        return Settings.instance
+
+    def __setattr__(self, name: str, value: object) -> None:
+        raise AttributeError(f"Settings are read-only, change {name} in {self.envFilePath}.")
+
+    def load(self) -> None:
+        """
+        Read .env, creating it from .env-example if missing, and replace all settings at once if they are valid.
+
+        Raises:
+            ArgumentException: A setting is missing or not valid, current settings are kept.
+        """
+
+        with Settings.lock:
+            if(not os.path.exists(self.envFilePath) and os.path.exists(self.envFilePathExample)):
+                shutil.copy2(self.envFilePathExample, self.envFilePath)
+                printS("Created a setting file, ", self.envFilePath, ", you may want to update some of the settings for security purposes according to the installation guide in README.md.\n\n", color = BashColor.OKGREEN)
+
+            envModified = self.getEnvModified()
+            # Variables set outside .env take precedence, except when reloading a changed .env
+            load_dotenv(self.envFilePath, override = Settings.instance != None)
+            values = self.parse(os.environ)
+            values["envModified"] = envModified
+            self.__dict__.update(values)
+
+    def parse(self, environ: Dict[str, str]) -> Dict[str, object]:
+        """
+        Parse and validate settings.
+
+        Args:
+            environ (Dict[str, str]): Environment variables.
+
+        Returns:
+            Dict[str, object]: Settings by attribute name.
+
+        Raises:
+            ArgumentException: A setting is missing or not valid, with all errors found.
+        """
+
+        env = EnvParser(environ)
+        values = {}
+        values["debug"] = env.getBool("DEBUG")
+        values["localStoragePath"] = env.getPath("LOCAL_STORAGE_PATH", required = True)
+        values["logWatched"] = env.getBool("LOG_WATCHED")
+        values["downloadWebStreams"] = env.getBool("DOWNLOAD_WEB_STREAMS")
+        values["removeWatchedOnFetch"] = env.getBool("REMOVE_WATCHED_ON_FETCH")
+        values["playedAlwaysWatched"] = env.getBool("PLAYED_ALWAYS_WATCHED")
+        values["watchedLogFilepath"] = env.getPath("WATCHED_LOG_FILEPATH", required = True)
+        values["logDirPath"] = env.getPath("LOG_DIR_PATH", required = True)
+        values["browserName"] = env.getString("BROWSE_NAME", "")
+        values["fetchLimitSingleSource"] = env.getInt("FETCH_LIMIT_SINGLE_SOURCE", minimum = 1)
+        values["inputDatetimeFormat"] = env.getString("INPUT_DATETIME_FORMAT", "%Y-%m-%dT%H:%M:%S")
+        values["defaultPlaylistId"] = env.getString("DEFAULT_PLAYLIST_ID", "")
+        values["entityCacheSize"] = env.getInt("ENTITY_CACHE_SIZE", 10000)
+        values["storageBackend"] = env.getChoice("STORAGE_BACKEND", ["json", "sqlite"], "json")
+        values["sqlitePath"] = env.getPath("SQLITE_PATH") or os.path.join(values["localStoragePath"] or "", "playlists.db")
+        values["journalUpdates"] = env.getBool("JOURNAL_UPDATES", False)
+        values["journalCompactSeconds"] = env.getInt("JOURNAL_COMPACT_SECONDS", 30)
+        values["fetchConcurrency"] = env.getInt("FETCH_CONCURRENCY", 8, minimum = 1)
+        values["fetchConcurrencyPerHost"] = env.getInt("FETCH_CONCURRENCY_PER_HOST", 2, minimum = 1)
+        values["httpCacheTtlSeconds"] = env.getInt("HTTP_CACHE_TTL_SECONDS", 900, minimum = -1)
+        values["httpTimeoutSeconds"] = env.getInt("HTTP_TIMEOUT_SECONDS", 30, minimum = 1)
+        values["httpRetries"] = env.getInt("HTTP_RETRIES", 3)
+        values["httpBackoffSeconds"] = env.getFloat("HTTP_BACKOFF_SECONDS", 0.5)
+        values["httpConnectionsPerHost"] = env.getInt("HTTP_CONNECTIONS_PER_HOST", 4, minimum = 1)
+        values["downloadWorkers"] = env.getInt("DOWNLOAD_WORKERS", 3, minimum = 1)
+        values["downloadConcurrencyPerHost"] = env.getInt("DOWNLOAD_CONCURRENCY_PER_HOST", 2, minimum = 1)
+        values["downloadBandwidthLimitKbps"] = env.getInt("DOWNLOAD_BANDWIDTH_LIMIT_KBPS", 0)
+        values["fetchSchedulerEnabled"] = env.getBool("FETCH_SCHEDULER_ENABLED", False)
+        values["fetchMinIntervalMinutes"] = env.getInt("FETCH_MIN_INTERVAL_MINUTES", 30, minimum = 1)
+        values["fetchMaxIntervalMinutes"] = env.getInt("FETCH_MAX_INTERVAL_MINUTES", 1440, minimum = 1)
+        values["fetchSchedulerBatchSize"] = env.getInt("FETCH_SCHEDULER_BATCH_SIZE", 10, minimum = 1)
+        values["fetchSchedulerBatchSpacingSeconds"] = env.getInt("FETCH_SCHEDULER_BATCH_SPACING_SECONDS", 60)
+        values["taskWorkers"] = env.getInt("TASK_WORKERS", 2, minimum = 1)
+        values["playlistPageSize"] = env.getInt("PLAYLIST_PAGE_SIZE", 50, minimum = 1)
+
+        if(values["fetchMaxIntervalMinutes"] < values["fetchMinIntervalMinutes"]):
+            env.errors.append("FETCH_MAX_INTERVAL_MINUTES must not be less than FETCH_MIN_INTERVAL_MINUTES.")
+        if(len(env.errors) > 0):
+            raise ArgumentException(f"Settings in {self.envFilePath} are not valid:\n" + "\n".join(env.errors))
+
+        return values
+
+    def getEnvModified(self) -> int:
+        try:
+            return os.stat(self.envFilePath).st_mtime_ns
+        except OSError:
+            return None
+
+    def reloadIfChanged(self) -> bool:
+        """
+        Reload settings if .env was modified since last loaded. Services share this instance, so they read the new settings without being created again.
+
+        Returns:
+            bool: True if reloaded, False if .env was not changed or the new settings are not valid, keeping the current settings.
+        """
+
+        with Settings.lock:
+            envModified = self.getEnvModified()
+            if(envModified == self.envModified):
+                return False
+
+            try:
+                self.load()
+            except ArgumentException as e:
+                # Not tried again until .env is changed again
+                self.__dict__["envModified"] = envModified
+                printS("Settings were not reloaded, keeping current settings. ", e, color = BashColor.ERROR)
+                return False
+
+        printS("Settings reloaded from ", self.envFilePath, ".", color = BashColor.OKGREEN)
+        return True
+
+    def watch(self, intervalSeconds: float = 2) -> None:
+        """
+        Reload settings in the background when .env changes, if not already watching.
+
+        Args:
+            intervalSeconds (float, optional): Seconds between checks of .env. Defaults to 2.
+        """
+
+        def run():
+            while(True):
+                time.sleep(intervalSeconds)
+                try:
+                    self.reloadIfChanged()
+                except Exception as e:
+                    printS("Failed to reload settings: ", e, color = BashColor.ERROR)
+
+        with Settings.lock:
+            if(Settings.watchThread != None and Settings.watchThread.is_alive()):
+                return
+
+            Settings.watchThread = threading.Thread(target = run, daemon = True)
+            Settings.watchThread.start()
     
     def getAllSettingsAsString(self) -> str:
         """
@@ -59,7 +216,29 @@ class Settings():
                "\n", "BROWSE_NAME: ", self.browserName,
                "\n", "FETCH_LIMIT_SINGLE_SOURCE: ", self.fetchLimitSingleSource,
                "\n", "INPUT_DATETIME_FORMAT: ", self.inputDatetimeFormat,
-               "\n", "DEFAULT_PLAYLIST_ID: ", self.defaultPlaylistId)
+               "\n", "DEFAULT_PLAYLIST_ID: ", self.defaultPlaylistId,
+               "\n", "ENTITY_CACHE_SIZE: ", self.entityCacheSize,
+               "\n", "STORAGE_BACKEND: ", self.storageBackend,
+               "\n", "SQLITE_PATH: ", self.sqlitePath,
+               "\n", "JOURNAL_UPDATES: ", self.journalUpdates,
+               "\n", "JOURNAL_COMPACT_SECONDS: ", self.journalCompactSeconds,
+               "\n", "FETCH_CONCURRENCY: ", self.fetchConcurrency,
+               "\n", "FETCH_CONCURRENCY_PER_HOST: ", self.fetchConcurrencyPerHost,
+               "\n", "HTTP_CACHE_TTL_SECONDS: ", self.httpCacheTtlSeconds,
+               "\n", "HTTP_TIMEOUT_SECONDS: ", self.httpTimeoutSeconds,
+               "\n", "HTTP_RETRIES: ", self.httpRetries,
+               "\n", "HTTP_BACKOFF_SECONDS: ", self.httpBackoffSeconds,
+               "\n", "HTTP_CONNECTIONS_PER_HOST: ", self.httpConnectionsPerHost,
+               "\n", "DOWNLOAD_WORKERS: ", self.downloadWorkers,
+               "\n", "DOWNLOAD_CONCURRENCY_PER_HOST: ", self.downloadConcurrencyPerHost,
+               "\n", "DOWNLOAD_BANDWIDTH_LIMIT_KBPS: ", self.downloadBandwidthLimitKbps,
+               "\n", "FETCH_SCHEDULER_ENABLED: ", self.fetchSchedulerEnabled,
+               "\n", "FETCH_MIN_INTERVAL_MINUTES: ", self.fetchMinIntervalMinutes,
+               "\n", "FETCH_MAX_INTERVAL_MINUTES: ", self.fetchMaxIntervalMinutes,
+               "\n", "FETCH_SCHEDULER_BATCH_SIZE: ", self.fetchSchedulerBatchSize,
+               "\n", "FETCH_SCHEDULER_BATCH_SPACING_SECONDS: ", self.fetchSchedulerBatchSpacingSeconds,
+               "\n", "TASK_WORKERS: ", self.taskWorkers,
+               "\n", "PLAYLIST_PAGE_SIZE: ", self.playlistPageSize)
         
     def getAllSettingsAsTable(self) -> str:
         """
@@ -80,7 +259,29 @@ class Settings():
             "BROWSE_NAME", 
             "FETCH_LIMIT_SINGLE_SOURCE", 
             "INPUT_DATETIME_FORMAT", 
-            "DEFAULT_PLAYLIST_ID"]
+            "DEFAULT_PLAYLIST_ID",
+            "ENTITY_CACHE_SIZE",
+            "STORAGE_BACKEND",
+            "SQLITE_PATH",
+            "JOURNAL_UPDATES",
+            "JOURNAL_COMPACT_SECONDS",
+            "FETCH_CONCURRENCY",
+            "FETCH_CONCURRENCY_PER_HOST",
+            "HTTP_CACHE_TTL_SECONDS",
+            "HTTP_TIMEOUT_SECONDS",
+            "HTTP_RETRIES",
+            "HTTP_BACKOFF_SECONDS",
+            "HTTP_CONNECTIONS_PER_HOST",
+            "DOWNLOAD_WORKERS",
+            "DOWNLOAD_CONCURRENCY_PER_HOST",
+            "DOWNLOAD_BANDWIDTH_LIMIT_KBPS",
+            "FETCH_SCHEDULER_ENABLED",
+            "FETCH_MIN_INTERVAL_MINUTES",
+            "FETCH_MAX_INTERVAL_MINUTES",
+            "FETCH_SCHEDULER_BATCH_SIZE",
+            "FETCH_SCHEDULER_BATCH_SPACING_SECONDS",
+            "TASK_WORKERS",
+            "PLAYLIST_PAGE_SIZE"]
         settings = [self.debug,
             self.localStoragePath,
             self.logWatched,
@@ -92,7 +293,29 @@ class Settings():
             self.browserName,
             self.fetchLimitSingleSource,
             self.inputDatetimeFormat,
-            self.defaultPlaylistId]
+            self.defaultPlaylistId,
+            self.entityCacheSize,
+            self.storageBackend,
+            self.sqlitePath,
+            self.journalUpdates,
+            self.journalCompactSeconds,
+            self.fetchConcurrency,
+            self.fetchConcurrencyPerHost,
+            self.httpCacheTtlSeconds,
+            self.httpTimeoutSeconds,
+            self.httpRetries,
+            self.httpBackoffSeconds,
+            self.httpConnectionsPerHost,
+            self.downloadWorkers,
+            self.downloadConcurrencyPerHost,
+            self.downloadBandwidthLimitKbps,
+            self.fetchSchedulerEnabled,
+            self.fetchMinIntervalMinutes,
+            self.fetchMaxIntervalMinutes,
+            self.fetchSchedulerBatchSize,
+            self.fetchSchedulerBatchSpacingSeconds,
+            self.taskWorkers,
+            self.playlistPageSize]
         settingsStrings = [str(s) for s in settings]
         
         overlyComplicatedSettingsListList = []
@@ -104,3 +327,73 @@ class Settings():
         # I blame asTable, needs fix for labels, but this could probably have been a list with a template for name and value like 
         # "| {name}{namePadding} - {setting}{settingPadding} |" or something equally dumb since there's no current column option for asTable, only rows
         return asTable(overlyComplicatedSettingsListList, overlyComplicatedSettingsLabels)
+
+# Errors are collected so all invalid settings are reported at once
+class EnvParser():
+    trueValues: List[str] = ["true", "1", "yes", "on"]
+    falseValues: List[str] = ["false", "0", "no", "off"]
+
+    def __init__(self, environ: Dict[str, str]):
+        self.environ = environ
+        self.errors: List[str] = []
+
+    def getString(self, name: str, default: str = None, required: bool = False) -> str:
+        value = self.environ.get(name)
+        if(value == None or value.strip() == ""):
+            if(required):
+                self.errors.append(f"{name} is required.")
+            return default
+
+        return value
+
+    def getBool(self, name: str, default: bool = False) -> bool:
+        value = self.getString(name)
+        if(value == None):
+            return default
+        if(value.strip().lower() in self.trueValues):
+            return True
+        if(value.strip().lower() in self.falseValues):
+            return False
+
+        self.errors.append(f"{name} must be True or False, was \"{value}\".")
+        return default
+
+    def getInt(self, name: str, default: int = None, minimum: int = 0) -> int:
+        return self.getNumber(name, int, default, minimum)
+
+    def getFloat(self, name: str, default: float = None, minimum: float = 0) -> float:
+        return self.getNumber(name, float, default, minimum)
+
+    def getNumber(self, name: str, numberType: type, default: object, minimum: object) -> object:
+        value = self.getString(name, required = default == None)
+        if(value == None):
+            return default
+
+        try:
+            number = numberType(value.strip())
+        except ValueError:
+            self.errors.append(f"{name} must be {'a whole number' if(numberType == int) else 'a number'}, was \"{value}\".")
+            return default
+
+        if(minimum != None and number < minimum):
+            self.errors.append(f"{name} must be at least {minimum}, was {number}.")
+            return default
+
+        return number
+
+    def getPath(self, name: str, default: str = None, required: bool = False) -> str:
+        value = self.getString(name, required = required)
+        if(value == None):
+            return default
+
+        return os.path.normpath(os.path.expanduser(value.strip()))
+
+    def getChoice(self, name: str, choices: List[str], default: str) -> str:
+        value = self.getString(name)
+        if(value == None):
+            return default
+        if(value.strip().lower() not in choices):
+            self.errors.append(f"{name} must be one of {', '.join(choices)}, was \"{value}\".")
+            return default
+
+        return value.strip().lower()
@@ -1,6 +1,6 @@
 import re
 from datetime import datetime
-from typing import List
+from typing import TYPE_CHECKING, List
 
 from grdUtil.BashColor import BashColor
 from grdUtil.DateTimeUtil import getDateTime
@@ -8,25 +8,31 @@ from grdUtil.InputUtil import isNumber
 from grdUtil.PrintUtil import printLists, printS
 from grdUtil.StaticUtil import StaticUtil
 
-from controllers.SharedCliController import SharedCliController
+from enums.DownloadJobStatus import DownloadJobStatus
+from LazyImport import LazyService
 from model.Playlist import Playlist
-from services.DownloadService import DownloadService
-from services.FetchService import FetchService
-from services.PlaybackService import PlaybackService
-from services.PlaylistService import PlaylistService
-from services.QueueStreamService import QueueStreamService
-from services.StreamSourceService import StreamSourceService
 from Settings import Settings
 
+if(TYPE_CHECKING):
+    from controllers.SharedCliController import SharedCliController
+    from services.DownloadQueueService import DownloadQueueService
+    from services.DownloadService import DownloadService
+    from services.FetchService import FetchService
+    from services.PlaybackService import PlaybackService
+    from services.PlaylistService import PlaylistService
+    from services.QueueStreamService import QueueStreamService
+    from services.StreamSourceService import StreamSourceService
+
 
 class PlaylistCliController():
-    downloadService = DownloadService()
-    fetchService = FetchService()
-    playbackService = PlaybackService()
-    playlistService = PlaylistService()
-    queueStreamService = QueueStreamService()
-    streamSourceService = StreamSourceService()
-    sharedCliController = SharedCliController()
+    downloadQueueService: "DownloadQueueService" = LazyService("services.DownloadQueueService")
+    downloadService: "DownloadService" = LazyService("services.DownloadService")
+    fetchService: "FetchService" = LazyService("services.FetchService")
+    playbackService: "PlaybackService" = LazyService("services.PlaybackService")
+    playlistService: "PlaylistService" = LazyService("services.PlaylistService")
+    queueStreamService: "QueueStreamService" = LazyService("services.QueueStreamService")
+    streamSourceService: "StreamSourceService" = LazyService("services.StreamSourceService")
+    sharedCliController: "SharedCliController" = LazyService("controllers.SharedCliController")
     settings = Settings()
     
     def addPlaylist(self, name: str, playWatchedStreams: bool, allowDuplicates: bool, streamSourceIds: List[str]) -> Playlist:
@@ -226,7 +232,7 @@ class PlaylistCliController():
 
         return result
     
-    def fetchPlaylists(self, playlistIds: List[str], batchSize: int, takeAfter: datetime, takeBefore: datetime, takeNewOnly: bool) -> int:
+    def fetchPlaylists(self, playlistIds: List[str], batchSize: int, takeAfter: datetime, takeBefore: datetime, takeNewOnly: bool, concurrent: bool = False) -> int:
         """
         Fetch new videos from watched sources, adding them in chronological order.
 
@@ -236,6 +242,7 @@ class PlaylistCliController():
             takeAfter (datetime): Limit to take video after.
             takeBefore (datetime): Limit to take video before.
             takeNewOnly (bool): Only take streams marked as new. Disables takeAfter and takeBefore-checks. To use takeAfter and/or takeBefore, set this to False.
+            concurrent (bool): Fetch from sources of each Playlist in parallel. Defaults to False.
 
         Returns:
             int: Number of videos added.
@@ -259,16 +266,21 @@ class PlaylistCliController():
             return result
         
         started = getDateTime()
-        for id in playlistIds:
-            if(self.settings.removeWatchedOnFetch):
+        if(self.settings.removeWatchedOnFetch):
+            for id in playlistIds:
                 self.sharedCliController.prune(id)
                 print("") # Space before fetching
+        
+        # Sources shared by several Playlists are only fetched once
+        fetched = self.fetchService.fetchPlaylists(playlistIds, batchSize, _takeAfter, _takeBefore, takeNewOnly, concurrent)
+        completed = getDateTime()
+        duration = completed - started
+        for playlist in self.playlistService.getMany(list(fetched.keys())):
+            if(playlist == None):
+                continue
             
-            result += len(self.fetchService.fetch(id, batchSize, _takeAfter, _takeBefore, takeNewOnly))
-            playlist = self.playlistService.get(id)
-            completed = getDateTime()
-            duration = completed - started
-            printS(f"Fetched {result} for playlist \"{playlist.name}\" successfully in {duration}.", color = BashColor.OKGREEN)
+            result += len(fetched[playlist.id])
+            printS(f"Fetched {len(fetched[playlist.id])} for playlist \"{playlist.name}\" successfully in {duration}.", color = BashColor.OKGREEN)
     
         return result
       
@@ -378,24 +390,33 @@ class PlaylistCliController():
             printS("Playlist \"", playlist.name, "\" has no streams, download aborted.", color = BashColor.OKGREEN)
             
         downloadDirectory = directory if(directory != None) else playlist.name
-        for i, streamId in enumerate(playlist.streamIds[startIndex:endIndex]):
-            stream = self.queueStreamService.get(streamId)
+        jobIds = []
+        nDownloaded = 0
+        for i, stream in enumerate(self.queueStreamService.getMany(playlist.streamIds[startIndex:endIndex])):
+            if(stream == None):
+                continue
             if(not stream.isWeb):
                 printS("Cannot download a non-web stream, \"", stream.name, "\" was skipped.", color = BashColor.WARNING)
                 continue
             
-            try:
-                prefix = f"{i+1} " if(useIndex) else None
-                result.append(self.downloadService.download(stream.uri, downloadDirectory, nameRegex = nameRegexCompiled, prefix = prefix))
-            except AttributeError as e:
-                printS("Failed to download stream \"", stream.name, "\": Regex was not matched", color = BashColor.FAIL)
-                continue
-            except Exception as e:
-                printS("Failed to download stream \"", stream.name, "\": ", e, color = BashColor.FAIL)
+            downloadedPath = self.downloadService.downloadCatalog.getDownloaded(stream.uri, downloadDirectory)
+            if(downloadedPath != None):
+                result.append(downloadedPath)
+                nDownloaded += 1
                 continue
             
+            prefix = f"{i+1} " if(useIndex) else None
+            jobIds.append(self.downloadQueueService.submit(stream.uri, downloadDirectory, nameRegex = nameRegexCompiled, prefix = prefix, name = stream.name).id)
+        
+        printS(nDownloaded, " stream(s) already downloaded, skipped.", doPrint = (nDownloaded > 0))
+        printS("Queued ", len(jobIds), " download(s) for playlist \"", playlist.name, "\", ", self.settings.downloadWorkers, " at a time.")
+        for job in self.downloadQueueService.wait(jobIds):
+            if(job.status == DownloadJobStatus.DONE.value):
+                result.append(job.path)
+            
         if(len(result) == 0):
             printS("Nothing was downloaded for playlist \"", playlist.name, "\".", color = BashColor.FAIL)
+        printS(self.downloadService.youtubeDlService.getStatsString())
     
         return result
       
@@ -429,15 +450,16 @@ class PlaylistCliController():
     
         return result
       
-    def unwatchAllInPlaylist(self, playlistId: str) -> int:
+    def setWatchedInPlaylist(self, playlistId: str, watched: bool) -> int:
         """
-        Unwatch all streams in Playlist.
+        Mark all streams in Playlist as watched or unwatched.
 
         Args:
             playlistId (str): ID of playlist.
+            watched (bool): Should streams be marked as watched, else unwatched.
 
         Returns:
-            int: number of streams unwatched.
+            int: number of streams changed.
         """
         
         playlist = self.playlistService.get(playlistId)
@@ -446,8 +468,8 @@ class PlaylistCliController():
             return 0
             
         try:
-            return self.playlistService.unwatchPlaylist(playlist)
+            return self.playlistService.setPlaylistWatched(playlist, watched)
         except Exception as e:
-            printS("Failed to unwatch streams in  playlist \"", playlist.name, "\": ", e, color = BashColor.FAIL)
+            printS("Failed to ", ("watch" if watched else "unwatch"), " streams in playlist \"", playlist.name, "\": ", e, color = BashColor.FAIL)
         
         return 0
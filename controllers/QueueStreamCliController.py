@@ -1,17 +1,19 @@
 from typing import List
 
-import validators
 from grdUtil.BashColor import BashColor
 from grdUtil.InputUtil import getIdsFromInput
 from grdUtil.PrintUtil import printLists, printS
 from grdUtil.StaticUtil import StaticUtil
 
+from LazyImport import LazyModule
 from model.QueueStream import QueueStream
 from services.PlaylistService import PlaylistService
 from services.QueueStreamService import QueueStreamService
 from services.SharedService import SharedService
 from Settings import Settings
 
+validators = LazyModule("validators")
+
 
 class QueueStreamCliController():
     playlistService: PlaylistService = None
@@ -1,45 +1,48 @@
-from typing import Dict, List
+import os
+import subprocess
+import sys
+import time
+from typing import TYPE_CHECKING, Dict, List, Tuple
 
 from grdException.ArgumentException import ArgumentException
 from grdUtil.BashColor import BashColor
 from grdUtil.PrintUtil import printD, printLists, printS
 from grdUtil.StaticUtil import StaticUtil
+from LazyImport import LazyService
 from model.Playlist import Playlist
 from model.PlaylistDetailed import PlaylistDetailed
 from model.QueueStream import QueueStream
 from model.StreamSource import StreamSource
-from services.FetchService import FetchService
-from services.LegacyService import LegacyService
-from services.PlaybackService import PlaybackService
-from services.PlaylistService import PlaylistService
-from services.QueueStreamService import QueueStreamService
-from services.SharedService import SharedService
-from services.StreamSourceService import StreamSourceService
 from Settings import Settings
 import copy
 
+if(TYPE_CHECKING):
+    from services.FetchService import FetchService
+    from services.LegacyService import LegacyService
+    from services.PlaybackService import PlaybackService
+    from services.PlaylistService import PlaylistService
+    from services.QueueStreamService import QueueStreamService
+    from services.SharedService import SharedService
+    from services.StreamSourceService import StreamSourceService
+
 
 class SharedCliController():
     settings: Settings = None
-    fetchService: FetchService = None
-    legacyService: LegacyService = None
-    playbackService: PlaybackService = None
-    playlistService: PlaylistService = None
-    queueStreamService: QueueStreamService = None
-    sharedService: SharedService = None
-    streamSourceService: StreamSourceService = None
+    # Created when first used, most commands only use a few of them
+    fetchService: "FetchService" = LazyService("services.FetchService")
+    legacyService: "LegacyService" = LazyService("services.LegacyService")
+    playbackService: "PlaybackService" = LazyService("services.PlaybackService")
+    playlistService: "PlaylistService" = LazyService("services.PlaylistService")
+    queueStreamService: "QueueStreamService" = LazyService("services.QueueStreamService")
+    sharedService: "SharedService" = LazyService("services.SharedService")
+    streamSourceService: "StreamSourceService" = LazyService("services.StreamSourceService")
+    importTimeTargetMilliseconds: int = 150
+    heavyModules: List[str] = ["yt_dlp", "pytubefix", "mechanize", "bs4", "jsonpath_ng", "validators", "requests", "psutil"]
 
     def __init__(self):
         self.settings = Settings()
-        self.fetchService = FetchService()
-        self.legacyService = LegacyService()
-        self.playbackService = PlaybackService()
-        self.playlistService = PlaylistService()
-        self.queueStreamService = QueueStreamService()
-        self.sharedService = SharedService()
-        self.streamSourceService = StreamSourceService()
-        
-    def prune(self, playlistId: str, includeSoftDeleted: bool = False, permanentlyDelete: bool = False) -> Dict[List[Playlist], List[QueueStream]]:
+        
+    def prune(self, playlistId: str, includeSoftDeleted: bool = False, permanentlyDelete: bool = False, dryRun: bool = False) -> Dict[List[Playlist], List[QueueStream]]:
         """
         Removes watched streams from a Playlist if it does not allow replaying of already played streams (playWatchedStreams == False).
 
@@ -47,6 +50,7 @@ class SharedCliController():
             playlistId (str): ID of Playlist to prune.
             includeSoftDeleted (bool, optional): Should include soft-deleted entities. Defaults to False.
             permanentlyDelete (bool, optional): Should entities be permanently deleted. Defaults to False.
+            dryRun (bool, optional): Only print counts and timing, without changing anything. Defaults to False.
 
         Returns:
             Dict[List[QueueStream], List[str]]: Result.
@@ -55,7 +59,12 @@ class SharedCliController():
         if(playlistId == None):
             raise ArgumentException(f"prune - Missing input: playlistId.")
         
+        started = time.perf_counter()
         data = self.sharedService.preparePrune(playlistId, includeSoftDeleted)
+        if(dryRun):
+            self.printDryRun("Prune", started, [("QueueStream(s) to " + ("remove" if permanentlyDelete else "delete"), len(data.queueStreams)), ("Playlist(s) to write", len(data.playlists))])
+            return data
+        
         if(not data.queueStreams and not data.playlists):
             printS("Prune aborted, nothing to prune.", color = BashColor.OKGREEN)
             return None
@@ -73,27 +82,36 @@ class SharedCliController():
             printS("Prune aborted by user.", color = BashColor.OKGREEN)
             return None
         else:
+            started = time.perf_counter()
             result = self.sharedService.doPrune(data, includeSoftDeleted, permanentlyDelete)
             if(result):
-                printS("Prune completed.", color = BashColor.OKGREEN)
+                printS("Prune completed in ", self.getMillisecondsSince(started), " ms.", color = BashColor.OKGREEN)
             else:
                 printS("Prune failed.", color = BashColor.FAIL)
         
         return data
     
-    def purgePlaylists(self, includeSoftDeleted: bool = False, permanentlyDelete: bool = False) -> PlaylistDetailed:
+    def purgePlaylists(self, includeSoftDeleted: bool = False, permanentlyDelete: bool = False, dryRun: bool = False) -> PlaylistDetailed:
         """
         Purges deleted entities.
 
         Args:
             includeSoftDeleted (bool, optional): Should include soft-deleted entities. Defaults to False.
             permanentlyDelete (bool, optional): Should entities be permanently deleted. Defaults to False.
+            dryRun (bool, optional): Only print counts and timing, without changing anything. Defaults to False.
             
         Returns:
             PlaylistDetailed: Dict with Lists of entities removed.
         """
         
+        started = time.perf_counter()
         data = self.sharedService.preparePurgePlaylists(includeSoftDeleted, permanentlyDelete)
+        if(dryRun):
+            danglingIds = self.sharedService.getDanglingIds(data.playlists)
+            action = "remove" if permanentlyDelete else "delete"
+            self.printDryRun("Purge", started, [(f"QueueStream(s) to {action}", len(data.queueStreams)), (f"StreamSource(s) to {action}", len(data.streamSources)), ("Playlist(s) to write", len(data.playlists)), ("Dangling ID(s) to remove from Playlists", sum(len(_) for _ in danglingIds.values()))])
+            return data
+        
         if(not data.queueStreams and not data.streamSources and not data.playlists):
             printS("Purge aborted, nothing to purge.", color = BashColor.OKGREEN)
             return None
@@ -116,24 +134,33 @@ class SharedCliController():
             # Remove Playlists from purged data, will only be updated
             entitiesToRemove = copy.copy(data)
             entitiesToRemove.playlists = []
+            started = time.perf_counter()
             result = self.sharedService.doPurge(entitiesToRemove)
             result = result and self.sharedService.doPurgePlaylists(data)
             if(result):
-                printS("Purge completed.", color = BashColor.OKGREEN)
+                printS("Purge completed in ", self.getMillisecondsSince(started), " ms.", color = BashColor.OKGREEN)
             else:
                 printS("Purge failed.", color = BashColor.FAIL)
              
         return data
     
-    def purge(self) -> PlaylistDetailed:
+    def purge(self, dryRun: bool = False) -> PlaylistDetailed:
         """
         Purges deleted entities.
+
+        Args:
+            dryRun (bool, optional): Only print counts and timing, without changing anything. Defaults to False.
             
         Returns:
             PlaylistDetailed: Dict with Lists of entities removed.
         """
         
+        started = time.perf_counter()
         data = self.sharedService.preparePurge()
+        if(dryRun):
+            self.printDryRun("Purge", started, [("QueueStream(s) to remove", len(data.queueStreams)), ("StreamSource(s) to remove", len(data.streamSources)), ("Playlist(s) to remove", len(data.playlists))])
+            return data
+        
         if(not data.queueStreams and not data.streamSources and not data.playlists):
             printS("Purge aborted, nothing to purge.", color = BashColor.OKGREEN)
             return None
@@ -153,14 +180,33 @@ class SharedCliController():
             printS("Purge aborted by user.", color = BashColor.OKGREEN)
             return None
         else:
+            started = time.perf_counter()
             result = self.sharedService.doPurge(data)
             if(result):
-                printS("Purge completed.", color = BashColor.OKGREEN)
+                printS("Purge completed in ", self.getMillisecondsSince(started), " ms.", color = BashColor.OKGREEN)
             else:
                 printS("Purge failed.", color = BashColor.FAIL)
         
         return data
     
+    def printDryRun(self, operation: str, started: float, counts: List[Tuple[str, int]]) -> None:
+        """
+        Print what a prune or purge would change, and how long finding it took.
+
+        Args:
+            operation (str): Name of operation, e.g. "Prune".
+            started (float): Value of time.perf_counter when the operation started.
+            counts (List[Tuple[str, int]]): Description and number of entities for each change.
+        """
+        
+        milliseconds = self.getMillisecondsSince(started)
+        for description, count in counts:
+            printS(description, ": ", count)
+        printS(operation, " dry run, nothing changed. Found in ", milliseconds, " ms.", color = BashColor.OKGREEN)
+    
+    def getMillisecondsSince(self, started: float) -> float:
+        return round((time.perf_counter() - started) * 1000, 1)
+    
     def reset(self, playlistId: str, includeSoftDeleted: bool = False, permanentlyDelete: bool = False) -> Playlist:
         """
         Reset the fetch-status for StreamSources of Playlist given by playlistId and deletes all QueueStreams in it.
@@ -205,4 +251,70 @@ class SharedCliController():
                 printS("Reset failed.", color = BashColor.FAIL)
         
         return data
-    
\ No newline at end of file
+    
+    
+    def printImportTime(self, command: str = None, runs: int = 3, nModules: int = 15) -> float:
+        """
+        Run program with command in new processes using "python -X importtime", and print the startup time, the modules that took the longest to import, and any heavy dependencies imported.
+
+        Args:
+            command (str, optional): Command and arguments to run, separated by space. Defaults to None, listing Playlists.
+            runs (int, optional): Number of runs, the fastest is used. Defaults to 3.
+            nModules (int, optional): Number of modules to print. Defaults to 15.
+
+        Returns:
+            float: Milliseconds of fastest run.
+        """
+        
+        mainPath = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Main.py")
+        arguments = command.split() if(command) else ["lp"]
+        printS("Running \"", " ".join(arguments), "\" ", runs, " time(s)...")
+        
+        fastest = None
+        importTimes = []
+        for _ in range(max(1, runs)):
+            started = time.perf_counter()
+            # No input, so commands asking for any stop instead of waiting
+            process = subprocess.run([sys.executable, "-X", "importtime", mainPath] + arguments, 
+                stdin = subprocess.DEVNULL, stdout = subprocess.DEVNULL, stderr = subprocess.PIPE, text = True, cwd = os.path.dirname(mainPath))
+            milliseconds = (time.perf_counter() - started) * 1000
+            if(fastest == None or milliseconds < fastest):
+                fastest = milliseconds
+                importTimes = self.parseImportTime(process.stderr)
+        
+        topLevel = sorted([_ for _ in importTimes if _[2] == 0], key = lambda _: _[1], reverse = True)
+        totalImportMilliseconds = sum(_[1] for _ in topLevel) / 1000
+        moduleList = [f"{round(_[1] / 1000, 1)} ms - {_[0]}" for _ in topLevel[:nModules]]
+        importedNames = set(_[0] for _ in importTimes)
+        heavyList = [_ for _ in self.heavyModules if _ in importedNames]
+        
+        printLists([moduleList, heavyList], [f"Slowest imports - {round(totalImportMilliseconds, 1)} ms total", f"Heavy dependencies imported - {len(heavyList)}"])
+        color = BashColor.OKGREEN if(fastest <= self.importTimeTargetMilliseconds) else BashColor.WARNING
+        printS("Fastest run: ", round(fastest, 1), " ms (target: ", self.importTimeTargetMilliseconds, " ms).", color = color)
+        return fastest
+    
+    def parseImportTime(self, output: str) -> List[Tuple[str, int, int]]:
+        """
+        Parse output of "python -X importtime".
+
+        Args:
+            output (str): Output written to stderr.
+
+        Returns:
+            List[Tuple[str, int, int]]: Name, cumulative microseconds, and depth of each module imported, where depth 0 is imported by the program itself.
+        """
+        
+        result = []
+        for line in output.splitlines():
+            if(not line.startswith("import time:")):
+                continue
+            
+            columns = line[len("import time:"):].split("|")
+            if(len(columns) != 3 or not columns[1].strip().isdigit()):
+                continue
+            
+            name = columns[2][1:]
+            depth = (len(name) - len(name.lstrip())) // 2
+            result.append((name.strip(), int(columns[1].strip()), depth))
+        
+        return result
\ No newline at end of file
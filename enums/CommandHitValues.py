@@ -38,4 +38,7 @@ class CommandHitValues(Enum):
     
     LIST_SOFT_DELETED = 31
     REFACTOR_OLD = 32
+    IMPORT_SQLITE = 33
+    IMPORT_TIME = 34
+    WATCH_ALL_PLAYLIST = 35
     
\ No newline at end of file
@@ -0,0 +1,60 @@
+from datetime import datetime
+
+from grdUtil.DateTimeUtil import getDateTime
+
+
+class DownloadJob:
+    def __init__(self, 
+                 url: str = None, 
+                 directory: str = None, 
+                 fileExtension: str = "mp4", 
+                 nameRegex: str = None, 
+                 prefix: str = None, 
+                 name: str = None, 
+                 status: str = "queued", 
+                 downloadedBytes: int = 0, 
+                 totalBytes: int = None, 
+                 bytesPerSecond: float = 0.0, 
+                 path: str = None, 
+                 error: str = None, 
+                 added: datetime = None, 
+                 started: datetime = None, 
+                 completed: datetime = None, 
+                 ownerPid: int = None, 
+                 id: str = None):
+        self.url: str = url
+        self.directory: str = directory
+        self.fileExtension: str = fileExtension
+        self.nameRegex: str = nameRegex
+        self.prefix: str = prefix
+        self.name: str = name
+        self.status: str = status
+        self.downloadedBytes: int = downloadedBytes
+        self.totalBytes: int = totalBytes
+        self.bytesPerSecond: float = bytesPerSecond
+        self.path: str = path
+        self.error: str = error
+        self.added: datetime = added if(added != None) else getDateTime()
+        self.started: datetime = started
+        self.completed: datetime = completed
+        self.ownerPid: int = ownerPid
+        self.id: str = id
+        
+    def getProgress(self) -> float:
+        """
+        Get progress of download as a fraction.
+
+        Returns:
+            float | None: Progress from 0 to 1, None if total size is unknown.
+        """
+        
+        if(not self.totalBytes):
+            return None
+        
+        return min(1.0, self.downloadedBytes / self.totalBytes)
+        
+    def summaryString(self):
+        progress = self.getProgress()
+        progressString = f"{round(progress * 100, 1)}%" if(progress != None) else f"{round(self.downloadedBytes / 1048576, 1)} MB"
+        errorString = f" - {self.error}" if(self.error != None) else ""
+        return f"[{self.status}] {self.name or self.url}: {progressString}, {round(self.bytesPerSecond / 1048576, 2)} MB/s{errorString}"
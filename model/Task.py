@@ -0,0 +1,33 @@
+from datetime import datetime
+from typing import List
+
+from grdUtil.DateTimeUtil import getDateTime
+
+
+class Task:
+    def __init__(self,
+                 name: str = None,
+                 entityId: str = None,
+                 arguments: dict = None,
+                 status: str = "queued",
+                 logs: List[str] = None,
+                 error: str = None,
+                 added: datetime = None,
+                 started: datetime = None,
+                 completed: datetime = None,
+                 id: str = None):
+        self.name: str = name
+        self.entityId: str = entityId
+        self.arguments: dict = arguments if(arguments != None) else {}
+        self.status: str = status
+        self.logs: List[str] = logs if(logs != None) else []
+        self.error: str = error
+        self.added: datetime = added if(added != None) else getDateTime()
+        self.started: datetime = started
+        self.completed: datetime = completed
+        self.id: str = id
+
+    def summaryString(self):
+        return "".join(map(str, ["[", self.status, "] ", self.name,
+        f" ({self.entityId})" if(self.entityId) else "",
+        ", ID: ", self.id]))
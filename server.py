@@ -1,7 +1,4 @@
-import uuid
-from queue import Queue
 import threading
-import sys
 import time
 
 from flask import Flask, render_template, request, redirect, url_for, flash, get_flashed_messages, stream_with_context, jsonify, Response
@@ -20,14 +17,18 @@ from services.QueueStreamService import *
 from services.StreamSourceService import *
 from services.PlaybackService import *
 from services.FetchService import *
+from services.DownloadService import *
+from services.DownloadQueueService import *
+from services.FetchSchedulerService import *
+from services.TaskService import *
 from services.SharedService import *
+# Output of tasks is written to their logs too
+from services.TaskService import printD, printS
 
 app = Flask(__name__)
 csrf = CSRFProtect(app) 
 app.secret_key = "foo"# TODO, add to settings
 bootstrap = Bootstrap5(app)
-activeTasks = {}
-taskRegistry = {}
 
 settings = Settings()
 playlistService = PlaylistService()
@@ -36,17 +37,50 @@ streamSourceService = StreamSourceService()
 playbackService = PlaybackService()
 fetchService = FetchService()
 downloadService = DownloadService()
+downloadQueueService = DownloadQueueService()
+fetchSchedulerService = FetchSchedulerService()
+taskService = TaskService()
 sharedService = SharedService()
 
 def registerTask(name):
     def decorator(func):
-        taskRegistry[name] = func
+        taskService.register(name, func)
         return func
     return decorator
 
 def reloadPage():
     return redirect(request.referrer or url_for("index"))
 
+def getIntArgument(name: str, default: int, minimum: int = 0) -> int:
+    """
+    Get integer query argument.
+
+    Args:
+        name (str): Name of argument.
+        default (int): Value if argument is missing.
+        minimum (int, optional): Smallest valid value. Defaults to 0.
+
+    Raises:
+        ValueError: Argument is not an integer or is less than minimum.
+
+    Returns:
+        int: Value.
+    """
+    
+    value = request.args.get(name, None)
+    if(value == None):
+        return default
+    
+    try:
+        result = int(value)
+    except ValueError:
+        raise ValueError(f"Argument {name} must be an integer, got \"{value}\".")
+    
+    if(result < minimum):
+        raise ValueError(f"Argument {name} must be at least {minimum}, got {result}.")
+    
+    return result
+
 @app.route("/")
 @app.route("/index")
 def index():
@@ -79,10 +113,44 @@ def playlistsDetails(id: str):
         flash(f"Playlist {id} was not found.", "error")
         return playlistsIndex()
     
-    queueStreams = playlistService.getStreamsByPlaylistId(id)
+    try:
+        page = getIntArgument("page", 1, minimum= 1)
+    except ValueError as e:
+        return renderError(str(e)), 400
+    
+    pageSize = settings.playlistPageSize
+    queueStreamPage, nextOffset, total = playlistService.getStreamPage(id, (page - 1) * pageSize, pageSize, includeSoftDeleted= True)
     streamSources = playlistService.getSourcesByPlaylistId(id)
-    enumerateQueueStreams = enumerate(queueStreams) if queueStreams else None
-    return render_template("playlists/details.html", playlist= playlist, enumerateQueueStreams= enumerateQueueStreams, streamSources= streamSources)
+    enumerateQueueStreams = queueStreamPage if queueStreamPage else None
+    # Last ID in the page, not of the last QueueStream found, so QueueStreams after a missing one are not listed again
+    nextCursor = playlist.streamIds[nextOffset - 1] if nextOffset != None else None
+    return render_template("playlists/details.html", playlist= playlist, enumerateQueueStreams= enumerateQueueStreams, streamSources= streamSources,
+        page= page, pageSize= pageSize, total= total, nextOffset= nextOffset, nextCursor= nextCursor)
+
+@app.route("/api/playlists/<id>/streams")
+def getPlaylistStreamsJson(id: str):
+    playlist = playlistService.get(id, True)
+    if(not playlist):
+        return jsonify({"error": "Playlist not found"}), 404
+    
+    try:
+        offset = getIntArgument("offset", 0)
+        limit = min(getIntArgument("limit", settings.playlistPageSize, minimum= 1), 500)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    cursor = request.args.get("cursor", None)
+    try:
+        queueStreamPage, nextOffset, total = playlistService.getStreamPage(id, offset, limit, cursor, includeSoftDeleted= True)
+    except NotFoundException as e:
+        return jsonify({"error": str(e)}), 404
+    
+    return jsonify({
+        "total": total,
+        "nextOffset": nextOffset,
+        "nextCursor": playlist.streamIds[nextOffset - 1] if nextOffset != None else None,
+        "queueStreams": [{"index": i, "id": q.id, "name": q.name, "streamSourceId": q.streamSourceId, "streamSourceName": q.streamSourceName, "watched": q.watched} for i, q in queueStreamPage]
+    })
 
 @app.route("/playlists/create", methods=["GET", "POST"])
 def playlistsCreate():
@@ -413,13 +481,26 @@ def play(playlistId: str):
         flash(f"Index was out of range of playlist {playlist.name}, max index: {len(playlist.streamIds) - 1}", "error")
         return playlistsDetails(id = playlist.id)
     
+    if(not back):
+        # Jump straight to the next QueueStream that can be played instead of redirecting once per skipped QueueStream
+        playableIndex = playlistService.getNextPlayableIndex(playlist, playIndex)
+        if(playableIndex == None):
+            flash(f"No QueueStreams left to play from index {playIndex} in playlist {playlist.name}.", "info")
+            return playlistsDetails(id = playlist.id)
+        if(playableIndex != playIndex):
+            return redirect(url_for("play", playlistId= playlistId, index= playableIndex))
+    
+    nextIndices = playlistService.getNextPlayableIndices(playlist, playIndex, 4) # Next 4, if any
     queueStreamId = playlist.streamIds[playIndex]
-    queueStream = queueStreamService.get(queueStreamId)
+    queueStreams = queueStreamService.getMany([queueStreamId] + [playlist.streamIds[_] for _ in nextIndices])
+    queueStream = queueStreams[0]
     if(not queueStream):
         flash(f"QueueStream {queueStreamId}, index {playIndex} was not found.", "error")
         return playlistsDetails(id = playlist.id)
     
     if(not back and queueStream.watched and not playlist.playWatchedStreams):
+        # Watched by another process since indexed
+        queueStreamService.indexStream(queueStream)
         return redirect(url_for("play", playlistId= playlistId, index= playIndex+1))
     
     embeddedUrl: str = None
@@ -434,19 +515,12 @@ def play(playlistId: str):
         # fast api symlink wont work without replacing entire flask
         fileUri = playbackService.mapUrlToEmbeddedUrl(queueStream)
     
-    nextQueueStreams = []
-    for nextQueueStreamId in playlist.streamIds[playIndex+1:][:4]: # Next 4, if any
-        nextQueueStream = queueStreamService.get(nextQueueStreamId)
-        if(nextQueueStream):
-            nextQueueStreams.append(nextQueueStream)
-        
-    enumeratedNextQueueStreams = enumerate(nextQueueStreams, playIndex) if nextQueueStreams else None
+    nextQueueStreams = [(i, _) for i, _ in zip(nextIndices, queueStreams[1:]) if _]
     return render_template("play.html", playlist= playlist, queueStream= queueStream, index= playIndex, 
-        playlists = [p for p in playlistService.getAllSorted() if p.id != playlistId],
+        playlists = [p for p in playlistService.getAllSortedCached() if p.id != playlistId],
         embeddedUrl= embeddedUrl, circumventUrl= circumventUrl, fileUri= fileUri, 
-        enumeratedNextQueueStreams= enumeratedNextQueueStreams)
+        enumeratedNextQueueStreams= nextQueueStreams if nextQueueStreams else None)
 
-@registerTask("fetchPlaylist")
 @app.route("/fetch/<playlistId>")
 def fetchPlaylist(playlistId):
     playlist = playlistService.get(playlistId)
@@ -454,26 +528,18 @@ def fetchPlaylist(playlistId):
         flash(f"Playlist {id} was not found.", "error")
         return reloadPage()
     
-    flash(f"Fetch running in background...", "info")
-    def runFetch():
-        try:
-            started = getDateTime()
-            newQueueStreams = fetchService.fetch(playlist.id, settings.fetchLimitSingleSource, takeNewOnly= True)
-            duration = getDateTime() - started # ToHumanReadableString()
-
-            resultsUrl = f"fetch?count={len(newQueueStreams)}&duration={duration}"
-            
-            # TODO flash and reload are not available in the scope of an async task
-            # flash(f"Fetch complete", "success") # TODO make a link with details
-            # return reloadPage()
-        except Exception as e:
-            flash(f"ERROR: {str(e)}", "error")
-
-    threading.Thread(target= runFetch, daemon= True).start()
-    
+    concurrent = request.args.get("concurrent", "False") == "True"
+    taskService.enqueue("fetchPlaylist", playlist.id, { "concurrent": concurrent })
+    flash(f"Fetch queued, running in background...", "info")
     return reloadPage()
 
-@registerTask("downloadPlaylist")
+@registerTask("fetchPlaylist")
+def fetchPlaylistTask(playlistId: str, concurrent: bool = False):
+    started = getDateTime()
+    newQueueStreams = fetchService.fetch(playlistId, settings.fetchLimitSingleSource, takeNewOnly= True, concurrent= concurrent)
+    duration = getDateTime() - started
+    printS(f"Fetched {len(newQueueStreams)} QueueStream(s) in {duration}.")
+
 @app.route("/download/<playlistId>")
 def downloadPlaylist(playlistId):
     playlist = playlistService.get(playlistId)
@@ -481,31 +547,51 @@ def downloadPlaylist(playlistId):
         flash(f"Playlist {id} was not found.", "error")
         return reloadPage()
     
-    flash(f"Download running in background...", "info")
-    def runDownload():
-        try:
-            started = getDateTime()
-            
-            for i, streamId in enumerate(playlist.streamIds):
-                stream = queueStreamService.get(streamId)
-                if(not stream.isWeb):
-                    printS("Cannot download a non-web stream, \"", stream.name, "\" was skipped.", color = BashColor.WARNING)
-                    continue
-                
-                try:
-                    downloadService.download(stream.uri, playlist.name)
-                except Exception as e:
-                    printS("Failed to download stream \"", stream.name, "\": ", e, color = BashColor.FAIL)
-                    continue
-            
-            duration = getDateTime() - started # ToHumanReadableString()
-        except Exception as e:
-            flash(f"ERROR: {str(e)}", "error")
+    taskService.enqueue("downloadPlaylist", playlist.id)
+    flash(f"Download queued, running in background...", "info")
+    return reloadPage()
 
-    threading.Thread(target= runDownload, daemon= True).start()
+@registerTask("downloadPlaylist")
+def downloadPlaylistTask(playlistId: str):
+    playlist = playlistService.get(playlistId)
+    if(not playlist):
+        raise LookupError(f"Playlist {playlistId} was not found.")
+    
+    jobIds = []
+    for stream in queueStreamService.getMany(playlist.streamIds):
+        if(not stream):
+            continue
+        if(not stream.isWeb):
+            printS("Cannot download a non-web stream, \"", stream.name, "\" was skipped.", color = BashColor.WARNING)
+            continue
+        if(downloadService.downloadCatalog.getDownloaded(stream.uri, playlist.name) != None):
+            continue
+        
+        jobIds.append(downloadQueueService.submit(stream.uri, playlist.name, name = stream.name).id)
     
+    printS(f"{len(jobIds)} download(s) queued.")
+    jobs = downloadQueueService.wait(jobIds, onDone = lambda job: printS(job.summaryString()))
+    printS(f"Downloaded {len([_ for _ in jobs if _.path])} of {len(jobIds)}.")
+
+@app.route("/fetchSchedule")
+def fetchScheduleIndex():
+    return render_template("fetchSchedule.html", schedule= fetchSchedulerService.getStatus(), isRunning= fetchSchedulerService.isRunning())
+
+@app.route("/fetchSchedule/fetchNow/<streamSourceId>")
+def fetchScheduleFetchNow(streamSourceId: str):
+    fetchSchedulerService.fetchNow(streamSourceId)
+    flash(f"StreamSource will be fetched in the next batch.", "info")
     return reloadPage()
 
+@app.route("/api/fetchSchedule")
+def getFetchScheduleJson():
+    return jsonify({"isRunning": fetchSchedulerService.isRunning(), "schedule": fetchSchedulerService.getStatus()})
+
+@app.route("/api/downloads")
+def getDownloadsJson():
+    jobs = downloadQueueService.getJobs()
+    return jsonify([{**job.__dict__, "progress": job.getProgress()} for job in jobs])
+
 @app.route("/testt")
 def testt():
     # if(not playlist):
@@ -567,6 +653,24 @@ def prunePlaylist(playlistId):
     
     return reloadPage()
 
+@app.route("/setWatched/<playlistId>", methods=["GET", "POST"])
+def setPlaylistWatched(playlistId):
+    playlist = playlistService.get(playlistId)
+    if(not playlist):
+        flash(f"Playlist {playlistId} was not found.", "error")
+        return reloadPage()
+
+    watched = request.values.get("watched", "false").lower() == "true"
+    ids = request.values.get("ids", None)
+    streamIds = [_ for _ in ids.split(",") if len(_) > 0] if(ids) else None
+
+    started = time.perf_counter()
+    changed = playlistService.setPlaylistWatched(playlist, watched, streamIds)
+    milliseconds = round((time.perf_counter() - started) * 1000, 1)
+    flash(f"Marked {changed} QueueStreams in Playlist {playlist.name} as {'watched' if watched else 'unwatched'} ({milliseconds} ms)", "success")
+
+    return reloadPage()
+
 @app.route("/purge", methods=["GET", "POST"])
 def purgeAll():
     if request.method == "POST":
@@ -594,9 +698,28 @@ def softDeletedIndex():
 
 @app.route("/api/playlists")
 def getPlaylistsJson():
-    playlists = playlistService.getAllSorted()
+    playlists = playlistService.getAllSortedCached()
     return jsonify([{"id": p.id, "name": p.name} for p in playlists])
 
+@app.route("/api/search")
+def searchJson():
+    searchTerm = request.args.get("q", "")
+    includeSoftDeleted = request.args.get("includeSoftDeleted", "false").lower() == "true"
+    if(len(searchTerm) == 0):
+        return jsonify({"error": "Missing search term q"}), 400
+    
+    started = time.perf_counter()
+    result = sharedService.search(searchTerm, includeSoftDeleted)
+    return jsonify({"playlists": [{"id": _.id, "name": _.name} for _ in result.playlists],
+        "streamSources": [{"id": _.id, "name": _.name, "uri": _.uri} for _ in result.streamSources],
+        "queueStreams": [{"id": _.id, "name": _.name, "uri": _.uri} for _ in result.queueStreams],
+        "milliseconds": round((time.perf_counter() - started) * 1000, 1)})
+
+@app.route("/api/cacheStats")
+def getCacheStatsJson():
+    cache = playlistService.cache
+    return jsonify({"hits": cache.hits, "misses": cache.misses, "evictions": cache.evictions, "size": len(cache.entries), "maxSize": cache.maxSize})
+
 @app.route("/addToPlaylist", methods=["POST"])
 def addPlaybackStreamsToPlaylists():
     inputData = request.get_json()
@@ -645,72 +768,62 @@ def addPlaybackStreamToPlaylist(playlistId, queueStreamId):
 
 @csrf.exempt
 @app.route("/enqueueTask", methods=["POST"])
-def start_task():
+def enqueueTask():
     inputData = request.get_json(silent=True) or {}
 
     taskName = inputData.get("task")
     entityId = inputData.get("entityId")
-    if not taskName or taskName not in taskRegistry:
+    if not taskName or taskName not in taskService.taskFunctions:
         return jsonify({"error": "Unknown task name"}), 400
 
-    targetFunc = taskRegistry[taskName]
-
-    jobId = str(uuid.uuid4())
-    logQueue = Queue()
-    activeTasks[jobId] = logQueue
-
-    def runTask():
-        customStream = StreamToQueue(logQueue)
-        oldStdOut = sys.stdout
-        sys.stdout = customStream
-
-        try:
-            print("Task started, please wait...")
-            targetFunc(entityId)
-
-        except Exception as e:
-            print(f"ERROR: {str(e)}")
-        finally:
-            sys.stdout = oldStdOut
-            logQueue.put(None)
-
-    threading.Thread(target= runTask, daemon= True).start()
-
-    return jsonify({"jobId": jobId})
+    task = taskService.enqueue(taskName, entityId)
+    return jsonify({"jobId": task.id})
 
 @csrf.exempt
 @app.route("/streamLogs")
 def streamLogs():
     jobId = request.args.get("jobId")
-    if not jobId or jobId not in activeTasks:
+    if not jobId or not taskService.get(jobId):
         return "Job not found", 404
 
     def generate():
-        q = activeTasks[jobId]
+        offset = 0
         while True:
-            line = q.get()
-            if line is None:
-                del activeTasks[jobId]
+            lines = taskService.waitForLogs(jobId, offset)
+            offset += len(lines)
+            for line in lines:
+                yield f"data: {line}\n\n"
+            
+            task = taskService.get(jobId)
+            if not task or (task.status in [TaskStatus.DONE.value, TaskStatus.FAILED.value] and offset >= len(task.logs)):
                 yield "data: [DONE]\n\n"
                 break
-            yield f"data: {line}\n\n"
 
     return Response(stream_with_context(generate()), mimetype="text/event-stream", headers={"Cache-Control": "no-cache"})
 
-class StreamToQueue:
-    def __init__(self, queue):
-        self.queue = queue
+@app.route("/api/tasks")
+def getTasksJson():
+    tasks = taskService.getAll()
+    return jsonify([{key: value for key, value in task.__dict__.items() if key != "logs"} for task in tasks])
 
-    def write(self, text):
-        if text:
-            self.queue.put(text.rstrip())
-            
-    def flush(self):
-        pass
+@app.route("/api/tasks/<id>")
+def getTaskJson(id: str):
+    task = taskService.get(id)
+    if not task:
+        return jsonify({"error": "Task not found"}), 404
+    
+    return jsonify(task.__dict__)
     
 if __name__ == "__main__":
     # print("Routes:")
     # for rule in app.url_map.iter_rules():
     #     print(f"{rule.rule} - {rule.methods} - {rule.endpoint}")
     
+    # Services share the settings instance, changes to .env are used without restarting
+    settings.watch()
+    if(settings.fetchSchedulerEnabled):
+        fetchSchedulerService.start()
+    # Run tasks queued before a restart
+    taskService.startWorkers()
+    
     app.run(host= "0.0.0.0", port= 8888)
\ No newline at end of file
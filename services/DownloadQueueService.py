@@ -0,0 +1,377 @@
+import contextvars
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, Set
+from urllib.parse import urlparse
+
+from grdUtil.BashColor import BashColor
+from grdUtil.DateTimeUtil import getDateTime
+
+from enums.DownloadJobStatus import DownloadJobStatus
+from model.DownloadJob import DownloadJob
+from services.DownloadService import DownloadService
+from services.TaskService import printD, printS
+from Settings import Settings
+from storage.FileLock import FileLock, isProcessRunning
+
+
+class DownloadQueueService():
+    settings = Settings()
+    downloadService = DownloadService()
+    jobs: Dict[str, DownloadJob] = None
+    removedIds: Set[str] = set()
+    # Context of the caller submitting each job, so output of the job is attributed to it, e.g. to a task
+    jobContexts: Dict[str, contextvars.Context] = {}
+    fileLock: FileLock = None
+    workers: List[threading.Thread] = []
+    runningByHost: Dict[str, int] = {}
+    condition: threading.Condition = threading.Condition()
+    bandwidthLock: threading.Lock = threading.Lock()
+    bandwidthAllowance: float = 0.0
+    bandwidthChecked: float = None
+    lastSaved: float = 0.0
+    lastRefreshed: float = 0.0
+
+    def __init__(self):
+        with DownloadQueueService.condition:
+            if(DownloadQueueService.jobs == None):
+                DownloadQueueService.jobs = {}
+                DownloadQueueService.fileLock = FileLock(self.getQueuePath() + ".lock")
+                with DownloadQueueService.fileLock:
+                    self.mergeJobs(self.load())
+
+    def getQueuePath(self) -> str:
+        return os.path.join(self.settings.localStoragePath, "downloadQueue.json")
+
+    def load(self) -> List[DownloadJob]:
+        """
+        Load jobs of all processes from file.
+
+        Returns:
+            List[DownloadJob]: Jobs.
+        """
+
+        path = self.getQueuePath()
+        if(not os.path.exists(path)):
+            return []
+
+        try:
+            with open(path, "r", encoding = "utf-8") as file:
+                return [DownloadJob(**_) for _ in json.load(file)]
+        except (OSError, ValueError, TypeError) as e:
+            printS("Could not read download queue ", path, ": ", e, color = BashColor.FAIL)
+            return []
+
+    def mergeJobs(self, storedJobs: List[DownloadJob]) -> None:
+        """
+        Merge jobs from file with jobs of this process by ID. Jobs owned by this process are kept as they are, jobs of other processes are replaced by what they saved.
+        Queued and running jobs of processes no longer running are taken over and queued again, jobs of other processes no longer in file were removed by them.
+
+        Args:
+            storedJobs (List[DownloadJob]): Jobs from file.
+        """
+
+        with DownloadQueueService.condition:
+            pid = os.getpid()
+            storedIds = set(_.id for _ in storedJobs)
+            for id in [_.id for _ in DownloadQueueService.jobs.values() if _.ownerPid != pid and _.id not in storedIds]:
+                del DownloadQueueService.jobs[id]
+
+            adopted = 0
+            for job in storedJobs:
+                current = DownloadQueueService.jobs.get(job.id)
+                if(job.id in DownloadQueueService.removedIds or (current != None and current.ownerPid == pid)):
+                    continue
+
+                if(job.status in [DownloadJobStatus.QUEUED.value, DownloadJobStatus.RUNNING.value] and (job.ownerPid == None or not isProcessRunning(job.ownerPid))):
+                    job.ownerPid = pid
+                    job.status = DownloadJobStatus.QUEUED.value
+                    job.downloadedBytes = 0
+                    job.bytesPerSecond = 0.0
+                    adopted += 1
+
+                DownloadQueueService.jobs[job.id] = job
+
+            if(adopted > 0):
+                DownloadQueueService.condition.notify_all()
+
+    def save(self, force: bool = True) -> None:
+        """
+        Save jobs to file, merged with jobs saved by other processes while holding a lock on the file shared by the processes.
+
+        Args:
+            force (bool, optional): Save even if saved less than a second ago. Defaults to True.
+        """
+
+        with DownloadQueueService.condition:
+            now = time.monotonic()
+            if(not force and now - DownloadQueueService.lastSaved < 1):
+                return
+
+            DownloadQueueService.lastSaved = now
+            DownloadQueueService.lastRefreshed = now
+            with DownloadQueueService.fileLock:
+                self.mergeJobs(self.load())
+                path = self.getQueuePath()
+                tempPath = path + ".tmp"
+                with open(tempPath, "w", encoding = "utf-8") as file:
+                    json.dump([_.__dict__ for _ in DownloadQueueService.jobs.values()], file, default = str)
+                os.replace(tempPath, path)
+                DownloadQueueService.removedIds.clear()
+
+    def refresh(self) -> None:
+        """
+        Merge jobs saved by other processes, at most once a second.
+        """
+
+        with DownloadQueueService.condition:
+            now = time.monotonic()
+            if(now - DownloadQueueService.lastRefreshed < 1):
+                return
+
+            DownloadQueueService.lastRefreshed = now
+            with DownloadQueueService.fileLock:
+                self.mergeJobs(self.load())
+
+    def submit(self, url: str, directory: str, fileExtension: str = "mp4", nameRegex: re.Pattern = None, prefix: str = None, name: str = None) -> DownloadJob:
+        """
+        Add a download to the queue and make sure workers are running.
+
+        Args:
+            url (str): URL to stream.
+            directory (str): Directory (under self.settings.localStoragePath) to save downloaded content.
+            fileExtension (str): File extension of stream.
+            nameRegex (Pattern[str]): Regex to use for name.
+            prefix (str): Any string to prefix filename with.
+            name (str): Name of stream, used in progress prints.
+
+        Returns:
+            DownloadJob: Job queued.
+        """
+
+        job = DownloadJob(url = url,
+            directory = directory,
+            fileExtension = fileExtension,
+            nameRegex = nameRegex.pattern if(nameRegex != None) else None,
+            prefix = prefix,
+            name = name,
+            ownerPid = os.getpid(),
+            id = str(uuid.uuid4()))
+
+        with DownloadQueueService.condition:
+            DownloadQueueService.jobs[job.id] = job
+            DownloadQueueService.jobContexts[job.id] = contextvars.copy_context()
+            self.save()
+            DownloadQueueService.condition.notify_all()
+
+        self.startWorkers()
+        return job
+
+    def startWorkers(self) -> None:
+        """
+        Start worker threads, up to downloadWorkers in settings, if not already running.
+        """
+
+        with DownloadQueueService.condition:
+            DownloadQueueService.workers = [_ for _ in DownloadQueueService.workers if _.is_alive()]
+            while(len(DownloadQueueService.workers) < max(1, self.settings.downloadWorkers)):
+                worker = threading.Thread(target = self.runWorker, daemon = True)
+                DownloadQueueService.workers.append(worker)
+                worker.start()
+
+    def getHost(self, url: str) -> str:
+        host = urlparse(url).netloc.lower()
+        return host[4:] if(host.startswith("www.")) else host
+
+    def takeNextJob(self) -> DownloadJob:
+        """
+        Wait for and take the oldest queued job of this process whose host is below the per-host limit.
+
+        Returns:
+            DownloadJob: Job, marked as running.
+        """
+
+        with DownloadQueueService.condition:
+            while(True):
+                for job in DownloadQueueService.jobs.values():
+                    if(job.status != DownloadJobStatus.QUEUED.value or job.ownerPid != os.getpid()):
+                        continue
+
+                    host = self.getHost(job.url)
+                    if(DownloadQueueService.runningByHost.get(host, 0) >= max(1, self.settings.downloadConcurrencyPerHost)):
+                        continue
+
+                    DownloadQueueService.runningByHost[host] = DownloadQueueService.runningByHost.get(host, 0) + 1
+                    job.status = DownloadJobStatus.RUNNING.value
+                    job.started = getDateTime()
+                    job.downloadedBytes = 0
+                    self.save()
+                    return job
+
+                DownloadQueueService.condition.wait()
+
+    def runWorker(self) -> None:
+        """
+        Run queued jobs until the program exits.
+        """
+
+        while(True):
+            job = self.takeNextJob()
+            with DownloadQueueService.condition:
+                context = DownloadQueueService.jobContexts.pop(job.id, None)
+
+            if(context != None):
+                context.run(self.runAndCompleteJob, job)
+            else:
+                self.runAndCompleteJob(job)
+
+    def runAndCompleteJob(self, job: DownloadJob) -> None:
+        """
+        Run a job taken from the queue and mark it as completed.
+
+        Args:
+            job (DownloadJob): Job, marked as running.
+        """
+
+        self.runJob(job)
+
+        with DownloadQueueService.condition:
+            host = self.getHost(job.url)
+            DownloadQueueService.runningByHost[host] -= 1
+            job.completed = getDateTime()
+            self.save()
+            DownloadQueueService.condition.notify_all()
+
+        printS(job.summaryString(), color = BashColor.OKGREEN if(job.status == DownloadJobStatus.DONE.value) else BashColor.FAIL)
+
+    def runJob(self, job: DownloadJob) -> None:
+        """
+        Download a job, updating its progress and throughput while downloading.
+
+        Args:
+            job (DownloadJob): Job to run.
+        """
+
+        started = time.monotonic()
+        progress = { "fileBytes": 0, "doneBytes": 0 }
+
+        def onProgress(downloadedBytes: int, totalBytes: int) -> None:
+            # yt_dlp reports bytes per file, video and audio are separate files when merged
+            if(downloadedBytes < progress["fileBytes"]):
+                progress["doneBytes"] += progress["fileBytes"]
+            delta = downloadedBytes - progress["fileBytes"] if(downloadedBytes >= progress["fileBytes"]) else downloadedBytes
+            progress["fileBytes"] = downloadedBytes
+
+            job.downloadedBytes = progress["doneBytes"] + downloadedBytes
+            if(totalBytes):
+                job.totalBytes = progress["doneBytes"] + totalBytes
+            job.bytesPerSecond = job.downloadedBytes / max(time.monotonic() - started, 0.001)
+            self.throttle(delta)
+            self.save(force = False)
+
+        try:
+            nameRegex = re.compile(job.nameRegex) if(job.nameRegex != None) else None
+            job.path = self.downloadService.download(job.url, job.directory, job.fileExtension, nameRegex, job.prefix, progressCallback = onProgress)
+            job.status = DownloadJobStatus.DONE.value if(job.path != None) else DownloadJobStatus.FAILED.value
+        except Exception as e:
+            job.error = str(e)
+            job.status = DownloadJobStatus.FAILED.value
+
+    def throttle(self, nBytes: int) -> None:
+        """
+        Wait as needed to keep total download speed of all workers below downloadBandwidthLimitKbps in settings.
+
+        Args:
+            nBytes (int): Bytes downloaded since last call.
+        """
+
+        limit = self.settings.downloadBandwidthLimitKbps * 1024
+        if(limit <= 0 or nBytes <= 0):
+            return
+
+        with DownloadQueueService.bandwidthLock:
+            now = time.monotonic()
+            if(DownloadQueueService.bandwidthChecked == None):
+                DownloadQueueService.bandwidthChecked = now
+            # Allowance is refilled over time and capped at one second of bandwidth
+            DownloadQueueService.bandwidthAllowance = min(limit, DownloadQueueService.bandwidthAllowance + (now - DownloadQueueService.bandwidthChecked) * limit)
+            DownloadQueueService.bandwidthChecked = now
+            DownloadQueueService.bandwidthAllowance -= nBytes
+            waitSeconds = -DownloadQueueService.bandwidthAllowance / limit if(DownloadQueueService.bandwidthAllowance < 0) else 0
+
+        if(waitSeconds > 0):
+            time.sleep(waitSeconds)
+
+    def getJobs(self, jobIds: List[str] = None) -> List[DownloadJob]:
+        """
+        Get jobs, newest last.
+
+        Args:
+            jobIds (List[str], optional): IDs of jobs to get. Defaults to None, all jobs.
+
+        Returns:
+            List[DownloadJob]: Jobs.
+        """
+
+        with DownloadQueueService.condition:
+            if(jobIds == None):
+                self.refresh()
+                return list(DownloadQueueService.jobs.values())
+
+            return [DownloadQueueService.jobs[_] for _ in jobIds if _ in DownloadQueueService.jobs]
+
+    def wait(self, jobIds: List[str], printInterval: int = 5, onDone: Callable = None) -> List[DownloadJob]:
+        """
+        Wait for jobs to finish, printing progress of running jobs.
+
+        Args:
+            jobIds (List[str]): IDs of jobs to wait for.
+            printInterval (int, optional): Seconds between progress prints. Defaults to 5.
+            onDone (Callable, optional): Function called with each job when it finishes. Defaults to None.
+
+        Returns:
+            List[DownloadJob]: Jobs, in the same order as jobIds.
+        """
+
+        self.startWorkers()
+        remaining = list(jobIds)
+        lastPrinted = time.monotonic()
+        while(len(remaining) > 0):
+            with DownloadQueueService.condition:
+                DownloadQueueService.condition.wait(timeout = 1)
+                jobs = self.getJobs(remaining)
+
+            for job in jobs:
+                if(job.status in [DownloadJobStatus.DONE.value, DownloadJobStatus.FAILED.value]):
+                    remaining.remove(job.id)
+                    if(onDone != None):
+                        onDone(job)
+
+            if(time.monotonic() - lastPrinted >= printInterval):
+                lastPrinted = time.monotonic()
+                for job in jobs:
+                    if(job.status == DownloadJobStatus.RUNNING.value):
+                        printD(job.summaryString(), debug = True)
+
+        return self.getJobs(jobIds)
+
+    def clearFinished(self) -> int:
+        """
+        Remove finished and failed jobs from the queue.
+
+        Returns:
+            int: Number of jobs removed.
+        """
+
+        with DownloadQueueService.condition:
+            finishedIds = [_.id for _ in DownloadQueueService.jobs.values() if _.status in [DownloadJobStatus.DONE.value, DownloadJobStatus.FAILED.value]]
+            for id in finishedIds:
+                del DownloadQueueService.jobs[id]
+            DownloadQueueService.removedIds.update(finishedIds)
+            self.save()
+
+        return len(finishedIds)
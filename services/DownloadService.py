@@ -1,33 +1,44 @@
 import json
 import os
 import re
-import urllib.request
 from re import Pattern
+from typing import Callable
 
-import mechanize
-from bs4 import BeautifulSoup
 from grdException.ArgumentException import ArgumentException
 from grdException.NotImplementedException import NotImplementedException
 from grdUtil.BashColor import BashColor
 from grdUtil.DateTimeUtil import getDateTimeAsNumber
 from grdUtil.FileUtil import mkdir
 from grdUtil.InputUtil import BashColor, sanitize
-from grdUtil.PrintUtil import printD, printS
-from jsonpath_ng import parse
-import yt_dlp
 
+from LazyImport import LazyModule
+from services.HttpService import HttpService
+from services.TaskService import printD, printS
+from services.YoutubeDlService import YoutubeDlService
 from Settings import Settings
+from storage.DownloadCatalog import DownloadCatalog
+
+bs4 = LazyModule("bs4")
+jsonpath_ng = LazyModule("jsonpath_ng")
 
 
 class DownloadService():
     settings: Settings = None
+    httpService: HttpService = None
+    youtubeDlService: YoutubeDlService = None
+    downloadCatalog: DownloadCatalog = None
     
     def __init__(self):
         self.settings = Settings()
+        self.httpService = HttpService()
+        self.youtubeDlService = YoutubeDlService()
+        # Shared, all DownloadServices write the same file
+        if(DownloadService.downloadCatalog == None):
+            DownloadService.downloadCatalog = DownloadCatalog(os.path.join(self.settings.localStoragePath, "downloadCatalog.json"))
         
-    def download(self, url: str, directory: str, fileExtension: str = "mp4", nameRegex: Pattern[str] = None, prefix: str = None) -> str:
+    def download(self, url: str, directory: str, fileExtension: str = "mp4", nameRegex: Pattern[str] = None, prefix: str = None, progressCallback: Callable[[int, int], None] = None) -> str:
         """
-        Download stream given by URL.
+        Download stream given by URL, unless it is already downloaded to directory according to the download catalog.
 
         Args:
             url (str): URL to stream.
@@ -35,6 +46,7 @@ class DownloadService():
             fileExtension (str): File extension of stream.
             nameRegex (Pattern[str]): Regex to use for name.
             prefix (str): Any string to prefix filename with.
+            progressCallback (Callable[[int, int], None], optional): Function called with bytes downloaded and total bytes (None if unknown) while downloading. Defaults to None.
 
         Returns:
             str: Absolute path of file.
@@ -43,12 +55,44 @@ class DownloadService():
         youtubeRegex = re.compile(r'(\.|\/)youtu(\.?)be(\.|\/)')
         odyseeRegex = re.compile(r'(\.|\/)odysee\.')
         
+        downloadedPath = self.downloadCatalog.getDownloaded(url, directory)
+        if(downloadedPath != None):
+            printD("Already downloaded ", url, " to ", downloadedPath, ", skipped.", debug = self.settings.debug)
+            return downloadedPath
+        
+        videoPath = None
         if(youtubeRegex.search(url)):
-            return self.downloadYoutube(url, directory, fileExtension, nameRegex, prefix)
-        if(odyseeRegex.search(url)):
-            return self.downloadOdysee(url, directory, fileExtension, nameRegex, prefix)
+            videoPath = self.downloadYoutube(url, directory, fileExtension, nameRegex, prefix, progressCallback)
+        elif(odyseeRegex.search(url)):
+            videoPath = self.downloadOdysee(url, directory, fileExtension, nameRegex, prefix, progressCallback)
+        else:
+            raise NotImplementedException("No implementation for url: %s" % url)
+        
+        if(videoPath != None):
+            self.downloadCatalog.complete(url, directory, videoPath)
+        
+        return videoPath
+    
+    def getResumablePath(self, url: str, directory: str, videoPath: str) -> str:
+        """
+        Get path to download to, the path of an interrupted download of the same stream if any so partial files are resumed, and record the download as started.
+
+        Args:
+            url (str): URL to stream.
+            directory (str): Directory (under self.settings.localStoragePath) to save downloaded content.
+            videoPath (str): Path to use for a new download.
+
+        Returns:
+            str: Absolute path of file.
+        """
         
-        raise NotImplementedException("No implementation for url: %s" % url)
+        partialPath = self.downloadCatalog.getPartial(url, directory)
+        if(partialPath != None):
+            printS("Resuming download of ", url, " to ", partialPath)
+            videoPath = partialPath
+        
+        self.downloadCatalog.start(url, directory, videoPath)
+        return videoPath
         
     def getVideoPath(self, sourceName: str, name: str, fileExtension: str, nameRegex: Pattern[str] = None, prefix: str = None) -> str:
         """
@@ -91,7 +135,7 @@ class DownloadService():
         videoFilename = sanitize(videoFilename, mode = 3)
         return os.path.join(directory, videoFilename)
 
-    def downloadYoutube(self, url: str, directory: str = "youtube", fileExtension: str = "mp4", nameRegex: Pattern[str] = None, prefix: str = None) -> str:
+    def downloadYoutube(self, url: str, directory: str = "youtube", fileExtension: str = "mp4", nameRegex: Pattern[str] = None, prefix: str = None, progressCallback: Callable[[int, int], None] = None) -> str:
         """
         Download a Youtube video to given directory.
 
@@ -101,6 +145,7 @@ class DownloadService():
             fileExtension (str): File extension of stream.
             nameRegex (Pattern[str]): Regex to use for name.
             prefix (str): Any string to prefix filename with.
+            progressCallback (Callable[[int, int], None], optional): Function called with bytes downloaded and total bytes (None if unknown) while downloading. Defaults to None.
 
         Returns:
             str: Absolute path of file.
@@ -113,29 +158,30 @@ class DownloadService():
                 'noplaylist': True,
             }
             
-            # We need the title first to use getVideoPath correctly
-            with yt_dlp.YoutubeDL({'quiet': True}) as ydl:
+            hook = None
+            if(progressCallback != None):
+                hook = lambda d: progressCallback(d.get("downloaded_bytes") or 0, d.get("total_bytes") or d.get("total_bytes_estimate"))
+
+            # Format is read when YoutubeDL is created, so instances are shared per file extension
+            with self.youtubeDlService.use(f"download-{fileExtension}", ydl_opts, progressCallback = hook) as ydl:
+                # Extract once, resolving formats, and download from the same info instead of extracting again in ydl.download
                 info = ydl.extract_info(url, download=False)
                 videoTitle = info.get('title', 'unknown_video')
 
-            # Re-calculate path using existing logic to respect regex/prefix/sanitization
-            videoPath = self.getVideoPath(directory, videoTitle, fileExtension, nameRegex, prefix)
-            
-            # Update opts with the actual target filename
-            target_dir = os.path.dirname(videoPath)
-            target_filename = os.path.basename(videoPath)
-            ydl_opts['outtmpl'] = os.path.join(target_dir, target_filename)
-
-            printS("Downloading video from ", url)
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                ydl.download([url])
+                # Calculate path using existing logic to respect regex/prefix/sanitization
+                videoPath = self.getResumablePath(url, directory, self.getVideoPath(directory, videoTitle, fileExtension, nameRegex, prefix))
+                # Same path as an interrupted download, so yt_dlp continues its .part file
+                ydl.params['outtmpl'] = { 'default': videoPath.replace('%', '%%') } # Escape, outtmpl is a template
+
+                printS("Downloading video from ", url)
+                ydl.process_info(info)
             
             return videoPath
         except Exception as e:
             printS("Failed download video: ", e, color = BashColor.FAIL)
             return None
 
-    def downloadOdysee(self, url: str, directory: str = "odysee", fileExtension: str = "mp4", nameRegex: Pattern[str] = None, prefix: str = None) -> str:
+    def downloadOdysee(self, url: str, directory: str = "odysee", fileExtension: str = "mp4", nameRegex: Pattern[str] = None, prefix: str = None, progressCallback: Callable[[int, int], None] = None) -> str:
         """
         Download a Youtube video to given directory.
 
@@ -145,21 +191,20 @@ class DownloadService():
             fileExtension (str): File extension of stream.
             nameRegex (Pattern[str]): Regex to use for name.
             prefix (str): Any string to prefix filename with.
+            progressCallback (Callable[[int, int], None], optional): Function called with bytes downloaded and total bytes (None if unknown) while downloading. Defaults to None.
 
         Returns:
             str: Absolute path of file.
         """
         
-        br = mechanize.Browser()
-        br.set_handle_robots(False)
-        br.addheaders = [('User-agent', 'Mozilla/5.0 (X11; U; Linux i686; en-US; rv:1.9.0.1) Gecko/2008071615 Fedora/3.0.1-1.fc9 Firefox/3.0.1')]
         videoTitle = None
         fileUrl = None
         try:
             printS("Fetching data for video ", url)
-            br.open(url)
-            html = br.response().read()
-            document = BeautifulSoup(html, 'html.parser')
+            response = self.httpService.get(url)
+            response.raise_for_status()
+            html = response.content
+            document = bs4.BeautifulSoup(html, 'html.parser')
             scriptContent = document.find("script", { "type": "application/ld+json" })
             if(scriptContent == None):
                 printS("No content was found for URL \"", url, "\". Please check that the URL is correct.", color = BashColor.FAIL)
@@ -169,8 +214,8 @@ class DownloadService():
             printD(jsonString, debug = (self.settings.debug and False))
             printD("Reading JSON...", debug = self.settings.debug)
             jsonData = json.loads(jsonString)
-            videoTitle = parse("$.name").find(jsonData)[0].value
-            fileUrl = parse("$.contentUrl").find(jsonData)[0].value
+            videoTitle = jsonpath_ng.parse("$.name").find(jsonData)[0].value
+            fileUrl = jsonpath_ng.parse("$.contentUrl").find(jsonData)[0].value
             printD("File URL: ", fileUrl, debug = self.settings.debug)
         except Exception as e:
             printS("Failed getting video: ", e, color = BashColor.FAIL)
@@ -184,9 +229,9 @@ class DownloadService():
             videoTitle = "unknown_video"
             printS("Failed getting title, defaulting to ", videoTitle, color = BashColor.FAIL)
         
-        videoPath = self.getVideoPath(directory, videoTitle, fileExtension, nameRegex, prefix)
+        videoPath = self.getResumablePath(url, directory, self.getVideoPath(directory, videoTitle, fileExtension, nameRegex, prefix))
         try:
-            urllib.request.urlretrieve(fileUrl, videoPath) 
+            self.httpService.downloadFile(fileUrl, videoPath, progressCallback)
         except Exception as e:
             printS("Failed download video: ", e, color = BashColor.FAIL)
             return None
@@ -0,0 +1,616 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple, TypeVar
+
+from grdService.BaseService import BaseService
+from grdUtil.DateTimeUtil import getDateTime
+from grdUtil.PrintUtil import printD
+
+from Settings import Settings
+from storage.EntityCache import EntityCache
+from storage.EntityChangeLog import EntityChangeLog
+from storage.EntityJournal import EntityJournal
+from storage.SearchIndex import SearchIndex
+from storage.SqliteRepository import SqliteRepository
+
+T = TypeVar("T")
+
+class EntityService(BaseService[T]):
+    settings = Settings()
+    cache = EntityCache(settings.entityCacheSize)
+    journal = EntityJournal(os.path.join(settings.localStoragePath, "journal.jsonl"), settings.journalCompactSeconds) if(settings.journalUpdates and settings.storageBackend != "sqlite") else None
+    getManyWorkers: int = 8
+    entityType: type = None
+    storagePath: str = None
+    repository: SqliteRepository = None
+    changeLog: EntityChangeLog = None
+    cachePositions: Dict[str, object] = {}
+    searchFields: List[str] = ["name", "uri"]
+    searchIndexes: Dict[str, SearchIndex] = {}
+    searchIndexesSynced: List[str] = []
+    searchIndexesLock: threading.RLock = threading.RLock()
+
+    def __init__(self, entityType: type, debug: bool, storagePath: str):
+        self.entityType = entityType
+        self.storagePath = storagePath
+
+        BaseService.__init__(self, entityType, debug, storagePath)
+
+        if(self.settings.storageBackend == "sqlite"):
+            self.repository = SqliteRepository(self.settings.sqlitePath, entityType.__name__, entityType)
+        else:
+            self.changeLog = EntityChangeLog(os.path.join(self.settings.localStoragePath, f"{entityType.__name__}.changes.log"))
+            if(self.journal != None):
+                self.journal.register(storagePath, entityType, self.writeFromJournal)
+
+    def getFilePath(self, id: str) -> str:
+        """
+        Get path of file entity with ID is stored in.
+
+        Args:
+            id (str): ID of entity.
+
+        Returns:
+            str: Absolute file path.
+        """
+
+        return os.path.join(self.storagePath, f"{id}.json")
+
+    def get(self, id: str, includeSoftDeleted: bool = False) -> T:
+        """
+        Get entity by ID, from cache if the file has not changed since it was last read.
+
+        Args:
+            id (str): ID of entity to get.
+            includeSoftDeleted (bool, optional): Should include soft-deleted entities. Defaults to False.
+
+        Returns:
+            T | None: Entity if found, else None.
+        """
+
+        if(id == None):
+            return None
+
+        if(self.repository != None):
+            return self.repository.get(id, includeSoftDeleted)
+
+        entity = self.getFromJournal(id)
+        if(entity == None):
+            entity = self.cache.get(self.getFilePath(id))
+        if(entity == None):
+            entity = self.getFromStorage(id)
+
+        if(entity == None or (entity.deleted != None and not includeSoftDeleted)):
+            return None
+
+        return entity
+
+    def getMany(self, ids: List[str], includeSoftDeleted: bool = False) -> List[T]:
+        """
+        Get entities by IDs in one pass, reading entities not in cache in parallel.
+
+        Args:
+            ids (List[str]): IDs of entities to get.
+            includeSoftDeleted (bool, optional): Should include soft-deleted entities. Defaults to False.
+
+        Returns:
+            List[T | None]: Entities in the same order as ids, None where an entity was not found.
+        """
+
+        if(self.repository != None):
+            return self.repository.getMany(ids, includeSoftDeleted)
+
+        entities = {}
+        missingIds = []
+        validated = self.validateCache()
+        for id in dict.fromkeys(ids):
+            entity = self.getFromJournal(id)
+            if(entity == None and id != None):
+                entity = self.cache.get(self.getFilePath(id), validate = not validated)
+            if(entity == None and id != None):
+                missingIds.append(id)
+            entities[id] = entity
+
+        if(len(missingIds) == 1):
+            entities[missingIds[0]] = self.getFromStorage(missingIds[0])
+        elif(len(missingIds) > 1):
+            with ThreadPoolExecutor(max_workers = self.getManyWorkers) as executor:
+                for id, entity in zip(missingIds, executor.map(self.getFromStorage, missingIds)):
+                    entities[id] = entity
+
+        result = []
+        for id in ids:
+            entity = entities.get(id)
+            if(entity != None and entity.deleted != None and not includeSoftDeleted):
+                entity = None
+            result.append(entity)
+
+        return result
+
+    def validateCache(self) -> bool:
+        """
+        Remove entities changed by any process since the cache was last validated from it, so cached entities can be used without checking their files, e.g. once for a batch.
+        Files changed outside of this program are only seen by get, which checks the file of every entity.
+
+        Returns:
+            bool: True if cache was validated, False if changes since are not known and files must be checked.
+        """
+
+        typeName = self.entityType.__name__
+        changedIds, position = self.changeLog.getChangedSince(EntityService.cachePositions.get(typeName))
+        EntityService.cachePositions[typeName] = position
+        if(changedIds == None):
+            return False
+
+        for id in changedIds:
+            self.cache.invalidate(self.getFilePath(id))
+
+        return True
+
+    def getFromStorage(self, id: str) -> T:
+        """
+        Get entity by ID from storage, bypassing and then updating the cache.
+
+        Args:
+            id (str): ID of entity to get.
+
+        Returns:
+            T | None: Entity if found, including soft-deleted entities, else None.
+        """
+
+        # Always read soft-deleted entities so the cache serves both cases
+        entity = BaseService.get(self, id, True)
+        self.cache.put(self.getFilePath(id), entity)
+
+        return entity
+
+    def getFromJournal(self, id: str) -> T:
+        """
+        Get entity by ID from journal, if it has updates not yet written to its file.
+
+        Args:
+            id (str): ID of entity to get.
+
+        Returns:
+            T | None: Entity if in journal, including soft-deleted entities, else None.
+        """
+
+        if(self.journal == None or id == None):
+            return None
+
+        return self.journal.get(self.getFilePath(id))
+
+    def getAll(self, includeSoftDeleted: bool = False) -> List[T]:
+        """
+        Get all entities.
+
+        Args:
+            includeSoftDeleted (bool, optional): Should include soft-deleted entities. Defaults to False.
+
+        Returns:
+            List[T]: Entities.
+        """
+
+        if(self.repository != None):
+            return self.repository.getAll(includeSoftDeleted)
+
+        if(self.journal == None):
+            return BaseService.getAll(self, includeSoftDeleted)
+
+        entities = [self.getFromJournal(_.id) or _ for _ in BaseService.getAll(self, True)]
+        return [_ for _ in entities if includeSoftDeleted or _.deleted == None]
+
+    def getAllIds(self, includeSoftDeleted: bool = False) -> List[str]:
+        """
+        Get IDs of all entities.
+
+        Args:
+            includeSoftDeleted (bool, optional): Should include soft-deleted entities. Defaults to False.
+
+        Returns:
+            List[str]: IDs.
+        """
+
+        if(self.repository != None):
+            return self.repository.getAllIds(includeSoftDeleted)
+
+        if(self.journal == None or includeSoftDeleted):
+            return BaseService.getAllIds(self, includeSoftDeleted)
+
+        return [_.id for _ in self.getAll(includeSoftDeleted)]
+
+    def exists(self, id: str) -> bool:
+        """
+        Check if entity with ID exists, including soft-deleted entities.
+
+        Args:
+            id (str): ID of entity.
+
+        Returns:
+            bool: Result.
+        """
+
+        if(self.repository != None):
+            return self.repository.exists(id)
+
+        return BaseService.exists(self, id)
+
+    def add(self, entity: T) -> T:
+        """
+        Add entity, removing any cached entity with the same ID.
+
+        Args:
+            entity (T): Entity to add.
+
+        Returns:
+            T | None: Entity if added, else None.
+        """
+
+        if(self.repository != None):
+            result = self.repository.add(entity)
+        else:
+            result = BaseService.add(self, entity)
+            if(result != None):
+                self.cache.invalidate(self.getFilePath(result.id))
+                self.changeLog.append([result.id])
+
+        if(result != None):
+            self.indexSearchFields(result)
+
+        return result
+
+    def update(self, entity: T, *args, **kwargs) -> T:
+        """
+        Update entity and remove it from cache. If the journal is enabled, the update is appended to it and written to file later.
+
+        Args:
+            entity (T): Entity to update.
+
+        Returns:
+            T | None: Entity if updated, else None.
+        """
+
+        if(self.repository != None):
+            result = self.repository.update(entity, *args, **kwargs)
+        elif(self.journal != None and len(args) == 0 and len(kwargs) == 0):
+            path = self.getFilePath(entity.id)
+            if(self.journal.get(path) == None and not os.path.exists(path)):
+                return None
+
+            self.journal.append(path, entity)
+            result = entity
+            self.changeLog.append([entity.id])
+        else:
+            self.flushJournal(entity.id)
+            result = BaseService.update(self, entity, *args, **kwargs)
+            self.cache.invalidate(self.getFilePath(entity.id))
+            if(result):
+                self.changeLog.append([entity.id])
+
+        if(result):
+            self.indexSearchFields(entity)
+
+        return result
+
+    def delete(self, id: str, *args, **kwargs) -> T:
+        """
+        Soft delete entity with ID and remove it from cache.
+
+        Args:
+            id (str): ID of entity to delete.
+
+        Returns:
+            T | None: Entity if deleted, else None.
+        """
+
+        if(self.repository != None):
+            result = self.repository.delete(id)
+        else:
+            self.flushJournal(id)
+            result = BaseService.delete(self, id, *args, **kwargs)
+            self.cache.invalidate(self.getFilePath(id))
+            if(result != None):
+                self.changeLog.append([id])
+
+        if(result != None):
+            self.indexSearchFields(self.get(id, includeSoftDeleted = True))
+
+        return result
+
+    def restore(self, id: str, *args, **kwargs) -> T:
+        """
+        Restore entity with ID and remove it from cache.
+
+        Args:
+            id (str): ID of entity to restore.
+
+        Returns:
+            T | None: Entity if restored, else None.
+        """
+
+        if(self.repository != None):
+            result = self.repository.restore(id)
+        else:
+            self.flushJournal(id)
+            result = BaseService.restore(self, id, *args, **kwargs)
+            self.cache.invalidate(self.getFilePath(id))
+            if(result != None):
+                self.changeLog.append([id])
+
+        if(result != None):
+            self.indexSearchFields(self.get(id, includeSoftDeleted = True))
+
+        return result
+
+    def remove(self, id: str, *args, **kwargs) -> T:
+        """
+        Permanently remove entity with ID and remove it from cache.
+
+        Args:
+            id (str): ID of entity to remove.
+
+        Returns:
+            T | None: Entity if removed, else None.
+        """
+
+        if(self.repository != None):
+            result = self.repository.remove(id, *args, **kwargs)
+        else:
+            self.flushJournal(id)
+            result = BaseService.remove(self, id, *args, **kwargs)
+            self.cache.invalidate(self.getFilePath(id))
+            if(result != None):
+                self.changeLog.append([id])
+
+        searchIndex = self.searchIndexes.get(self.entityType.__name__)
+        if(result != None and searchIndex != None):
+            searchIndex.removeEntity(id)
+
+        return result
+
+    def updateMany(self, entities: List[T]) -> List[T]:
+        """
+        Update entities already read in one batch: one transaction in the database, or one write to the journal if it is enabled.
+
+        Args:
+            entities (List[T]): Entities to update.
+
+        Returns:
+            List[T]: Entities updated.
+        """
+
+        entities = [_ for _ in entities if _ != None]
+        if(self.repository != None):
+            self.repository.upsertMany(entities)
+            result = entities
+        elif(self.journal != None):
+            updates = {}
+            for entity in entities:
+                path = self.getFilePath(entity.id)
+                if(self.journal.get(path) != None or os.path.exists(path)):
+                    updates[path] = entity
+
+            self.journal.appendMany(updates)
+            result = list(updates.values())
+            self.changeLog.append([_.id for _ in result])
+        else:
+            # Every entity has its own file, update writes and indexes each
+            return [_ for _ in entities if EntityService.update(self, _)]
+
+        for entity in result:
+            self.indexSearchFields(entity)
+
+        return result
+
+    def deleteMany(self, entities: List[T]) -> List[T]:
+        """
+        Soft delete entities already read, writing each once instead of reading it again like delete.
+
+        Args:
+            entities (List[T]): Entities to delete.
+
+        Returns:
+            List[T]: Entities deleted.
+        """
+
+        deleted = getDateTime()
+        entities = [_ for _ in entities if _ != None and _.deleted == None]
+        for entity in entities:
+            entity.deleted = deleted
+
+        return EntityService.updateMany(self, entities)
+
+    def removeMany(self, ids: List[str]) -> List[str]:
+        """
+        Permanently remove entities with IDs, including soft-deleted entities, without reading them first like remove.
+
+        Args:
+            ids (List[str]): IDs of entities to remove.
+
+        Returns:
+            List[str]: IDs of entities removed.
+        """
+
+        if(self.repository != None):
+            removed = self.repository.removeMany(ids)
+        else:
+            removed = []
+            for id in dict.fromkeys(ids):
+                path = self.getFilePath(id)
+                if(self.journal != None):
+                    # Updates not yet written are dropped, the file is removed anyway
+                    self.journal.discard(path)
+
+                try:
+                    os.remove(path)
+                    removed.append(id)
+                except FileNotFoundError:
+                    pass
+
+                self.cache.invalidate(path)
+
+            self.changeLog.append(removed)
+
+        searchIndex = self.searchIndexes.get(self.entityType.__name__)
+        if(searchIndex != None):
+            for id in removed:
+                searchIndex.removeEntity(id)
+
+        return removed
+
+    def flushJournal(self, id: str) -> None:
+        """
+        Write entity with ID from journal to its file, if it has updates not yet written, so it can be changed directly.
+
+        Args:
+            id (str): ID of entity.
+        """
+
+        if(self.journal == None):
+            return
+
+        entity = self.journal.discard(self.getFilePath(id))
+        if(entity != None):
+            self.writeFromJournal(entity)
+
+    def writeFromJournal(self, entity: T) -> None:
+        """
+        Write entity from journal to its file.
+
+        Args:
+            entity (T): Entity to write.
+        """
+
+        BaseService.update(self, entity)
+        self.cache.invalidate(self.getFilePath(entity.id))
+        # Logged again now that the file changed, so other processes drop what they cached of the file since it was journaled
+        self.changeLog.append([entity.id])
+
+    def importToSqlite(self) -> int:
+        """
+        Import all entities from JSON-files to the SQLite database, replacing entities with the same ID.
+
+        Returns:
+            int: Number of entities imported.
+        """
+
+        repository = self.repository
+        if(repository == None):
+            repository = SqliteRepository(self.settings.sqlitePath, self.entityType.__name__, self.entityType)
+
+        return repository.upsertMany(self.getAll(True) if(self.repository == None) else BaseService.getAll(self, True))
+
+    def printCacheStats(self) -> None:
+        """
+        Print hit/miss counters of the entity cache shared by all services, if debug is enabled.
+        """
+
+        printD(self.cache.getStatsString(), debug = self.settings.debug)
+
+    def getStorageSignatures(self) -> Dict[str, tuple]:
+        """
+        Get signature (modified time and size of file) of every stored entity, used to find entities changed since they were indexed.
+
+        Returns:
+            Dict[str, tuple | None]: Signatures by ID, None for every entity if stored in the database.
+        """
+
+        if(self.repository != None):
+            return {id: None for id in self.getAllIds(includeSoftDeleted = True)}
+
+        signatures = {}
+        if(os.path.isdir(self.storagePath)):
+            for entry in os.scandir(self.storagePath):
+                if(entry.name.endswith(".json")):
+                    signatures[entry.name[:-5]] = self.cache.getSignature(entry.path)
+
+        return signatures
+
+    def getChangedIdsSince(self, position: object) -> Tuple[List[str], object]:
+        """
+        Get IDs of entities added, changed, or removed by any process since position, used to update what is derived from entities without checking every entity.
+
+        Args:
+            position (object | None): Position returned by an earlier call, e.g. saved with an index when it was last synced.
+
+        Returns:
+            Tuple[List[str] | None, object]: IDs of entities changed, None if not known, e.g. position is None or too old, and current position.
+        """
+
+        if(self.repository != None):
+            return self.repository.getChangedSince(position)
+
+        return self.changeLog.getChangedSince(position)
+
+    def getSearchIndex(self) -> SearchIndex:
+        """
+        Get index of searchable fields of entities of this type, loaded and synced with stored entities the first time it is used.
+
+        Returns:
+            SearchIndex: Index.
+        """
+
+        typeName = self.entityType.__name__
+        with EntityService.searchIndexesLock:
+            searchIndex = EntityService.searchIndexes.get(typeName)
+            if(searchIndex == None):
+                searchIndex = SearchIndex(os.path.join(self.settings.localStoragePath, "SearchIndex", f"{typeName}.json"))
+                EntityService.searchIndexes[typeName] = searchIndex
+
+            if(typeName not in EntityService.searchIndexesSynced):
+                reindexed = searchIndex.sync(self.getStorageSignatures(), lambda ids: self.getMany(ids, includeSoftDeleted = True), self.getSearchFieldValues)
+                printD("Re-indexed ", reindexed, " ", typeName, "(s) in search index.", debug = self.settings.debug)
+                EntityService.searchIndexesSynced.append(typeName)
+
+        return searchIndex
+
+    def getSearchFieldValues(self, entity: T) -> List[str]:
+        """
+        Get values of searchable fields (searchFields) of entity, indexed in the search index.
+
+        Args:
+            entity (T): Entity.
+
+        Returns:
+            List[str | None]: Values in the order of searchFields, None where entity has no value.
+        """
+
+        return [getattr(entity, _, None) for _ in self.searchFields]
+
+    def indexSearchFields(self, entity: T) -> None:
+        """
+        Update search index with entity, if the index is used by this program. Otherwise it is synced from the changed file when used.
+
+        Args:
+            entity (T): Entity to index.
+        """
+
+        searchIndex = self.searchIndexes.get(self.entityType.__name__)
+        if(entity == None or searchIndex == None):
+            return
+
+        # Signature of file is only known when the entity was written straight to it
+        signature = None
+        if(self.repository == None and self.getFromJournal(entity.id) == None):
+            signature = self.cache.getSignature(self.getFilePath(entity.id))
+
+        searchIndex.setEntity(entity.id, self.getSearchFieldValues(entity), entity.deleted != None, signature)
+
+    def getBySearchTerm(self, searchTerm: str, includeSoftDeleted: bool = False) -> List[T]:
+        """
+        Get entities with a searchable field (searchFields, e.g. name and URI) matching searchTerm, using the search index so only entities found are read.
+
+        Args:
+            searchTerm (str): Regex-enabled term to search for, ignoring case.
+            includeSoftDeleted (bool, optional): Should include soft-deleted entities. Defaults to False.
+
+        Returns:
+            List[T]: Entities found.
+
+        Raises:
+            re.error: searchTerm is not a valid Regex.
+        """
+
+        ids = self.getSearchIndex().search(searchTerm, includeSoftDeleted)
+        return [_ for _ in self.getMany(ids, includeSoftDeleted) if _ != None]
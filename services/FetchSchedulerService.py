@@ -0,0 +1,277 @@
+import json
+import os
+import random
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List
+
+from grdUtil.BashColor import BashColor
+from grdUtil.PrintUtil import printD, printS
+
+from services.FetchService import FetchService
+from services.PlaylistService import PlaylistService
+from services.StreamSourceService import StreamSourceService
+from Settings import Settings
+
+
+class FetchSchedulerService():
+    settings = Settings()
+    fetchService = FetchService()
+    playlistService = PlaylistService()
+    streamSourceService = StreamSourceService()
+    schedule: Dict[str, dict] = None
+    lock: threading.RLock = threading.RLock()
+    stopEvent: threading.Event = threading.Event()
+    thread: threading.Thread = None
+    lastRefreshed: float = 0.0
+    refreshSeconds: int = 300
+    tickSeconds: int = 15
+
+    def __init__(self):
+        with FetchSchedulerService.lock:
+            if(FetchSchedulerService.schedule == None):
+                FetchSchedulerService.schedule = self.load()
+
+    def getSchedulePath(self) -> str:
+        return os.path.join(self.settings.localStoragePath, "fetchSchedule.json")
+
+    def load(self) -> Dict[str, dict]:
+        """
+        Load schedule from file, keeping intervals and history between restarts.
+
+        Returns:
+            Dict[str, dict]: Schedule entries by StreamSource ID.
+        """
+
+        path = self.getSchedulePath()
+        if(not os.path.exists(path)):
+            return {}
+
+        try:
+            with open(path, "r", encoding = "utf-8") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def save(self) -> None:
+        with FetchSchedulerService.lock:
+            path = self.getSchedulePath()
+            tempPath = path + ".tmp"
+            with open(tempPath, "w", encoding = "utf-8") as file:
+                json.dump(FetchSchedulerService.schedule, file)
+            os.replace(tempPath, path)
+
+    def start(self) -> None:
+        """
+        Start scheduler thread, if not already running.
+        """
+
+        with FetchSchedulerService.lock:
+            if(FetchSchedulerService.thread != None and FetchSchedulerService.thread.is_alive()):
+                return
+
+            FetchSchedulerService.stopEvent.clear()
+            FetchSchedulerService.thread = threading.Thread(target = self.run, daemon = True)
+            FetchSchedulerService.thread.start()
+            printS("Fetch scheduler started.", color = BashColor.OKGREEN)
+
+    def stop(self) -> None:
+        """
+        Stop scheduler thread after the batch being fetched, if any.
+        """
+
+        FetchSchedulerService.stopEvent.set()
+
+    def run(self) -> None:
+        """
+        Fetch due StreamSources in batches until stopped, waiting at least fetchSchedulerBatchSpacingSeconds in settings between batches.
+        """
+
+        while(not FetchSchedulerService.stopEvent.is_set()):
+            try:
+                batch = self.takeDueBatch()
+                if(len(batch) == 0):
+                    FetchSchedulerService.stopEvent.wait(self.tickSeconds)
+                    continue
+
+                self.runBatch(batch)
+            except Exception as e:
+                printS("Fetch scheduler failed: ", e, color = BashColor.ERROR)
+
+            FetchSchedulerService.stopEvent.wait(max(self.tickSeconds, self.settings.fetchSchedulerBatchSpacingSeconds))
+
+    def refresh(self, force: bool = False) -> None:
+        """
+        Add StreamSources that can be fetched and are in a Playlist to schedule, and remove any that no longer are.
+        New StreamSources are given a random first run within their interval, so they are spread out instead of fetched at once.
+
+        Args:
+            force (bool, optional): Refresh even if refreshed recently. Defaults to False.
+        """
+
+        now = time.time()
+        if(not force and now - FetchSchedulerService.lastRefreshed < self.refreshSeconds):
+            return
+
+        with FetchSchedulerService.lock:
+            FetchSchedulerService.lastRefreshed = now
+            sourceIds = set()
+            for source in self.streamSourceService.getAll():
+                if(not source.enableFetch or len(self.playlistService.getPlaylistIdsContaining(source.id)) == 0):
+                    continue
+
+                sourceIds.add(source.id)
+                entry = FetchSchedulerService.schedule.get(source.id)
+                if(entry == None):
+                    entry = { "averageGap": None, "lastSuccessful": self.fetchService.toTimestamp(source.lastSuccessfulFetched), "lastRun": None, "lastDuration": None, "lastAdded": None, "lastError": None }
+                    entry["interval"] = self.getInterval(entry, now)
+                    entry["nextRun"] = now + random.uniform(0, entry["interval"])
+                    FetchSchedulerService.schedule[source.id] = entry
+
+                entry["name"] = source.name
+                entry["fetchKey"] = self.fetchService.getSourceFetchKey(source)
+
+            for sourceId in [_ for _ in FetchSchedulerService.schedule.keys() if _ not in sourceIds]:
+                del FetchSchedulerService.schedule[sourceId]
+
+            self.save()
+
+    def takeDueBatch(self) -> List[str]:
+        """
+        Get StreamSources to fetch now. If any are due, StreamSources due within fetchSchedulerBatchSpacingSeconds in settings and StreamSources fetching the same remote source are coalesced into the batch, up to fetchSchedulerBatchSize in settings.
+
+        Returns:
+            List[str]: IDs of StreamSources, empty if none are due.
+        """
+
+        self.refresh()
+        with FetchSchedulerService.lock:
+            now = time.time()
+            entries = sorted(FetchSchedulerService.schedule.items(), key = lambda _: _[1]["nextRun"])
+            if(len(entries) == 0 or entries[0][1]["nextRun"] > now):
+                return []
+
+            coalesceUntil = now + self.settings.fetchSchedulerBatchSpacingSeconds
+            batch = []
+            fetchKeys = set()
+            for sourceId, entry in entries:
+                if(entry["nextRun"] > coalesceUntil or len(fetchKeys) >= max(1, self.settings.fetchSchedulerBatchSize)):
+                    break
+
+                batch.append(sourceId)
+                fetchKeys.add(entry.get("fetchKey"))
+
+            # Sources of the same remote source are fetched once anyway
+            batch += [sourceId for sourceId, entry in entries if sourceId not in batch and entry.get("fetchKey") in fetchKeys]
+            return batch
+
+    def runBatch(self, sourceIds: List[str]) -> None:
+        """
+        Fetch StreamSources for all Playlists they are in, and reschedule them based on how often they have new streams.
+
+        Args:
+            sourceIds (List[str]): IDs of StreamSources to fetch.
+        """
+
+        playlistIds = []
+        for sourceId in sourceIds:
+            playlistIds += [_ for _ in self.playlistService.getPlaylistIdsContaining(sourceId) if _ not in playlistIds]
+
+        printD("Fetch scheduler fetching ", len(sourceIds), " StreamSource(s) for ", len(playlistIds), " Playlist(s).", debug = self.settings.debug)
+        started = time.time()
+        error = None
+        nAdded = {}
+        try:
+            result = self.fetchService.fetchPlaylists(playlistIds, self.settings.fetchLimitSingleSource, takeNewOnly = True, concurrent = True, sourceIds = sourceIds)
+            for streams in result.values():
+                for stream in streams:
+                    nAdded[stream.streamSourceId] = nAdded.get(stream.streamSourceId, 0) + 1
+        except Exception as e:
+            error = str(e)
+            printS("Scheduled fetch failed: ", e, color = BashColor.ERROR)
+
+        completed = time.time()
+        with FetchSchedulerService.lock:
+            for sourceId, source in zip(sourceIds, self.streamSourceService.getMany(sourceIds)):
+                entry = FetchSchedulerService.schedule.get(sourceId)
+                if(entry == None or source == None):
+                    continue
+
+                lastSuccessful = self.fetchService.toTimestamp(source.lastSuccessfulFetched)
+                if(lastSuccessful != None and entry["lastSuccessful"] != None and lastSuccessful > entry["lastSuccessful"]):
+                    gap = lastSuccessful - entry["lastSuccessful"]
+                    entry["averageGap"] = gap if(entry["averageGap"] == None) else 0.5 * entry["averageGap"] + 0.5 * gap
+
+                entry["lastSuccessful"] = lastSuccessful
+                entry["lastRun"] = started
+                entry["lastDuration"] = completed - started
+                entry["lastAdded"] = nAdded.get(sourceId, 0)
+                entry["lastError"] = error
+                entry["interval"] = self.getInterval(entry, completed)
+                # Jitter keeps sources scheduled together from staying together
+                entry["nextRun"] = completed + entry["interval"] * random.uniform(0.9, 1.1)
+
+            self.save()
+
+    def getInterval(self, entry: dict, now: float) -> float:
+        """
+        Get seconds until next fetch of a StreamSource: half the expected time between new streams, which is the average time between new streams seen, or the time since the last new stream if longer, so sources that stopped posting are fetched less often.
+
+        Args:
+            entry (dict): Schedule entry of StreamSource.
+            now (float): Current timestamp.
+
+        Returns:
+            float: Interval in seconds, between fetchMinIntervalMinutes and fetchMaxIntervalMinutes in settings.
+        """
+
+        minSeconds = self.settings.fetchMinIntervalMinutes * 60
+        maxSeconds = max(minSeconds, self.settings.fetchMaxIntervalMinutes * 60)
+        if(entry["lastError"] != None and entry.get("interval") != None):
+            return min(max(entry["interval"] * 2, minSeconds), maxSeconds)
+
+        sinceLastSuccessful = now - entry["lastSuccessful"] if(entry["lastSuccessful"] != None) else maxSeconds * 2
+        expectedGap = max(entry["averageGap"] or 0, sinceLastSuccessful)
+        return min(max(expectedGap / 2, minSeconds), maxSeconds)
+
+    def fetchNow(self, sourceId: str) -> None:
+        """
+        Make a StreamSource due, so it is fetched in the next batch.
+
+        Args:
+            sourceId (str): ID of StreamSource.
+        """
+
+        self.refresh(force = True)
+        with FetchSchedulerService.lock:
+            entry = FetchSchedulerService.schedule.get(sourceId)
+            if(entry != None):
+                entry["nextRun"] = time.time()
+
+    def getStatus(self) -> List[dict]:
+        """
+        Get schedule of all StreamSources, next to run first.
+
+        Returns:
+            List[dict]: StreamSource ID, name, interval, next and last run, duration and number of streams added by last run, and any error.
+        """
+
+        self.refresh()
+        with FetchSchedulerService.lock:
+            status = []
+            for sourceId, entry in sorted(FetchSchedulerService.schedule.items(), key = lambda _: _[1]["nextRun"]):
+                status.append({
+                    "id": sourceId,
+                    "name": entry.get("name"),
+                    "intervalMinutes": round(entry["interval"] / 60, 1),
+                    "nextRun": datetime.fromtimestamp(entry["nextRun"]),
+                    "lastRun": datetime.fromtimestamp(entry["lastRun"]) if(entry["lastRun"] != None) else None,
+                    "lastDurationSeconds": round(entry["lastDuration"], 1) if(entry["lastDuration"] != None) else None,
+                    "lastAdded": entry["lastAdded"],
+                    "lastError": entry["lastError"]})
+
+            return status
+
+    def isRunning(self) -> bool:
+        return FetchSchedulerService.thread != None and FetchSchedulerService.thread.is_alive()
@@ -1,14 +1,13 @@
+import contextvars
 import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from copy import copy
 from datetime import datetime
-from typing import List
+from typing import Callable, Dict, List
+from urllib.parse import urlparse
 from xml.dom.minidom import parseString
-from pathlib import Path
-import yt_dlp
-import mechanize
-import requests
-from bs4 import BeautifulSoup
-from jsonpath_ng import parse
-from pytubefix import Channel
 
 from grdException.ArgumentException import ArgumentException
 from grdException.DatabaseException import DatabaseException
@@ -16,30 +15,65 @@ from grdUtil.BashColor import BashColor
 from grdUtil.DateTimeUtil import getDateTime, stringToDatetime
 from grdUtil.FileUtil import mkdir
 from grdUtil.InputUtil import sanitize
-from grdUtil.PrintUtil import printD, printS, printStack
+from grdUtil.PrintUtil import printStack
 
 from enums.StreamSourceType import StreamSourceType
+from LazyImport import LazyModule
 from model.Playlist import Playlist
 from model.PlaylistDetailed import PlaylistDetailed
 from model.QueueStream import QueueStream
 from model.StreamSource import StreamSource
-from services.DownloadService import DownloadService
+from services.DownloadQueueService import DownloadQueueService
+from services.HttpService import HttpService
 from services.PlaylistService import PlaylistService
+from services.YoutubeDlService import YoutubeDlService
 from services.QueueStreamService import QueueStreamService
 from services.StreamSourceService import StreamSourceService
+from services.TaskService import printD, printS
 from Settings import Settings
+from storage.DirectoryScanIndex import DirectoryScanIndex
+from storage.HttpCache import HttpCache
+
+bs4 = LazyModule("bs4")
+jsonpath_ng = LazyModule("jsonpath_ng")
+pytubefix = LazyModule("pytubefix")
+yt_dlp = LazyModule("yt_dlp")
 
 class FetchService():
-    downloadService = DownloadService()
+    downloadQueueService = DownloadQueueService()
+    httpService = HttpService()
+    youtubeDlService = YoutubeDlService()
+    ydlFetchOptions: dict = None
     playlistService = PlaylistService()
     queueStreamService = QueueStreamService()
     streamSourceService = StreamSourceService()
     settings = Settings()
+    httpCache = HttpCache(os.path.join(settings.localStoragePath, "HttpCache"), settings.httpCacheTtlSeconds)
+    directoryScanIndexes: Dict[str, DirectoryScanIndex] = {}
+    directoryScanIndexesLock: threading.Lock = threading.Lock()
 
     def __init__(self):
         mkdir(self.settings.localStoragePath)
 
-    def fetch(self, playlistId: str, batchSize: int = 10, takeAfter: datetime = None, takeBefore: datetime = None, takeNewOnly: bool = False) -> List[QueueStream]:
+    def getYdlFetchOptions(self) -> dict:
+        """
+        Get options of YoutubeDL used to fetch, created the first time they are used so yt_dlp is only imported when fetching with it.
+
+        Returns:
+            dict: Options.
+        """
+        
+        if(FetchService.ydlFetchOptions == None):
+            FetchService.ydlFetchOptions = {
+                "quiet": True,
+                "extract_flat": True,
+                "playlistreverse": False,
+                "match_filter": yt_dlp.utils.match_filter_func("duration > 60"), # Exclude Shorts
+            }
+            
+        return FetchService.ydlFetchOptions
+    
+    def fetch(self, playlistId: str, batchSize: int = 10, takeAfter: datetime = None, takeBefore: datetime = None, takeNewOnly: bool = False, concurrent: bool = False) -> List[QueueStream]:
         """
         Fetch new videos from watched sources, adding them in chronological order.
 
@@ -48,6 +82,7 @@ class FetchService():
             takeAfter (datetime): Limit to take video after. Defaults to None.
             takeBefore (datetime): Limit to take video before. Defaults to None.
             takeNewOnly (bool): Only take streams marked as new. Disables takeAfter and takeBefore-checks. To use takeAfter and/or takeBefore, set this to False. Defaults to False.
+            concurrent (bool): Fetch from sources in parallel, limited by fetchConcurrency and fetchConcurrencyPerHost in settings. Results are still added in the order of sources in Playlist. Defaults to False.
 
         Returns:
             List[QueueStream]: Videos added.
@@ -60,107 +95,427 @@ class FetchService():
         if(playlist == None):
             return 0
 
-        newStreams = []
-        for sourceId in playlist.streamSourceIds:
-            source = self.streamSourceService.get(sourceId)
+        sources = []
+        for sourceId, source in zip(playlist.streamSourceIds, self.streamSourceService.getMany(playlist.streamSourceIds)):
             if(not source):
                 printS("StreamSource with ID ", sourceId, " could not be found. Consider removing it using the purge or purgeplaylists commands.", color = BashColor.FAIL)
                 continue
             
             if(not source.enableFetch):
                 continue
+            
+            sources.append(source)
 
-            _takeAfter = takeAfter if(not takeNewOnly) else source.lastSuccessfulFetched
-            fetchedStreams = []
-            try:
-                if(source.isWeb):
-                    if(source.streamSourceTypeId == StreamSourceType.YOUTUBE.value):
-                        # fetchedStreams = self.fetchYoutube(source, batchSize, _takeAfter, takeBefore, takeNewOnly)
-                        
-                        if(_takeAfter is not None or takeBefore is not None):
-                            printS("Arguments takeAfter and takeBefore are not supported by fetchYoutubeHtml, they will be ignored.", color = BashColor.WARNING)
-                        
-                        fetchedStreams = self.fetchYoutubeYdl(source, batchSize, takeNewOnly)
-                        # fetchedStreams = self.fetchYoutubeHtml(source, batchSize, takeBefore, takeNewOnly)
-                    elif(source.streamSourceTypeId == StreamSourceType.ODYSEE.value):
-                        fetchedStreams = self.fetchOdysee(source, batchSize, _takeAfter, takeBefore, takeNewOnly)
-                    elif(source.streamSourceTypeId == StreamSourceType.RUMBLE.value):
-                        fetchedStreams = self.fetchRumble(source, batchSize, _takeAfter, takeBefore, takeNewOnly)
-                    else:
-                        printS("\t Source \"", source.name, "\" could not be fetched as it is not implemented for this source.", color = BashColor.WARNING)
-                        continue
-                else:
-                    fetchedStreams = self.fetchDirectory(source, batchSize, _takeAfter, takeBefore, takeNewOnly)
-            except Exception as e:
-                printS("Fetching from ", source.name, " failed: ", str(e), color = BashColor.ERROR)
+        newStreams = []
+        downloadJobIds = []
+        httpCacheStats = self.httpCache.startStats()
+        for source, fetchedStreams in zip(sources, self.fetchSources(sources, batchSize, takeAfter, takeBefore, takeNewOnly, concurrent)):
+            if(fetchedStreams == None):
                 continue
-
-            if(len(fetchedStreams) > 0):
-                source.lastSuccessfulFetched = getDateTime()
-            
-            lenFetched = len(source.lastFetchedIds)
-            fetchedIds = [_.remoteId for _ in fetchedStreams]
-            source.lastFetchedIds += fetchedIds
-            if(lenFetched > batchSize):
-                source.lastFetchedIds = source.lastFetchedIds[lenFetched - batchSize:]
-            
-            source.lastFetched = getDateTime()
-            updateSuccess = self.streamSourceService.update(source)
-            if(updateSuccess):
-                newStreamsToAdd = fetchedStreams
-                newStreams += self.playlistService.addStreams(playlist.id, newStreamsToAdd)
-                for stream in newStreamsToAdd:
-                    printS("\tAdding \"", stream.name, "\".")
-            else:
-                printS("Could not update StreamSource \"", source.name, "\" (ID: ", source.id, "), streams could not be added: \n", fetchedStreams, color = BashColor.WARNING)
-                
+            
+            newStreams += self.applyFetchedStreams(playlist.id, source, fetchedStreams, batchSize)
             if(source.alwaysDownload):
-                printD("\tDownloading due to alwaysDownload flag on source...")
-                for fetchedStream in fetchedStreams[0]:
-                    downloadPath = self.downloadService.download(fetchedStream.uri, source.name)
-                    printS("\tDownloaded due to alwaysDownload flag on source, path: ", downloadPath, color = BashColor.OKGREEN, doPrint = (downloadPath != None))
-                    printS("\tDownloaded due to alwaysDownload flag on source failed.", color = BashColor.FAIL, doPrint = (downloadPath == None))
+                downloadJobIds += self.downloadFetchedStreams(source, fetchedStreams)
+        
+        self.downloadQueueService.wait(downloadJobIds)
+        printS(self.httpCache.getStatsString(httpCacheStats))
+        printS(self.youtubeDlService.getStatsString())
 
         if(len(newStreams) > 0):
             return newStreams
         else:
             return []
 
-    def fetchDirectory(self, streamSource: StreamSource, batchSize: int = 10, takeAfter: datetime = None, takeBefore: datetime = None, takeNewOnly: bool = False) -> List[QueueStream]:
+    def fetchSources(self, sources: List[StreamSource], batchSize: int, takeAfter: datetime, takeBefore: datetime, takeNewOnly: bool, concurrent: bool = False) -> List[List[QueueStream]]:
+        """
+        Fetch new videos from sources, optionally in parallel, without adding them to any Playlist.
+
+        Args:
+            sources (List[StreamSource]): Sources to fetch from.
+            batchSize (int): Number of videos to check at a time.
+            takeAfter (datetime): Limit to take video after.
+            takeBefore (datetime): Limit to take video before.
+            takeNewOnly (bool): Only take streams marked as new.
+            concurrent (bool): Fetch from sources in parallel. Defaults to False.
+
+        Returns:
+            List[List[QueueStream] | None]: Videos fetched in the same order as sources, None where fetching failed.
+        """
+        
+        if(not concurrent or len(sources) < 2 or self.settings.fetchConcurrency < 2):
+            return [self.tryFetchSource(_, batchSize, takeAfter, takeBefore, takeNewOnly) for _ in sources]
+        
+        hostLocks = {}
+        for source in sources:
+            host = self.getSourceHost(source)
+            if(host not in hostLocks):
+                hostLocks[host] = threading.BoundedSemaphore(max(1, self.settings.fetchConcurrencyPerHost))
+        
+        def fetchLimited(source: StreamSource) -> List[QueueStream]:
+            with hostLocks[self.getSourceHost(source)]:
+                return self.tryFetchSource(source, batchSize, takeAfter, takeBefore, takeNewOnly)
+        
+        printS("Fetching ", len(sources), " sources, ", self.settings.fetchConcurrency, " at a time...")
+        with ThreadPoolExecutor(max_workers = self.settings.fetchConcurrency) as executor:
+            # Each source is fetched in a copy of the context of this call, so what it counts and logs is attributed to this call
+            futures = [executor.submit(contextvars.copy_context().run, fetchLimited, _) for _ in sources]
+            return [_.result() for _ in futures]
+
+    def getSourceHost(self, source: StreamSource) -> str:
+        """
+        Get host of source, used to limit number of concurrent requests to the same site.
+
+        Args:
+            source (StreamSource): Source to get host for.
+
+        Returns:
+            str: Host, or "local" for non-web sources.
+        """
+        
+        if(not source.isWeb):
+            return "local"
+        
+        host = urlparse(source.uri).netloc.lower()
+        return host[4:] if(host.startswith("www.")) else host
+
+    def tryFetchSource(self, source: StreamSource, batchSize: int, takeAfter: datetime, takeBefore: datetime, takeNewOnly: bool) -> List[QueueStream]:
         """
-        Fetch streams from a local directory.
+        Fetch new videos from source, printing any errors.
 
         Args:
+            source (StreamSource): Source to fetch from.
+            batchSize (int): Number of videos to check at a time.
+            takeAfter (datetime): Limit to take video after.
+            takeBefore (datetime): Limit to take video before.
+            takeNewOnly (bool): Only take streams marked as new.
+
+        Returns:
+            List[QueueStream] | None: Videos fetched, None if source could not be fetched.
+        """
+        
+        _takeAfter = takeAfter if(not takeNewOnly) else source.lastSuccessfulFetched
+        try:
+            if(source.isWeb):
+                if(source.streamSourceTypeId == StreamSourceType.YOUTUBE.value):
+                    # return self.fetchYoutube(source, batchSize, _takeAfter, takeBefore, takeNewOnly)
+                    
+                    if(_takeAfter is not None or takeBefore is not None):
+                        printS("Arguments takeAfter and takeBefore are not supported by fetchYoutubeHtml, they will be ignored.", color = BashColor.WARNING)
+                    
+                    return self.fetchYoutubeYdl(source, batchSize, takeNewOnly)
+                    # return self.fetchYoutubeHtml(source, batchSize, takeBefore, takeNewOnly)
+                elif(source.streamSourceTypeId == StreamSourceType.ODYSEE.value):
+                    return self.fetchOdysee(source, batchSize, _takeAfter, takeBefore, takeNewOnly)
+                elif(source.streamSourceTypeId == StreamSourceType.RUMBLE.value):
+                    return self.fetchRumble(source, batchSize, _takeAfter, takeBefore, takeNewOnly)
+                else:
+                    printS("\t Source \"", source.name, "\" could not be fetched as it is not implemented for this source.", color = BashColor.WARNING)
+                    return None
+            else:
+                return self.fetchDirectory(source, batchSize, _takeAfter, takeBefore, takeNewOnly)
+        except Exception as e:
+            printS("Fetching from ", source.name, " failed: ", str(e), color = BashColor.ERROR)
+            return None
+
+    def fetchPlaylists(self, playlistIds: List[str], batchSize: int = 10, takeAfter: datetime = None, takeBefore: datetime = None, takeNewOnly: bool = False, concurrent: bool = False, sourceIds: List[str] = None) -> Dict[str, List[QueueStream]]:
+        """
+        Fetch new videos for several Playlists, fetching each remote source only once even if it is in several Playlists, or added as different StreamSources with the same URI.
+
+        Args:
+            playlistIds (List[str]): IDs of Playlists to fetch for.
             batchSize (int): Number of videos to check at a time, unrelated to max videos that will be read. Defaults to 10.
             takeAfter (datetime): Limit to take video after. Defaults to None.
             takeBefore (datetime): Limit to take video before. Defaults to None.
+            takeNewOnly (bool): Only take streams marked as new. Disables takeAfter and takeBefore-checks. Defaults to False.
+            concurrent (bool): Fetch from sources in parallel. Defaults to False.
+            sourceIds (List[str]): Only fetch these StreamSources of the Playlists. Defaults to None, all StreamSources.
+
+        Returns:
+            Dict[str, List[QueueStream]]: Videos added by Playlist ID.
+        """
+        
+        if(batchSize < 1):
+            raise ArgumentException("fetchPlaylists - batchSize was less than 1.")
+        
+        downloadJobIds = []
+        result = {}
+        subscribers = {}
+        for playlistId, playlist in zip(playlistIds, self.playlistService.getMany(playlistIds)):
+            if(playlist == None):
+                printS("Playlist with ID ", playlistId, " could not be found.", color = BashColor.FAIL)
+                continue
+            
+            result[playlist.id] = []
+            for sourceId in playlist.streamSourceIds:
+                if(sourceIds != None and sourceId not in sourceIds):
+                    continue
+                
+                playlistIdsOfSource = subscribers.setdefault(sourceId, [])
+                if(playlist.id not in playlistIdsOfSource):
+                    playlistIdsOfSource.append(playlist.id)
+        
+        groups = {}
+        for sourceId, source in zip(subscribers.keys(), self.streamSourceService.getMany(list(subscribers.keys()))):
+            if(not source):
+                printS("StreamSource with ID ", sourceId, " could not be found. Consider removing it using the purge or purgeplaylists commands.", color = BashColor.FAIL)
+                continue
+            
+            if(not source.enableFetch):
+                continue
+            
+            groups.setdefault(self.getSourceFetchKey(source), []).append(source)
+        
+        # Fetch with the source fetched successfully longest ago, its result covers what is new for the others too
+        representatives = [min(_, key = lambda e: (e.lastSuccessfulFetched != None, str(e.lastSuccessfulFetched))) for _ in groups.values()]
+        nSubscriptions = sum(len(subscribers[_.id]) for sources in groups.values() for _ in sources)
+        printS("Fetching ", len(representatives), " unique source(s) for ", nSubscriptions, " Playlist subscription(s)...")
+        httpCacheStats = self.httpCache.startStats()
+        
+        for representative, sources, fetchedStreams in zip(representatives, groups.values(), self.fetchSources(representatives, batchSize, takeAfter, takeBefore, takeNewOnly, concurrent)):
+            if(fetchedStreams == None):
+                continue
+            
+            # Only streams stored in every subscribing Playlist are committed, the rest are fetched again
+            storedRemoteIds = set(_.remoteId for _ in fetchedStreams)
+            def onStored(remoteIds: List[str]) -> None:
+                storedRemoteIds.intersection_update(remoteIds)
+            
+            for source in sources:
+                updateSuccess = self.updateSourceAfterFetch(source, fetchedStreams, batchSize)
+                if(not updateSuccess):
+                    printS("Could not update StreamSource \"", source.name, "\" (ID: ", source.id, "), streams could not be added: \n", fetchedStreams, color = BashColor.WARNING)
+                    storedRemoteIds.clear()
+                    continue
+                
+                for playlistId in subscribers[source.id]:
+                    streams = []
+                    for fetchedStream in fetchedStreams:
+                        stream = copy(fetchedStream)
+                        stream.id = None
+                        stream.streamSourceId = source.id
+                        stream.streamSourceName = source.name
+                        streams.append(stream)
+                    
+                    result[playlistId] += self.addFetchedStreams(playlistId, streams, onStored)
+            
+            self.commitFetchedStreams(representative, list(storedRemoteIds))
+            
+            alwaysDownloadSource = next((_ for _ in sources if _.alwaysDownload), None)
+            if(alwaysDownloadSource != None):
+                downloadJobIds += self.downloadFetchedStreams(alwaysDownloadSource, fetchedStreams)
+        
+        self.downloadQueueService.wait(downloadJobIds)
+        printS(self.httpCache.getStatsString(httpCacheStats))
+        printS(self.youtubeDlService.getStatsString())
+        return result
+
+    def getSourceFetchKey(self, source: StreamSource) -> str:
+        """
+        Get key identifying the remote source or directory a StreamSource fetches from, equal for StreamSources fetching the same streams.
+
+        Args:
+            source (StreamSource): Source to get key for.
+
+        Returns:
+            str: Key.
+        """
+        
+        if(not source.isWeb):
+            return "local:" + os.path.normcase(os.path.normpath(source.uri))
+        
+        parts = urlparse(source.uri.strip())
+        host = parts.netloc.lower()
+        host = host[4:] if(host.startswith("www.")) else host
+        return f"{source.streamSourceTypeId}:{host}{parts.path.rstrip('/').lower()}"
+
+    def applyFetchedStreams(self, playlistId: str, source: StreamSource, fetchedStreams: List[QueueStream], batchSize: int) -> List[QueueStream]:
+        """
+        Update source with result of fetch and add fetched videos to Playlist.
+
+        Args:
+            playlistId (str): ID of Playlist to add to.
+            source (StreamSource): Source videos were fetched from.
+            fetchedStreams (List[QueueStream]): Videos fetched.
+            batchSize (int): Number of videos checked at a time, limits how many last fetched IDs are kept.
+
+        Returns:
+            List[QueueStream]: Videos added.
+        """
+        
+        newStreams = []
+        updateSuccess = self.updateSourceAfterFetch(source, fetchedStreams, batchSize)
+        if(updateSuccess):
+            newStreams = self.addFetchedStreams(playlistId, fetchedStreams, lambda remoteIds: self.commitFetchedStreams(source, remoteIds))
+        else:
+            printS("Could not update StreamSource \"", source.name, "\" (ID: ", source.id, "), streams could not be added: \n", fetchedStreams, color = BashColor.WARNING)
+        
+        return newStreams
+
+    def updateSourceAfterFetch(self, source: StreamSource, fetchedStreams: List[QueueStream], batchSize: int) -> bool:
+        """
+        Update last fetched IDs and datetimes of source with result of fetch.
+
+        Args:
+            source (StreamSource): Source videos were fetched from.
+            fetchedStreams (List[QueueStream]): Videos fetched.
+            batchSize (int): Number of videos checked at a time, limits how many last fetched IDs are kept.
+
+        Returns:
+            bool: Result.
+        """
+        
+        if(len(fetchedStreams) > 0):
+            source.lastSuccessfulFetched = getDateTime()
+        
+        lenFetched = len(source.lastFetchedIds)
+        fetchedIds = [_.remoteId for _ in fetchedStreams]
+        source.lastFetchedIds += fetchedIds
+        if(lenFetched > batchSize):
+            source.lastFetchedIds = source.lastFetchedIds[lenFetched - batchSize:]
+        
+        source.lastFetched = getDateTime()
+        return self.streamSourceService.update(source)
+
+    def addFetchedStreams(self, playlistId: str, fetchedStreams: List[QueueStream], onStored: Callable[[List[str]], None] = None) -> List[QueueStream]:
+        """
+        Add fetched videos not already in Playlist to Playlist.
+
+        Args:
+            playlistId (str): ID of Playlist to add to.
+            fetchedStreams (List[QueueStream]): Videos fetched.
+            onStored (Callable[[List[str]], None], optional): Function called with remote IDs of fetched videos now in Playlist, added or already in it, unless adding failed. Defaults to None.
+
+        Returns:
+            List[QueueStream]: Videos added.
+        """
+        
+        newStreams = []
+        newStreamsToAdd = self.playlistService.getNonDuplicateStreams(playlistId, fetchedStreams)
+        if(len(newStreamsToAdd) < len(fetchedStreams)):
+            printD("\tSkipping ", len(fetchedStreams) - len(newStreamsToAdd), " stream(s) already in Playlist.", debug = self.settings.debug)
+        if(len(newStreamsToAdd) > 0):
+            newStreams += self.playlistService.addStreams(playlistId, newStreamsToAdd)
+        for stream in newStreamsToAdd:
+            printS("\tAdding \"", stream.name, "\".")
+        
+        # Playlist is not updated at all if adding fails
+        if(onStored != None and (len(newStreamsToAdd) == 0 or len(newStreams) > 0)):
+            onStored([_.remoteId for _ in fetchedStreams])
+        
+        return newStreams
+    
+    def commitFetchedStreams(self, source: StreamSource, remoteIds: List[str]) -> None:
+        """
+        Remove files of a local source from pending in its scan index, once their streams are stored, so they are not fetched again.
+        Files fetched but not stored stay pending, and are fetched again next time.
+
+        Args:
+            source (StreamSource): Source videos were fetched from.
+            remoteIds (List[str]): Remote IDs of videos stored, paths relative to the directory of source for local sources.
+        """
+        
+        if(source.isWeb or len(remoteIds) == 0):
+            return
+        
+        index = self.getDirectoryScanIndex(source)
+        with index.lock:
+            committed = set(remoteIds)
+            index.pending = [_ for _ in index.pending if _[0] not in committed]
+            index.save()
+
+    def downloadFetchedStreams(self, source: StreamSource, fetchedStreams: List[QueueStream]) -> List[str]:
+        """
+        Queue download of fetched videos of a source with the alwaysDownload flag.
+
+        Args:
+            source (StreamSource): Source videos were fetched from.
+            fetchedStreams (List[QueueStream]): Videos fetched.
+
+        Returns:
+            List[str]: IDs of download jobs queued.
+        """
+        
+        printD("\tQueueing download of ", len(fetchedStreams), " stream(s) due to alwaysDownload flag on source...")
+        jobIds = []
+        for fetchedStream in fetchedStreams:
+            if(not fetchedStream.isWeb):
+                continue
+            
+            jobIds.append(self.downloadQueueService.submit(fetchedStream.uri, source.name, name = fetchedStream.name).id)
+        
+        return jobIds
+
+    def fetchDirectory(self, streamSource: StreamSource, batchSize: int = 10, takeAfter: datetime = None, takeBefore: datetime = None, takeNewOnly: bool = False) -> List[QueueStream]:
+        """
+        Fetch streams from a local directory, only files added since the last fetch, using a scan index of the directory.
+
+        Args:
+            batchSize (int): Max number of files to take, any more are taken on the next fetch. Defaults to 10.
+            takeAfter (datetime): Limit to take files modified after. Defaults to None.
+            takeBefore (datetime): Limit to take files modified before. Defaults to None.
             takeNewOnly (bool): Only take streams marked as new. Disables takeAfter and takeBefore-checks. To use takeAfter and/or takeBefore, set this to False. Defaults to False.
 
         Returns:
-            Tuple[List[QueueStream], str]: A Tuple of List of QueueStream, and the last filename fetched.
+            List[QueueStream]: Streams of new files, oldest first.
         """
         
         if(streamSource == None):
             raise ArgumentException("fetchDirectory - streamSource was None")
         
-        newQueueStreams = []
-        allFiles = [p for p in Path(streamSource.uri).rglob("*") if p.is_file()]
-        for file in allFiles:
-            sanitizedTitle = sanitize(file.name)
-            queueStream = QueueStream(name = sanitizedTitle, 
-                uri = file.absolute(), 
-                isWeb = False,
-                streamSourceId = streamSource.id,
-                streamSourceName = streamSource.name,
-                watched = None,
-                backgroundContent = streamSource.backgroundContent,
-                added = getDateTime(),
-                remoteId = None) # TODO find and filter out when fetching
+        index = self.getDirectoryScanIndex(streamSource)
+        with index.lock:
+            nNewFiles = index.scan()
+            printD("\tFound ", nNewFiles, " new file(s) in \"", streamSource.uri, "\", ", len(index.pending), " pending.", debug = self.settings.debug)
             
-            newQueueStreams.append(queueStream)
+            # Files stay pending until their streams are stored, see commitFetchedStreams
+            index.pending = [_ for _ in index.pending if os.path.isfile(os.path.join(index.root, _[0]))]
+            index.save()
+            
+            newQueueStreams = []
+            for relativePath, modified in index.pending:
+                if(len(newQueueStreams) >= batchSize):
+                    break
+                
+                # Files outside the limits stay pending for a fetch without them
+                modifiedDatetime = datetime.fromtimestamp(modified)
+                if(not takeNewOnly and ((takeAfter != None and modifiedDatetime < takeAfter) or (takeBefore != None and modifiedDatetime > takeBefore))):
+                    continue
+                
+                path = os.path.join(index.root, relativePath)
+                queueStream = QueueStream(name = sanitize(os.path.basename(relativePath)), 
+                    uri = os.path.abspath(path), 
+                    isWeb = False,
+                    streamSourceId = streamSource.id,
+                    streamSourceName = streamSource.name,
+                    watched = None,
+                    backgroundContent = streamSource.backgroundContent,
+                    added = getDateTime(),
+                    remoteId = relativePath)
+                
+                newQueueStreams.append(queueStream)
 
         return newQueueStreams
 
+    def getDirectoryScanIndex(self, streamSource: StreamSource) -> DirectoryScanIndex:
+        """
+        Get scan index of the directory of a local StreamSource, loaded once and shared between fetches.
+
+        Args:
+            streamSource (StreamSource): Local source.
+
+        Returns:
+            DirectoryScanIndex: Index.
+        """
+        
+        with FetchService.directoryScanIndexesLock:
+            index = FetchService.directoryScanIndexes.get(streamSource.id)
+            if(index == None or index.root != os.path.normpath(streamSource.uri)):
+                indexPath = os.path.join(self.settings.localStoragePath, "DirectoryScanIndex", f"{streamSource.id}.json")
+                index = DirectoryScanIndex(indexPath, streamSource.uri)
+                FetchService.directoryScanIndexes[streamSource.id] = index
+            
+            return index
+
     def fetchYoutube(self, streamSource: StreamSource, batchSize: int = 10, takeAfter: datetime = None, takeBefore: datetime = None, takeNewOnly: bool = False) -> List[QueueStream]:
         """
         Fetch videos from YouTube.
@@ -179,7 +534,7 @@ class FetchService():
             raise ArgumentException("fetchYoutube - streamSource was None.")
 
         emptyReturn = []
-        channel = Channel(streamSource.uri, "WEB")
+        channel = pytubefix.Channel(streamSource.uri, "WEB")
 
         if(channel == None or channel.channel_name == None):
             printS(f"Channel {streamSource.name} (URL: {streamSource.uri}) could not be found or is not valid. Please remove it and add it back.", color = BashColor.FAIL)
@@ -201,7 +556,7 @@ class FetchService():
         streams = [e for e in channel.video_urls if e] # If not null or empty list i.e. []
         lastStreamId = streams[0].video_id
         
-        print(f"last stream id from fetch {streams[0].title} {lastStreamId} vs listed {streamSource.lastFetchedIds}")
+        printS(f"last stream id from fetch {streams[0].title} {lastStreamId} vs listed {streamSource.lastFetchedIds}")
         if(takeNewOnly and takeAfter == None and lastStreamId in streamSource.lastFetchedIds):
             printD("Last video fetched: \"", sanitize(streams[0].title), "\", YouTube ID \"", lastStreamId, "\"", color = BashColor.WARNING, debug = self.settings.debug)
             printD("Return due to takeNewOnly and takeAfter == None and lastStreamId in streamSource.lastFetchedIds", color = BashColor.WARNING, debug = self.settings.debug)
@@ -262,15 +617,7 @@ class FetchService():
         
         printS(f"Fetching videos from {streamSource.name}...")
         
-        ydlOptions = {
-            "quiet": True,
-            "extract_flat": True,
-            "playlistreverse": False,
-            "playlistend": batchSize,
-            "match_filter": yt_dlp.utils.match_filter_func("duration > 60"), # Exclude Shorts
-        }
-        
-        with yt_dlp.YoutubeDL(ydlOptions) as ydl:
+        with self.youtubeDlService.use("fetch", self.getYdlFetchOptions(), { "playlistend": batchSize }) as ydl:
             info = ydl.extract_info(streamSource.uri, download = False)
 
         # Updated and preferred channel URL format
@@ -340,18 +687,19 @@ class FetchService():
 
         emptyReturn = []
         requestUrl = streamSource.uri
-        httpRequest = requests.get(requestUrl)
-        br = mechanize.Browser()
+        statusCode, html, changed = self.httpCache.get(requestUrl, f"{streamSource.id}:{requestUrl}", self.httpService.get, changedSince = self.toTimestamp(streamSource.lastFetched))
         document = None
 
-        if(httpRequest.status_code != 200):
+        if(statusCode != 200):
             printS("Channel \"", streamSource.name, "\" (URL: ", streamSource.uri, ") could not be fetched, the connection likely timed out. Try again later", color = BashColor.WARNING)
             return emptyReturn
 
+        if(takeNewOnly and not changed):
+            printD("Channel \"", streamSource.name, "\" has not changed since last fetch.", debug = self.settings.debug)
+            return emptyReturn
+
         try:
-            br.open(requestUrl)
-            html = br.response().read()
-            document = BeautifulSoup(html, 'html.parser')
+            document = bs4.BeautifulSoup(html, 'html.parser')
         except:
             printS("Channel \"", streamSource.name, "\" (URL: ", streamSource.uri, ") could not be found or is not valid. Please remove it and add it back.", color = BashColor.FAIL)
             return emptyReturn
@@ -366,10 +714,10 @@ class FetchService():
         videosScript = document.find(lambda tag:tag.name=="script" and "ytInitialData" in tag.text).text
         
         # scripts -> var ytInitialData = {} -> videoRenderer -> videoId / title.runs[0].text
-        videoRenderer = parse("contents..videoRenderer")
-        videoId = parse("contents..videoRenderer.videoId")
-        title = parse("contents..title.runs[0].text")
-        # length = parse("ytp-time-duration")
+        videoRenderer = jsonpath_ng.parse("contents..videoRenderer")
+        videoId = jsonpath_ng.parse("contents..videoRenderer.videoId")
+        title = jsonpath_ng.parse("contents..title.runs[0].text")
+        # length = jsonpath_ng.parse("ytp-time-duration")
         try:
             videosScriptJson = videosScript.split("ytInitialData = ")[1].split(";")[0]
             videosJson = json.loads(videosScriptJson)
@@ -440,14 +788,17 @@ class FetchService():
         emptyReturn = []
         channelName = "".join(["@", streamSource.uri.split("@")[-1]])
         rssUri = f"https://odysee.com/$/rss/{channelName}"
-        rssRequest = requests.get(rssUri)
-        xml = rssRequest.content
+        statusCode, xml, changed = self.httpCache.get(rssUri, f"{streamSource.id}:{rssUri}", self.httpService.get, changedSince = self.toTimestamp(streamSource.lastFetched))
         document = None
         
-        if(rssRequest.status_code != 200): # TODO code might be 200 with empty content or "oops nothing here". Test when Odysee is down next and update this
+        if(statusCode != 200): # TODO code might be 200 with empty content or "oops nothing here". Test when Odysee is down next and update this
             printS("Channel \"", streamSource.name, "\" (URL: ", streamSource.uri, ") could not be fetched, the connection likely timed out. Try again later", color = BashColor.FAIL)
             return emptyReturn
         
+        if(takeNewOnly and not changed):
+            printD("Channel \"", streamSource.name, "\" has not changed since last fetch.", debug = self.settings.debug)
+            return emptyReturn
+        
         try:
             document = parseString(xml)
         except:
@@ -524,13 +875,22 @@ class FetchService():
         
         emptyReturn = []
         requestUrl = streamSource.uri
-        br = mechanize.Browser()
         document = None
 
         try:
-            br.open(requestUrl)
-            html = br.response().read()
-            document = BeautifulSoup(html, 'html.parser')
+            statusCode, html, changed = self.httpCache.get(requestUrl, f"{streamSource.id}:{requestUrl}", self.httpService.get, changedSince = self.toTimestamp(streamSource.lastFetched))
+            if(statusCode != 200):
+                raise Exception(f"Status code {statusCode}")
+        except:
+            printS("Channel \"", streamSource.name, "\" (URL: ", streamSource.uri, ") could not be found or is not valid. Please remove it and add it back.", color = BashColor.FAIL)
+            return emptyReturn
+
+        if(takeNewOnly and not changed):
+            printD("Channel \"", streamSource.name, "\" has not changed since last fetch.", debug = self.settings.debug)
+            return emptyReturn
+
+        try:
+            document = bs4.BeautifulSoup(html, 'html.parser')
         except:
             printS("Channel \"", streamSource.name, "\" (URL: ", streamSource.uri, ") could not be found or is not valid. Please remove it and add it back.", color = BashColor.FAIL)
             return emptyReturn
@@ -677,6 +1037,26 @@ class FetchService():
         
         return self.playlistService.get(playlist.id, includeSoftDeleted)   
 
+    def toTimestamp(self, value: object) -> float:
+        """
+        Get timestamp of datetime, or string of datetime as stored in entities.
+
+        Args:
+            value (object): datetime, string, or None.
+
+        Returns:
+            float | None: Timestamp, None if value is None or not a datetime.
+        """
+
+        if(value == None):
+            return None
+
+        try:
+            _value = value if(isinstance(value, datetime)) else datetime.fromisoformat(str(value))
+            return _value.timestamp()
+        except ValueError:
+            return None
+
     def timestampToSeconds(self, timestamp: str) -> int:
         """
         Get seconds from timestamps like 41 (ss), 2:30 (MM:ss), or 03:01:57 (hh:MM:ss). Longer strings or missing numbers returns None.
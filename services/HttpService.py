@@ -0,0 +1,121 @@
+import os
+import threading
+from typing import Callable
+
+from LazyImport import LazyModule
+from Settings import Settings
+
+bs4 = LazyModule("bs4")
+requests = LazyModule("requests")
+retry = LazyModule("urllib3.util.retry")
+
+
+class HttpService():
+    settings = Settings()
+    session: "requests.Session" = None
+    sessionLock: threading.Lock = threading.Lock()
+    defaultHeaders: dict = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:128.0) Gecko/20100101 Firefox/128.0"}
+
+    def getSession(self) -> "requests.Session":
+        """
+        Get session shared by all HttpServices, keeping connections alive between requests to the same host.
+
+        Returns:
+            requests.Session: Session.
+        """
+
+        with HttpService.sessionLock:
+            if(HttpService.session == None):
+                _retry = retry.Retry(total = self.settings.httpRetries,
+                    backoff_factor = self.settings.httpBackoffSeconds,
+                    status_forcelist = [429, 500, 502, 503, 504],
+                    allowed_methods = ["GET", "HEAD"],
+                    respect_retry_after_header = True)
+                # pool_block makes pool_maxsize a hard limit of open connections per host
+                adapter = requests.adapters.HTTPAdapter(pool_connections = 32,
+                    pool_maxsize = max(1, self.settings.httpConnectionsPerHost),
+                    pool_block = True,
+                    max_retries = _retry)
+
+                session = requests.Session()
+                session.headers.update(self.defaultHeaders)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                HttpService.session = session
+
+        return HttpService.session
+
+    def get(self, url: str, headers: dict = None, timeout: int = None, stream: bool = False) -> "requests.Response":
+        """
+        GET URL using the shared session, retrying with backoff on connection errors and 429/5xx responses.
+
+        Args:
+            url (str): URL to get.
+            headers (dict, optional): Extra headers. Defaults to None.
+            timeout (int, optional): Timeout in seconds. Defaults to httpTimeoutSeconds in settings.
+            stream (bool, optional): Stream content instead of reading it all at once. Defaults to False.
+
+        Returns:
+            requests.Response: Response.
+        """
+
+        _timeout = timeout if(timeout != None) else self.settings.httpTimeoutSeconds
+        return self.getSession().get(url, headers = headers, timeout = _timeout, stream = stream)
+
+    def getTitle(self, url: str) -> str:
+        """
+        Get title of HTML page.
+
+        Args:
+            url (str): URL of page.
+
+        Returns:
+            str | None: Title if page has one, else None.
+        """
+
+        response = self.get(url)
+        response.raise_for_status()
+        document = bs4.BeautifulSoup(response.content, "html.parser")
+        if(document.title == None or document.title.string == None):
+            return None
+
+        return document.title.string
+
+    def downloadFile(self, url: str, path: str, progressCallback: Callable[[int, int], None] = None) -> str:
+        """
+        Download file at URL to path, streaming it to a .part file which is renamed when complete. If a .part file exists from an interrupted download, it is resumed with a Range request.
+
+        Args:
+            url (str): URL of file.
+            path (str): Path to save file to.
+            progressCallback (Callable[[int, int], None], optional): Function called with bytes downloaded and total bytes (None if unknown) after each chunk. Defaults to None.
+
+        Returns:
+            str: Path of file.
+        """
+
+        partPath = path + ".part"
+        downloadedBytes = os.path.getsize(partPath) if(os.path.exists(partPath)) else 0
+        headers = { "Range": f"bytes={downloadedBytes}-" } if(downloadedBytes > 0) else None
+        with self.get(url, headers = headers, stream = True) as response:
+            if(response.status_code == 416 and downloadedBytes > 0):
+                # Range starts at end of file, .part is already complete
+                os.replace(partPath, path)
+                return path
+
+            response.raise_for_status()
+            if(response.status_code != 206):
+                # Server ignored Range, start over
+                downloadedBytes = 0
+
+            contentLength = response.headers.get("Content-Length")
+            totalBytes = downloadedBytes + int(contentLength) if(contentLength != None and contentLength.isdigit()) else None
+            with open(partPath, "ab" if(downloadedBytes > 0) else "wb") as file:
+                for chunk in response.iter_content(chunk_size = 256 * 1024):
+                    file.write(chunk)
+                    downloadedBytes += len(chunk)
+                    if(progressCallback != None):
+                        progressCallback(downloadedBytes, totalBytes)
+
+        os.replace(partPath, path)
+        return path
@@ -4,7 +4,6 @@ import subprocess
 import uuid
 from copy import copy
 from typing import List
-from psutil import Popen
 
 from grdUtil.BashColor import BashColor
 from grdUtil.DateTimeUtil import getDateTime
@@ -13,6 +12,7 @@ from grdUtil.PrintUtil import printD, printLists, printS, printStack
 
 from Commands import Commands
 from enums.StreamSourceType import StreamSourceType, StreamSourceTypeUtil
+from LazyImport import LazyModule
 from model.PlaybackInput import PlaybackInput
 from model.Playlist import Playlist
 from model.QueueStream import QueueStream
@@ -21,6 +21,8 @@ from services.QueueStreamService import QueueStreamService
 from services.StreamSourceService import StreamSourceService
 from Settings import Settings
 
+psutil = LazyModule("psutil")
+
 
 class PlaybackService():
     commands = Commands()
@@ -76,14 +78,22 @@ class PlaybackService():
             printS("No streams found in \"", playlist.name, "\". Ending playback.")
             return False
 
-        streams = []
-        rawStreams = self.playlistService.getStreamsByPlaylistId(playlist.id)
-
-        if(len(rawStreams) == 0):
-            printS("Playlist \"", playlist.name, "\" has ", len(streams), " streams, but they could not be found in database (they may have been removed). Ending playback.")
+        # Only QueueStreams to play are read, as found by the states of the Playlist
+        states = self.playlistService.getStreamStates(playlist)
+        stateIndex = self.playlistService.stateIndex
+        if(len(stateIndex.getIndices(states, includeSoftDeleted = True)) == 0):
+            printS("Playlist \"", playlist.name, "\" has ", len(playlist.streamIds), " streams, but they could not be found in database (they may have been removed). Ending playback.")
             return False
 
-        streams = rawStreams[startIndex:]
+        indices = [_ for _ in stateIndex.getIndices(states) if _ >= startIndex]
+        if(not playlist.playWatchedStreams):
+            watchedIndices = [_ for _ in indices if states["flags"][_] & stateIndex.watchedFlag]
+            if(len(watchedIndices) > 0):
+                lastWatched = max(states["watched"][_] for _ in watchedIndices)
+                printS("Skipping ", len(watchedIndices), " stream(s) marked as watched, last watched ", lastWatched, ".", color = BashColor.WARNING)
+                indices = [_ for _ in indices if not states["flags"][_] & stateIndex.watchedFlag]
+
+        streams = [_ for _ in self.queueStreamService.getMany([playlist.streamIds[_] for _ in indices]) if _ != None]
         if(shuffle):
             random.shuffle(streams)
 
@@ -126,9 +136,12 @@ class PlaybackService():
             return nWatched
         
         streamsToSkip = 0
-        streamsIndex = playlist.streamIds.index(streams[0].id)
+        # Streams to play can be shuffled, or have watched streams between them left out
+        positions = {}
+        for position, id in enumerate(playlist.streamIds):
+            positions.setdefault(id, position)
         for i, stream in enumerate(streams):
-            streamsIndex += 1
+            streamsIndex = positions.get(stream.id, i) + 1
             
             if(streamsToSkip > 0):
                 streamsToSkip = streamsToSkip - 1
@@ -185,7 +198,7 @@ class PlaybackService():
             
         return nWatched
     
-    def openQueueStreamBrowser(self, url: str) -> Popen:
+    def openQueueStreamBrowser(self, url: str) -> "psutil.Popen":
         """
         Open a URL in the browser.
 
@@ -332,7 +345,12 @@ class PlaybackService():
             printS("Failed to add cross-add streams, missing playlistIds or indices.", color = BashColor.WARNING)
             return result
         
+        containingPlaylistIds = self.playlistService.getPlaylistIdsContaining(queueStream.id)
         for id in ids:
+            if(id in containingPlaylistIds):
+                printS("\"", queueStream.name, "\" is already in Playlist with ID ", id, ", skipping.", color = BashColor.WARNING)
+                continue
+            
             newQueueStream = copy(queueStream)
             newQueueStream.id = str(uuid.uuid4())
             addResult = self.playlistService.addStreams(id, [newQueueStream])
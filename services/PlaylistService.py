@@ -1,42 +1,55 @@
 import os
-from typing import List
+import time
+from typing import Dict, List, Tuple
 
-from pytubefix import Playlist as PyTubePlaylist, YouTube
-import validators
 from grdException.ArgumentException import ArgumentException
 from grdException.DatabaseException import DatabaseException
 from grdException.NotFoundException import NotFoundException
-from grdService.BaseService import BaseService
 from grdUtil.BashColor import BashColor
 from grdUtil.DateTimeUtil import getDateTime, getDateTimeAsNumber
 from grdUtil.InputUtil import sanitize
 from grdUtil.LocalJsonRepository import LocalJsonRepository
 from grdUtil.LogLevel import LogLevel
 from grdUtil.LogUtil import LogUtil
-from grdUtil.PrintUtil import printD, printS
 from grdUtil.StrUtil import maxLen
 from grdUtil.FileUtil import makeFiles
 from datetime import timedelta
 
+from LazyImport import LazyModule
 from model.Playlist import Playlist
 from model.QueueStream import QueueStream
 from model.StreamSource import StreamSource
+from services.EntityService import EntityService
 from services.QueueStreamService import QueueStreamService
 from services.StreamSourceService import StreamSourceService
+from services.TaskService import printD, printS
 from Settings import Settings
+from storage.PlaylistMembershipIndex import PlaylistMembershipIndex
+from storage.PlaylistStateIndex import PlaylistStateIndex
+
+pytubefix = LazyModule("pytubefix")
+validators = LazyModule("validators")
 
 T = Playlist
 
-class PlaylistService(BaseService[T]):
+class PlaylistService(EntityService[T]):
     settings = Settings()
     queueStreamService = QueueStreamService()
     streamSourceService = StreamSourceService()
+    membershipIndex = PlaylistMembershipIndex(os.path.join(settings.localStoragePath, "playlistMembershipIndex.json"))
+    membershipIndexSynced: bool = False
+    dedupIndex = QueueStreamService.dedupIndex
+    stateIndex = PlaylistStateIndex(os.path.join(settings.localStoragePath, "PlaylistStateIndex"))
+    sortedCache: List[Playlist] = None
+    sortedCacheTime: float = 0.0
+    sortedCacheSeconds: int = 60
+    searchFields: List[str] = ["name"]
     log: LogUtil = None
 
     def __init__(self):
         self.log = LogUtil(self.settings.logDirPath, self.settings.debug, LogLevel.VERBOSE)
         
-        BaseService.__init__(self, T, self.settings.debug, os.path.join(self.settings.localStoragePath, "Playlist"))
+        EntityService.__init__(self, T, self.settings.debug, os.path.join(self.settings.localStoragePath, "Playlist"))
         
     def addStreams(self, playlistId: str, streams: List[QueueStream]) -> List[QueueStream]:
         """
@@ -55,16 +68,12 @@ class PlaylistService(BaseService[T]):
             self.log.logAsText(f"addStreams - Playlist with ID {playlistId} was not found.", logLevel = LogLevel.CRITICAL)
             raise NotFoundException(f"addStreams - Playlist with ID {playlistId} was not found.")
 
-        playlistStreamUris = []
-        playlistStreamNames = []
         if(not playlist.allowDuplicates):
-            playlistStreams = self.getStreamsByPlaylistId(playlist.id)
-            playlistStreamUris = [_.uri for _ in playlistStreams]
-            playlistStreamNames = [_.name for _ in playlistStreams]
+            self.syncDedupIndex(playlist)
             
         added = []
         for stream in streams:            
-            if(not playlist.allowDuplicates and (stream.uri in playlistStreamUris or stream.name in playlistStreamNames)):
+            if(not playlist.allowDuplicates and self.dedupIndex.contains(playlist.id, stream)):
                 self.log.logAsText(f"addStreams - Attempted to add stream {stream.uri} but Playlist with ID {playlistId} does not allow duplicates.", logLevel = LogLevel.VERBOSE)
                 printS("\"", stream.name, "\" / ", stream.uri, " already exists in Playlist \"", playlist.name, "\" and allow duplicates for this Playlist is disabled.", color = BashColor.WARNING)
                 continue
@@ -76,12 +85,18 @@ class PlaylistService(BaseService[T]):
             
             playlist.streamIds.append(stream.id)
             added.append(addResult)
+            if(not playlist.allowDuplicates):
+                self.dedupIndex.addStream(playlist.id, addResult)
 
         playlist.updated = getDateTime()
         updateResult = self.update(playlist)
         if(len(added) > 0 and updateResult != None):
+            if(not playlist.allowDuplicates):
+                self.dedupIndex.save(playlist.id)
             return added
         else:
+            for stream in added:
+                self.dedupIndex.removeStream(playlist.id, stream.id)
             self.log.logAsText(f"addStreams - No streams added and updateResult failed, removing potentially added QueueStreams.", logLevel = LogLevel.CRITICAL)
             # Delete added QueueStreams if update of Playlist failed
             for stream in added:
@@ -332,8 +347,8 @@ class PlaylistService(BaseService[T]):
             raise NotFoundException(f"getStreamsByPlaylistId - Playlist with ID {playlistId} was not found.")
 
         playlistStreams = []
-        for id in playlist.streamIds:
-            stream = self.queueStreamService.get(id, includeSoftDeleted)
+        streams = self.queueStreamService.getMany(playlist.streamIds, includeSoftDeleted)
+        for id, stream in zip(playlist.streamIds, streams):
             if(stream == None):
                 printS("A QueueStream with ID: ", id, " was Listed in Playlist \"", playlist.name, "\", but was not found in the database. Consider removing it by running the purge command.", color = BashColor.WARNING)
                 continue
@@ -342,6 +357,44 @@ class PlaylistService(BaseService[T]):
 
         return playlistStreams
     
+    def getStreamPage(self, playlistId: str, offset: int = 0, limit: int = 50, cursor: str = None, includeSoftDeleted: bool = False) -> Tuple[List[Tuple[int, QueueStream]], int, int]:
+        """
+        Get a page of QueueStreams in playlist from playlistId, reading only the QueueStreams of the page.
+
+        Args:
+            playlistId (str): ID of playlist.
+            offset (int): Index in playlist of first QueueStream. Defaults to 0.
+            limit (int): Max number of QueueStreams. Defaults to 50.
+            cursor (str): ID of the last QueueStream of the previous page, page starts after it. Overrides offset, and stays correct if QueueStreams before it are added or removed. Defaults to None.
+            includeSoftDeleted (bool): should include soft-deleted entities.
+
+        Returns:
+            Tuple[List[Tuple[int, QueueStream]], int, int]: Index in playlist and QueueStream of each QueueStream in page, offset of next page (None if this is the last page), and total number of QueueStreams in playlist.
+        """
+
+        playlist = self.get(playlistId, includeSoftDeleted)
+        if(playlist == None):
+            raise NotFoundException(f"getStreamPage - Playlist with ID {playlistId} was not found.")
+
+        _offset = max(0, offset)
+        if(cursor != None):
+            if(cursor not in playlist.streamIds):
+                raise NotFoundException(f"getStreamPage - QueueStream with ID {cursor} is not in Playlist \"{playlist.name}\".")
+
+            _offset = playlist.streamIds.index(cursor) + 1
+
+        pageIds = playlist.streamIds[_offset:_offset + max(0, limit)]
+        page = []
+        for index, id, stream in zip(range(_offset, _offset + len(pageIds)), pageIds, self.queueStreamService.getMany(pageIds, includeSoftDeleted)):
+            if(stream == None):
+                printS("A QueueStream with ID: ", id, " was Listed in Playlist \"", playlist.name, "\", but was not found in the database. Consider removing it by running the purge command.", color = BashColor.WARNING)
+                continue
+
+            page.append((index, stream))
+
+        nextOffset = _offset + len(pageIds)
+        return (page, nextOffset if(nextOffset < len(playlist.streamIds)) else None, len(playlist.streamIds))
+    
     def getUnwatchedStreamsByPlaylistId(self, playlistId: str, includeSoftDeleted: bool = False) -> List[QueueStream]:
         """
         Get unwatched QueueStreams in playlist from playlistId.
@@ -358,17 +411,15 @@ class PlaylistService(BaseService[T]):
         if(playlist == None):
             raise NotFoundException(f"getUnwatchedStreamsByPlaylistId - Playlist with ID {playlistId} was not found.")
 
-        playlistStreams = []
-        for id in playlist.streamIds:
-            stream = self.queueStreamService.get(id, includeSoftDeleted)
-            if(stream == None):
-                printS("A QueueStream with ID: ", id, " was Listed in Playlist \"", playlist.name, "\", but was not found in the database. Consider removing it by running the purge command.", color = BashColor.WARNING)
-                continue
-            
-            if(stream.watched == None):
-                playlistStreams.append(stream)
+        # Only unwatched QueueStreams are read, as found by the states of the Playlist
+        states = self.getStreamStates(playlist)
+        for i in self.stateIndex.getMissingIndices(states):
+            printS("A QueueStream with ID: ", playlist.streamIds[i], " was Listed in Playlist \"", playlist.name, "\", but was not found in the database. Consider removing it by running the purge command.", color = BashColor.WARNING)
+
+        ids = [playlist.streamIds[_] for _ in self.stateIndex.getIndices(states, False, includeSoftDeleted)]
+        streams = self.queueStreamService.getMany(ids, includeSoftDeleted)
 
-        return playlistStreams    
+        return [_ for _ in streams if _ != None and _.watched == None]
     
     def getSourcesByPlaylistId(self, playlistId: str, getFetchEnabledOnly: bool = False, includeSoftDeleted: bool = False) -> List[StreamSource]:
         """
@@ -387,8 +438,8 @@ class PlaylistService(BaseService[T]):
             raise NotFoundException(f"getSourcesByPlaylistId - Playlist with ID {playlistId} was not found.")
 
         playlistSources = []
-        for id in playlist.streamSourceIds:
-            source = self.streamSourceService.get(id, includeSoftDeleted)
+        sources = self.streamSourceService.getMany(playlist.streamSourceIds, includeSoftDeleted)
+        for id, source in zip(playlist.streamSourceIds, sources):
             if(source == None):
                 printS("A StreamSource with ID: ", id, " was Listed in Playlist \"", playlist.name, "\", but was not found in the database. Consider removing it by running the purge command.", color = BashColor.WARNING)
                 continue
@@ -400,6 +451,23 @@ class PlaylistService(BaseService[T]):
 
         return playlistSources
 
+    def getStreamSourcesOfStreams(self, streams: List[QueueStream], includeSoftDeleted: bool = False) -> Dict[str, StreamSource]:
+        """
+        Get StreamSources QueueStreams were fetched from, reading each StreamSource once.
+
+        Args:
+            streams (List[QueueStream]): QueueStreams to get StreamSources for, None-entries are ignored.
+            includeSoftDeleted (bool): should include soft-deleted entities.
+
+        Returns:
+            Dict[str, StreamSource]: StreamSources found, by ID.
+        """
+
+        sourceIds = list(dict.fromkeys([_.streamSourceId for _ in streams if _ != None and _.streamSourceId != None]))
+        sources = self.streamSourceService.getMany(sourceIds, includeSoftDeleted)
+
+        return {id: source for id, source in zip(sourceIds, sources) if source != None}
+
     def addYouTubePlaylist(self, playlist: Playlist, url: str) -> T:
         """
         Create a Playlist, using a YouTube playlist as the starting point. Videos will be added as streams in the playlist and source will be the playlist.
@@ -421,7 +489,7 @@ class PlaylistService(BaseService[T]):
         if "&si=" in url:
             url = url.split("&si=")[0]
             
-        ytPlaylist = PyTubePlaylist(url)
+        ytPlaylist = pytubefix.Playlist(url)
         try:
             # For some reasons the property call just fails for invalid playlist, instead of being None. Except = fail.
             ytPlaylist.title == None
@@ -435,7 +503,7 @@ class PlaylistService(BaseService[T]):
         
         streamsToAdd = []
         for videoUrl in ytPlaylist.video_urls:
-            video = YouTube(videoUrl)
+            video = pytubefix.YouTube(videoUrl)
             stream = QueueStream(name = sanitize(video.title), uri = video.watch_url, isWeb= True)
             streamsToAdd.append(stream)
         
@@ -471,9 +539,9 @@ class PlaylistService(BaseService[T]):
             
             playlistDetailsString = playlist.detailsString(includeUri, includeId, includeDatetime, includeListCount = False)
             if(includeListCount):
-                unwatchedStreams = self.getUnwatchedStreamsByPlaylistId(playlist.id)
+                nUnwatched = len(self.stateIndex.getIndices(self.getStreamStates(playlist), False))
                 fetchedSources = self.getSourcesByPlaylistId(playlist.id, getFetchEnabledOnly = True)
-                sourcesListString = f", unwatched streams: {len(unwatchedStreams)}/{len(playlist.streamIds)}"
+                sourcesListString = f", unwatched streams: {nUnwatched}/{len(playlist.streamIds)}"
                 streamsListString = f", fetched sources: {len(fetchedSources)}/{len(playlist.streamSourceIds)}"
                 playlistDetailsString += sourcesListString + streamsListString
 
@@ -483,8 +551,8 @@ class PlaylistService(BaseService[T]):
             if(len(playlist.streamSourceIds) == 0):
                 printS("\tNo sources added yet.")
             
-            for i, sourceId in enumerate(playlist.streamSourceIds):
-                source = self.streamSourceService.get(sourceId, includeSoftDeleted)
+            sources = self.streamSourceService.getMany(playlist.streamSourceIds, includeSoftDeleted)
+            for i, (sourceId, source) in enumerate(zip(playlist.streamSourceIds, sources)):
                 if(source == None):
                     printS("\tStreamSource not found (ID: \"", sourceId, "\").", color = BashColor.FAIL)
                     continue
@@ -498,15 +566,16 @@ class PlaylistService(BaseService[T]):
             if(len(playlist.streamIds) == 0):
                 printS("\tNo streams added yet.")
             
-            for i, streamId in enumerate(playlist.streamIds):
-                stream = self.queueStreamService.get(streamId, includeSoftDeleted)
+            streams = self.queueStreamService.getMany(playlist.streamIds, includeSoftDeleted)
+            streamSources = self.getStreamSourcesOfStreams(streams, includeSoftDeleted) if(includeSource) else {}
+            for i, (streamId, stream) in enumerate(zip(playlist.streamIds, streams)):
                 if(stream == None):
                     printS("\tQueueStream not found (ID: \"", streamId, "\").", color = BashColor.FAIL)
                     continue
                 
                 sourceString = ""
                 if(includeSource and stream.streamSourceId != None):
-                    streamSource = self.streamSourceService.get(stream.streamSourceId, includeSoftDeleted)
+                    streamSource = streamSources.get(stream.streamSourceId)
                     
                     if(streamSource == None):
                         sourceString = ", from: [missing]" 
@@ -546,15 +615,17 @@ class PlaylistService(BaseService[T]):
                 printS("\tNo streams added yet.")
             
             j = streamStartIndex
-            for i, streamId in enumerate(playlist.streamIds[streamStartIndex:]):
-                stream = self.queueStreamService.get(streamId, includeSoftDeleted)
+            streamIds = playlist.streamIds[streamStartIndex:]
+            streams = self.queueStreamService.getMany(streamIds, includeSoftDeleted)
+            streamSources = self.getStreamSourcesOfStreams(streams, includeSoftDeleted) if(includeSource) else {}
+            for i, (streamId, stream) in enumerate(zip(streamIds, streams)):
                 if(stream == None):
                     printS("\tQueueStream not found (ID: \"", streamId, "\").", color = BashColor.FAIL)
                     continue
                 
                 sourceString = ""
                 if(includeSource and stream.streamSourceId != None):
-                    streamSource = self.streamSourceService.get(stream.streamSourceId, includeSoftDeleted)
+                    streamSource = streamSources.get(stream.streamSourceId)
                     
                     if(streamSource == None):
                         sourceString = ", from [source missing]" 
@@ -591,9 +662,9 @@ class PlaylistService(BaseService[T]):
             if(len(playlist.streamIds) == 0):
                 printS("\tNo streams added yet.")
             
-            for i, streamId in enumerate(playlist.streamIds):
-                stream = self.queueStreamService.get(streamId, includeSoftDeleted)
-                
+            streams = self.queueStreamService.getMany(playlist.streamIds, includeSoftDeleted)
+            streamSources = self.getStreamSourcesOfStreams([_ for _ in streams if _ != None and _.watched != None], includeSoftDeleted)
+            for i, (streamId, stream) in enumerate(zip(playlist.streamIds, streams)):
                 if(stream == None):
                     printS("\tQueueStream not found (ID: \"", streamId, "\").", color = BashColor.FAIL)
                     continue
@@ -603,7 +674,7 @@ class PlaylistService(BaseService[T]):
                 
                 sourceString = "from [missing]"
                 if(stream.streamSourceId != None):
-                    streamSource = self.streamSourceService.get(stream.streamSourceId, includeSoftDeleted)
+                    streamSource = streamSources.get(stream.streamSourceId)
                     if(streamSource != None):
                         sourceString = ", from: \"" + maxLen(streamSource.name, 20) + "\""
                         
@@ -637,10 +708,9 @@ class PlaylistService(BaseService[T]):
             if(len(playlist.streamIds) == 0):
                 printS("\tNo streams added yet.")
             
-            streams = playlist.streamIds[startIndex:endIndex]
-            for i, streamId in enumerate(streams):
-                stream = self.queueStreamService.get(streamId, includeSoftDeleted)
-                
+            streamIds = playlist.streamIds[startIndex:endIndex]
+            streams = self.queueStreamService.getMany(streamIds, includeSoftDeleted)
+            for i, (streamId, stream) in enumerate(zip(streamIds, streams)):
                 if(stream == None):
                     printS("\tQueueStream not found (ID: \"", streamId, "\").", color = BashColor.FAIL)
                     continue
@@ -675,10 +745,8 @@ class PlaylistService(BaseService[T]):
         if(len(playlist.streamSourceIds) == 0):
             printS("\tNo sources added yet.")
         
-        sources = playlist.streamSourceIds
-        for i, sourceId in enumerate(sources):
-            source = self.streamSourceService.get(sourceId, includeSoftDeleted)
-            
+        sources = self.streamSourceService.getMany(playlist.streamSourceIds, includeSoftDeleted)
+        for i, (sourceId, source) in enumerate(zip(playlist.streamSourceIds, sources)):
             if(source == None):
                 printS("\tStreamSource not found (ID: \"", sourceId, "\").", color = BashColor.FAIL)
                 continue
@@ -699,10 +767,8 @@ class PlaylistService(BaseService[T]):
         if(len(playlist.streamIds) == 0):
             printS("\tNo streams added yet.")
         
-        streams = playlist.streamIds
-        for i, streamId in enumerate(streams):
-            stream = self.queueStreamService.get(streamId, includeSoftDeleted)
-            
+        streams = self.queueStreamService.getMany(playlist.streamIds, includeSoftDeleted)
+        for i, (streamId, stream) in enumerate(zip(playlist.streamIds, streams)):
             if(stream == None):
                 printS("\tQueueStream not found (ID: \"", streamId, "\").", color = BashColor.FAIL)
                 continue
@@ -718,41 +784,33 @@ class PlaylistService(BaseService[T]):
                 
         return result
     
-    def unwatchPlaylist(self, playlist: Playlist) -> int:
+    def setPlaylistWatched(self, playlist: Playlist, watched: bool, streamIds: List[str] = None) -> int:
         """
-        Unwatch all streams in Playlist.
+        Mark QueueStreams in Playlist as watched or unwatched, writing only QueueStreams not already in that state, in one batch.
         
         Args:
-            playlist (Playlist): Playlist to unwatch.
+            playlist (Playlist): Playlist with QueueStreams.
+            watched (bool): Should QueueStreams be marked as watched, else unwatched.
+            streamIds (List[str], optional): IDs of QueueStreams in Playlist to mark. Defaults to None, all QueueStreams in Playlist.
 
         Returns:
-            int: number of streams unwatched.
+            int: number of streams changed.
         """
         
-        result = 0
-                
-        printS("Unwatching QueueStreams for \"", playlist.name, "\"...")
+        printS(("Watching" if watched else "Unwatching"), " QueueStreams for \"", playlist.name, "\"...")
         if(len(playlist.streamIds) == 0):
             printS("\tNo streams added yet.")
             return 0
         
-        streams = playlist.streamIds
-        for i, streamId in enumerate(streams):
-            stream = self.queueStreamService.get(streamId)
-            
-            if(stream == None):
-                printS("\tQueueStream not found (ID: \"", streamId, "\").", color = BashColor.FAIL)
-                continue
-                
-            if(stream.watched != None):
-                result += 1
-                
-            stream.watched = None
-            self.queueStreamService.update(stream)
-                
-        printS("Updated ", result, " stream(s).", color = BashColor.GREEN)
+        ids = playlist.streamIds
+        if(streamIds != None):
+            selectedIds = set(streamIds)
+            ids = [_ for _ in playlist.streamIds if _ in selectedIds]
         
-        return result
+        changed = self.queueStreamService.setWatchedMany(ids, watched)
+        printS("Updated ", len(changed), " stream(s).", color = BashColor.GREEN)
+        
+        return len(changed)
      
     def getAllSorted(self, includeSoftDeleted: bool = False) -> List[Playlist]:
         """
@@ -770,6 +828,70 @@ class PlaylistService(BaseService[T]):
 
         return all
     
+    def getAllSortedCached(self) -> List[Playlist]:
+        """
+        Get all playlists, not soft-deleted, sorted like getAllSorted(), from a cache cleared when Playlists are changed through PlaylistService, or after sortedCacheSeconds for changes by other processes.
+        Playlists are shared, do not modify them.
+
+        Returns:
+            List[Playlist]: Playlists in storage, sorted.
+        """
+        
+        if(PlaylistService.sortedCache == None or time.monotonic() - PlaylistService.sortedCacheTime > self.sortedCacheSeconds):
+            PlaylistService.sortedCache = self.getAllSorted()
+            PlaylistService.sortedCacheTime = time.monotonic()
+        
+        return PlaylistService.sortedCache
+    
+    def getNextPlayableIndex(self, playlist: Playlist, index: int) -> int:
+        """
+        Get index of the first QueueStream from index that can be played: not soft-deleted or missing, and not watched unless playlist plays watched streams. Uses the states of the Playlist, QueueStreams skipped are not read.
+
+        Args:
+            playlist (Playlist): Playlist to play.
+            index (int): Index to start at.
+
+        Returns:
+            int | None: Index, None if no QueueStreams from index can be played.
+        """
+        
+        return self.stateIndex.findIndex(self.getStreamStates(playlist), index, playlist.playWatchedStreams)
+    
+    def getNextPlayableIndices(self, playlist: Playlist, index: int, count: int) -> List[int]:
+        """
+        Get indices of the next QueueStreams that can be played after index, like getNextPlayableIndex().
+
+        Args:
+            playlist (Playlist): Playlist to play.
+            index (int): Index of QueueStream playing.
+            count (int): Max number of indices.
+
+        Returns:
+            List[int]: Indices, empty if none.
+        """
+        
+        states = self.getStreamStates(playlist)
+        indices = []
+        nextIndex = self.stateIndex.findIndex(states, index + 1, playlist.playWatchedStreams)
+        while(nextIndex != None and len(indices) < count):
+            indices.append(nextIndex)
+            nextIndex = self.stateIndex.findIndex(states, nextIndex + 1, playlist.playWatchedStreams)
+        
+        return indices
+    
+    def getStreamStates(self, playlist: Playlist) -> dict:
+        """
+        Get watched and deleted state of every QueueStream in Playlist, in order of streamIds, without reading the QueueStreams. Synced with the watched index of QueueStreams and the stream IDs of Playlist when used.
+
+        Args:
+            playlist (Playlist): Playlist.
+
+        Returns:
+            dict: States, see PlaylistStateIndex.sync().
+        """
+        
+        return self.stateIndex.sync(playlist.id, playlist.streamIds, self.queueStreamService.getWatchedIndex(), self.queueStreamService.indexStreams, self.queueStreamService.getChangedIdsSince)
+    
     def getAllIdsSorted(self, includeSoftDeleted: bool = False) -> List[str]:
         """
         Get all IDs of playlists sorted after getAllSorted().
@@ -784,4 +906,191 @@ class PlaylistService(BaseService[T]):
         all = self.getAllSorted(includeSoftDeleted)
         
         return [entity.id for entity in all]
-    
\ No newline at end of file
+    
+    def add(self, entity: T) -> T:
+        """
+        Add Playlist and index its QueueStreams and StreamSources.
+
+        Args:
+            entity (Playlist): Playlist to add.
+
+        Returns:
+            Playlist | None: Playlist if added, else None.
+        """
+        
+        result = EntityService.add(self, entity)
+        if(result != None):
+            self.indexPlaylist(result)
+            
+        return result
+    
+    def update(self, entity: T, *args, **kwargs) -> T:
+        """
+        Update Playlist and re-index its QueueStreams and StreamSources.
+
+        Args:
+            entity (Playlist): Playlist to update.
+
+        Returns:
+            Playlist | None: Playlist if updated, else None.
+        """
+        
+        result = EntityService.update(self, entity, *args, **kwargs)
+        if(result):
+            self.indexPlaylist(entity)
+            
+        return result
+    
+    def delete(self, id: str, *args, **kwargs) -> T:
+        """
+        Soft delete Playlist and mark it as deleted in index.
+
+        Args:
+            id (str): ID of Playlist to delete.
+
+        Returns:
+            Playlist | None: Playlist if deleted, else None.
+        """
+        
+        result = EntityService.delete(self, id, *args, **kwargs)
+        if(result != None):
+            self.indexPlaylist(self.get(id, includeSoftDeleted = True))
+            
+        return result
+    
+    def restore(self, id: str, *args, **kwargs) -> T:
+        """
+        Restore Playlist and mark it as not deleted in index.
+
+        Args:
+            id (str): ID of Playlist to restore.
+
+        Returns:
+            Playlist | None: Playlist if restored, else None.
+        """
+        
+        result = EntityService.restore(self, id, *args, **kwargs)
+        if(result != None):
+            self.indexPlaylist(self.get(id, includeSoftDeleted = True))
+            
+        return result
+    
+    def remove(self, id: str, *args, **kwargs) -> T:
+        """
+        Permanently remove Playlist and remove it from index.
+
+        Args:
+            id (str): ID of Playlist to remove.
+
+        Returns:
+            Playlist | None: Playlist if removed, else None.
+        """
+        
+        result = EntityService.remove(self, id, *args, **kwargs)
+        if(result != None):
+            self.membershipIndex.removePlaylist(id)
+            self.dedupIndex.removePlaylist(id)
+            self.stateIndex.removePlaylist(id)
+            PlaylistService.sortedCache = None
+            
+        return result
+    
+    def removeMany(self, ids: List[str]) -> List[str]:
+        """
+        Permanently remove Playlists and remove them from index.
+
+        Args:
+            ids (List[str]): IDs of Playlists to remove.
+
+        Returns:
+            List[str]: IDs of Playlists removed.
+        """
+        
+        result = EntityService.removeMany(self, ids)
+        for id in result:
+            self.membershipIndex.removePlaylist(id)
+            self.dedupIndex.removePlaylist(id)
+            self.stateIndex.removePlaylist(id)
+        if(len(result) > 0):
+            PlaylistService.sortedCache = None
+            
+        return result
+    
+    def indexPlaylist(self, playlist: Playlist) -> None:
+        """
+        Update index of which Playlists QueueStreams and StreamSources are in with Playlist.
+
+        Args:
+            playlist (Playlist): Playlist to index.
+        """
+        
+        if(playlist == None):
+            return
+        
+        # Signature of file is only known when the Playlist was written straight to it
+        signature = None
+        if(self.repository == None and self.getFromJournal(playlist.id) == None):
+            signature = self.cache.getSignature(self.getFilePath(playlist.id))
+            
+        self.membershipIndex.setPlaylist(playlist, signature)
+        PlaylistService.sortedCache = None
+    
+    def getMembershipIndex(self) -> PlaylistMembershipIndex:
+        """
+        Get index of which Playlists QueueStreams and StreamSources are in, synced with stored Playlists the first time it is used.
+
+        Returns:
+            PlaylistMembershipIndex: Index.
+        """
+        
+        if(not PlaylistService.membershipIndexSynced):
+            reindexed = self.membershipIndex.sync(self.getStorageSignatures(), lambda ids: self.getMany(ids, includeSoftDeleted = True))
+            printD("Re-indexed ", reindexed, " Playlist(s) in membership index.", debug = self.settings.debug)
+            PlaylistService.membershipIndexSynced = True
+            
+        return self.membershipIndex
+    
+    def getPlaylistIdsContaining(self, id: str, includeSoftDeleted: bool = False) -> List[str]:
+        """
+        Get IDs of Playlists containing a QueueStream or StreamSource.
+
+        Args:
+            id (str): ID of QueueStream or StreamSource.
+            includeSoftDeleted (bool, optional): Should include soft-deleted Playlists. Defaults to False.
+
+        Returns:
+            List[str]: IDs of Playlists.
+        """
+        
+        return self.getMembershipIndex().getPlaylistIds(id, includeSoftDeleted)
+    
+    def syncDedupIndex(self, playlist: Playlist) -> None:
+        """
+        Bring index of URIs, remote IDs, and names of QueueStreams in Playlist up to date, reading only QueueStreams added to Playlist or changed since it was last synced.
+
+        Args:
+            playlist (Playlist): Playlist to sync index for.
+        """
+        
+        changedIds, position = self.queueStreamService.getChangedIdsSince(self.dedupIndex.getPosition(playlist.id))
+        if(self.dedupIndex.sync(playlist.id, playlist.streamIds, changedIds, position, lambda ids: self.queueStreamService.getMany(ids, includeSoftDeleted = True))):
+            self.dedupIndex.save(playlist.id)
+    
+    def getNonDuplicateStreams(self, playlistId: str, streams: List[QueueStream]) -> List[QueueStream]:
+        """
+        Get streams that are not already in Playlist by URI, remote ID, or name, or all streams if Playlist allows duplicates.
+
+        Args:
+            playlistId (str): ID of Playlist to check against.
+            streams (List[QueueStream]): Streams to check.
+
+        Returns:
+            List[QueueStream]: Streams not in Playlist.
+        """
+        
+        playlist = self.get(playlistId)
+        if(playlist == None or playlist.allowDuplicates):
+            return streams
+        
+        self.syncDedupIndex(playlist)
+        return [_ for _ in streams if not self.dedupIndex.contains(playlist.id, _)]
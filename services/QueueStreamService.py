@@ -1,17 +1,30 @@
 import os
+import time
+from typing import List
 
-import validators
-from grdService.BaseService import BaseService
+from grdUtil.DateTimeUtil import getDateTime
+from grdUtil.PrintUtil import printD
+from LazyImport import LazyModule
 from model.QueueStream import QueueStream
+from services.EntityService import EntityService
 from Settings import Settings
+from storage.PlaylistDedupIndex import PlaylistDedupIndex
+from storage.WatchedIndex import WatchedIndex
+
+validators = LazyModule("validators")
 
 T = QueueStream
 
-class QueueStreamService(BaseService[T]):
+class QueueStreamService(EntityService[T]):
     settings = Settings()
+    watchedIndex = WatchedIndex(os.path.join(settings.localStoragePath, "queueStreamWatchedIndex.json"))
+    watchedIndexSyncedTime: float = None
+    watchedIndexDataVersion: int = None
+    watchedIndexSyncSeconds: int = 5
+    dedupIndex = PlaylistDedupIndex(os.path.join(settings.localStoragePath, "PlaylistDedupIndex"))
 
     def __init__(self):
-        BaseService.__init__(self, T, self.settings.debug, os.path.join(self.settings.localStoragePath, "QueueStream"))
+        EntityService.__init__(self, T, self.settings.debug, os.path.join(self.settings.localStoragePath, "QueueStream"))
 
     def add(self, queueStream: T) -> T:
         """
@@ -28,5 +41,262 @@ class QueueStreamService(BaseService[T]):
         if(entity.isWeb):
             entity.isWeb = validators.url(entity.uri)
         
-        return BaseService.add(self, entity)
+        result = EntityService.add(self, entity)
+        if(result != None):
+            self.indexStream(result)
+            
+        return result
+    
+    def update(self, entity: T, *args, **kwargs) -> T:
+        """
+        Update QueueStream and re-index its watched state.
+
+        Args:
+            entity (QueueStream): QueueStream to update.
+
+        Returns:
+            QueueStream | None: QueueStream if updated, else None.
+        """
+        
+        result = EntityService.update(self, entity, *args, **kwargs)
+        if(result):
+            self.indexStream(entity)
+            
+        return result
+    
+    def delete(self, id: str, *args, **kwargs) -> T:
+        """
+        Soft delete QueueStream and mark it as deleted in index.
+
+        Args:
+            id (str): ID of QueueStream to delete.
+
+        Returns:
+            QueueStream | None: QueueStream if deleted, else None.
+        """
+        
+        result = EntityService.delete(self, id, *args, **kwargs)
+        if(result != None):
+            self.indexStream(self.get(id, includeSoftDeleted = True))
+            
+        return result
+    
+    def restore(self, id: str, *args, **kwargs) -> T:
+        """
+        Restore QueueStream and mark it as not deleted in index.
+
+        Args:
+            id (str): ID of QueueStream to restore.
+
+        Returns:
+            QueueStream | None: QueueStream if restored, else None.
+        """
+        
+        result = EntityService.restore(self, id, *args, **kwargs)
+        if(result != None):
+            self.indexStream(self.get(id, includeSoftDeleted = True))
+            
+        return result
+    
+    def remove(self, id: str, *args, **kwargs) -> T:
+        """
+        Permanently remove QueueStream and remove it from index.
+
+        Args:
+            id (str): ID of QueueStream to remove.
+
+        Returns:
+            QueueStream | None: QueueStream if removed, else None.
+        """
+        
+        result = EntityService.remove(self, id, *args, **kwargs)
+        if(result != None):
+            self.watchedIndex.removeStream(id)
+            self.dedupIndex.clearStream(id)
+            
+        return result
+    
+    def updateMany(self, entities: List[T]) -> List[T]:
+        """
+        Update QueueStreams in one batch and re-index their watched state.
+
+        Args:
+            entities (List[QueueStream]): QueueStreams to update.
+
+        Returns:
+            List[QueueStream]: QueueStreams updated.
+        """
+        
+        result = EntityService.updateMany(self, entities)
+        for queueStream in result:
+            self.indexStream(queueStream)
+            
+        return result
+    
+    def setWatchedMany(self, ids: List[str], watched: bool) -> List[T]:
+        """
+        Set watched state of QueueStreams, reading and writing only QueueStreams not already in that state, in one batch.
+
+        Args:
+            ids (List[str]): IDs of QueueStreams.
+            watched (bool): Should QueueStreams be marked as watched, else unwatched.
+
+        Returns:
+            List[QueueStream]: QueueStreams changed.
+        """
+        
+        # Skip QueueStreams known to be in the state already, QueueStreams missing from index or changed by another process are read to check
+        watchedIndex = self.getWatchedIndex()
+        changeIds = []
+        for id in dict.fromkeys(ids):
+            signature = self.cache.getSignature(self.getFilePath(id)) if(self.repository == None) else None
+            if(watchedIndex.isWatched(id, signature) != watched):
+                changeIds.append(id)
+        
+        now = getDateTime()
+        changed = []
+        for stream in self.getMany(changeIds):
+            if(stream == None or (stream.watched != None) == watched):
+                continue
+            
+            stream.watched = now if(watched) else None
+            changed.append(stream)
+            
+        return self.updateMany(changed)
+    
+    def deleteMany(self, entities: List[T]) -> List[T]:
+        """
+        Soft delete QueueStreams and mark them as deleted in index.
+
+        Args:
+            entities (List[QueueStream]): QueueStreams to delete.
+
+        Returns:
+            List[QueueStream]: QueueStreams deleted.
+        """
+        
+        result = EntityService.deleteMany(self, entities)
+        for queueStream in result:
+            self.indexStream(queueStream)
+            
+        return result
+    
+    def removeMany(self, ids: List[str]) -> List[str]:
+        """
+        Permanently remove QueueStreams and remove them from index.
+
+        Args:
+            ids (List[str]): IDs of QueueStreams to remove.
+
+        Returns:
+            List[str]: IDs of QueueStreams removed.
+        """
+        
+        result = EntityService.removeMany(self, ids)
+        for id in result:
+            self.watchedIndex.removeStream(id)
+            self.dedupIndex.clearStream(id)
+            
+        return result
+    
+    def indexStream(self, queueStream: T) -> None:
+        """
+        Update index of watched and deleted state, and indexes of duplicates in Playlists, with QueueStream.
+
+        Args:
+            queueStream (QueueStream): QueueStream to index.
+        """
+        
+        if(queueStream == None):
+            return
+        
+        signature = self.getStoredSignature(queueStream.id)
+        self.watchedIndex.setStream(queueStream, signature)
+        self.dedupIndex.updateStream(queueStream)
+    
+    def getStoredSignature(self, id: str) -> tuple:
+        """
+        Get signature (modified time and size of file) of stored QueueStream.
+
+        Args:
+            id (str): ID of QueueStream.
+
+        Returns:
+            tuple | None: Signature, None if stored in the database or not yet written from the journal to its file.
+        """
+        
+        # Signature of file is only known when the QueueStream was written straight to it
+        if(self.repository != None or self.getFromJournal(id) != None):
+            return None
+            
+        return self.cache.getSignature(self.getFilePath(id))
+    
+    def indexStreams(self, ids: List[str]) -> None:
+        """
+        Read and index watched and deleted state of QueueStreams, e.g. added by another process since the index was synced.
+
+        Args:
+            ids (List[str]): IDs of QueueStreams.
+        """
+        
+        for queueStream in self.getMany(ids, includeSoftDeleted = True):
+            self.indexStream(queueStream)
+    
+    def getWatchedIndex(self) -> WatchedIndex:
+        """
+        Get index of watched and deleted state of QueueStreams, synced with QueueStreams changed since its last sync when first used, and again when they may have been changed by another process.
+        Every stored QueueStream is only checked when changes since are not known, e.g. the index was never synced.
+
+        Returns:
+            WatchedIndex: Index.
+        """
+        
+        if(self.isWatchedIndexOutdated()):
+            dataVersion = self.repository.getDataVersion() if(self.repository != None) else None
+            getStreams = lambda ids: self.getMany(ids, includeSoftDeleted = True)
+            changedIds, position = self.getChangedIdsSince(self.watchedIndex.position)
+            if(changedIds == None):
+                reindexed = self.watchedIndex.sync(self.getStorageSignatures(), getStreams, position)
+            else:
+                reindexed = self.watchedIndex.syncChanged(changedIds, getStreams, self.getStoredSignature, position)
+            printD("Re-indexed ", reindexed, " QueueStream(s) in watched index.", debug = self.settings.debug)
+            QueueStreamService.watchedIndexSyncedTime = time.monotonic()
+            QueueStreamService.watchedIndexDataVersion = dataVersion
+            
+        return self.watchedIndex
+    
+    def isWatchedIndexOutdated(self) -> bool:
+        """
+        Check if watched index may be outdated by changes of other processes: not synced yet, the database changed since it was synced, or files were synced more than watchedIndexSyncSeconds ago.
+
+        Returns:
+            bool: Result.
+        """
+        
+        if(QueueStreamService.watchedIndexSyncedTime == None):
+            return True
+        
+        # Changes of files are only seen in the change log, the database tells when another process committed
+        if(self.repository != None):
+            return self.repository.getDataVersion() != QueueStreamService.watchedIndexDataVersion
+        
+        return time.monotonic() - QueueStreamService.watchedIndexSyncedTime > self.watchedIndexSyncSeconds
+    
+    def isPlayable(self, id: str, includeWatched: bool = False) -> bool:
+        """
+        Check if QueueStream exists, is not soft-deleted, and is not watched, without reading it unless it is missing from the index, e.g. added by another process.
+
+        Args:
+            id (str): ID of QueueStream.
+            includeWatched (bool, optional): Watched QueueStreams are playable. Defaults to False.
+
+        Returns:
+            bool: Result.
+        """
+        
+        watchedIndex = self.getWatchedIndex()
+        if(not watchedIndex.contains(id)):
+            self.indexStream(self.get(id, includeSoftDeleted = True))
+        
+        return watchedIndex.isPlayable(id, includeWatched)
         
\ No newline at end of file
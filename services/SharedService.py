@@ -1,31 +1,34 @@
 import re
-from typing import Dict, List
+from typing import Dict, List, Set
 
-import mechanize
 from grdUtil.BashColor import BashColor
 from grdUtil.InputUtil import sanitize
 from grdUtil.PrintUtil import printD, printS
-from pytubefix import YouTube
 
 from enums.StreamSourceType import StreamSourceType, StreamSourceTypeUtil
+from LazyImport import LazyModule
 from model.Playlist import Playlist
 from model.PlaylistDetailed import PlaylistDetailed
 from model.QueueStream import QueueStream
+from services.HttpService import HttpService
 from services.PlaylistService import PlaylistService
 from services.QueueStreamService import QueueStreamService
 from services.StreamSourceService import StreamSourceService
 from Settings import Settings
 
+pytubefix = LazyModule("pytubefix")
+
 
 class SharedService():
     settings = Settings()
+    httpService = HttpService()
     playlistService = PlaylistService()
     queueStreamService = QueueStreamService()
     streamSourceService = StreamSourceService()
 
     def getPageTitle(self, url: str) -> str:
         """
-        Get page title from the URL url, using mechanize or PyTube.
+        Get page title from the URL url, using the shared HTTP session or PyTube.
 
         Args:
             url (str): URL to page to get title from.
@@ -39,17 +42,12 @@ class SharedService():
         try:
             if(StreamSourceTypeUtil.strToStreamSourceType(url) == StreamSourceType.YOUTUBE and not isYouTubeChannel):
                 printD("Getting title from pytube.", color = BashColor.WARNING, debug = self.settings.debug)
-                yt = YouTube(url)
+                yt = pytubefix.YouTube(url)
                 title = yt.title
             else:
-                printD("Getting title from mechanize.", color = BashColor.WARNING, debug = self.settings.debug)
+                printD("Getting title from HTML.", color = BashColor.WARNING, debug = self.settings.debug)
                 try:
-                    br = mechanize.Browser()
-                    br.set_handle_robots(False)
-                    br.addheaders = [('User-agent', 'Mozilla/5.0 (X11; U; Linux i686; en-US; rv:1.9.0.1) Gecko/2008071615 Fedora/3.0.1-1.fc9 Firefox/3.0.1')]
-                    br.open(url)
-                    title = br.title()
-                    br.close()
+                    title = self.httpService.getTitle(url)
                 except Exception as e:
                     printS(f"Could not fetch name from URL {url}:\n{e}", color = BashColor.FAIL)
                     return None
@@ -77,19 +75,20 @@ class SharedService():
         if(playlist == None or playlist.playWatchedStreams):
             return PlaylistDetailed()
         
-        for id in playlist.streamIds:
-            stream = self.queueStreamService.get(id, includeSoftDeleted)
-            if(stream and stream.watched):
-                data.queueStreams.append(stream)
+        # Only watched QueueStreams are read, as found by the states of the Playlist
+        states = self.playlistService.getStreamStates(playlist)
+        ids = [playlist.streamIds[_] for _ in self.playlistService.stateIndex.getIndices(states, True, includeSoftDeleted)]
+        data.queueStreams = [_ for _ in self.queueStreamService.getMany(ids, includeSoftDeleted) if _ and _.watched]
         
         if(len(data.queueStreams) > 0):
-            data.playlists.append(playlist)
+            data.playlists = [playlist]
         
         return data
     
     def doPrune(self, data: Dict[List[Playlist], List[QueueStream]], includeSoftDeleted: bool = False, permanentlyDelete: bool = False) -> bool:
         """
         Prune (permanently remove/soft delete) watched QueueStreams from Playlists given as data.
+        QueueStreams are removed in bulk, and each Playlist is written once with all of them removed.
         
         Args:
             Dict[List[Playlist], List[QueueStream]]): Data to remove.
@@ -100,19 +99,22 @@ class SharedService():
             bool: Result.
         """
         
-        for stream in data.queueStreams:
-            if(permanentlyDelete):
-                self.queueStreamService.remove(stream.id, includeSoftDeleted)
-            else:
-                self.queueStreamService.delete(stream.id)
-                
-            for playlist in data.playlists:
-                if(stream.id in playlist.streamIds):
-                    playlist.streamIds.remove(stream.id)
-                result = self.playlistService.update(playlist)
-                if(not result):
-                    printD("failed to update Playlist \"", playlist.name, "\".", color = BashColor.WARNING, debug = self.settings.debug)
-                    return False
+        removedIds = set(_.id for _ in data.queueStreams)
+        if(permanentlyDelete):
+            self.queueStreamService.removeMany(list(removedIds))
+        else:
+            self.queueStreamService.deleteMany(data.queueStreams)
+        
+        for playlist in data.playlists:
+            streamIds = [_ for _ in playlist.streamIds if _ not in removedIds]
+            if(len(streamIds) == len(playlist.streamIds)):
+                continue
+            
+            playlist.streamIds = streamIds
+            result = self.playlistService.update(playlist)
+            if(not result):
+                printD("failed to update Playlist \"", playlist.name, "\".", color = BashColor.WARNING, debug = self.settings.debug)
+                return False
                     
         return True
     
@@ -137,7 +139,7 @@ class SharedService():
     
     def doPurge(self, data: PlaylistDetailed) -> bool:
         """
-        Purge (permanently remove) all soft-deleted entities given as data.
+        Purge (permanently remove) all soft-deleted entities given as data, removing the entities of each type in bulk.
             
         Args:
             data (PlaylistDetailed): Data to remove.
@@ -146,12 +148,9 @@ class SharedService():
             bool: Result.
         """
         
-        for _ in data.queueStreams:
-            self.queueStreamService.remove(_.id, True)
-        for _ in data.streamSources:
-            self.streamSourceService.remove(_.id, True)
-        for _ in data.playlists:
-            self.playlistService.remove(_.id, True)
+        self.queueStreamService.removeMany([_.id for _ in data.queueStreams])
+        self.streamSourceService.removeMany([_.id for _ in data.streamSources])
+        self.playlistService.removeMany([_.id for _ in data.playlists])
             
         return True
     
@@ -172,42 +171,23 @@ class SharedService():
         qIds = self.queueStreamService.getAllIds(includeSoftDeleted)
         sIds = self.streamSourceService.getAllIds(includeSoftDeleted)
         
-        allPlaylistQueueStreamIds = []
-        allPlaylistStreamStreamIds = []
-        for playlist in playlists:
-            allPlaylistQueueStreamIds.extend(playlist.streamIds)
-            allPlaylistStreamStreamIds.extend(playlist.streamSourceIds)
-        
-        unlinkedPlaylistQueueStreamIds = [_ for _ in qIds if(_ not in allPlaylistQueueStreamIds)]
-        unlinkedPlaylistStreamStreamIds = [_ for _ in sIds if(_ not in allPlaylistStreamStreamIds)]
+        membershipIndex = self.playlistService.getMembershipIndex()
+        unlinkedPlaylistQueueStreamIds = [_ for _ in qIds if(not membershipIndex.isLinked(_, includeSoftDeleted))]
+        unlinkedPlaylistStreamStreamIds = [_ for _ in sIds if(not membershipIndex.isLinked(_, includeSoftDeleted))]
         
         # Find unlinked QueueStreams and StreamSources (not found in any Playlists)
-        for id in unlinkedPlaylistQueueStreamIds:
-            if(not id in allPlaylistQueueStreamIds):
-                entity = self.queueStreamService.get(id, includeSoftDeleted)
-                data.queueStreams.append(entity)
-        for id in unlinkedPlaylistStreamStreamIds:
-            if(not id in allPlaylistStreamStreamIds):
-                entity = self.streamSourceService.get(id, includeSoftDeleted)
-                data.streamSources.append(entity)
+        data.queueStreams = [_ for _ in self.queueStreamService.getMany(unlinkedPlaylistQueueStreamIds, includeSoftDeleted) if _ != None]
+        data.streamSources = [_ for _ in self.streamSourceService.getMany(unlinkedPlaylistStreamStreamIds, includeSoftDeleted) if _ != None]
         
         # Find IDs in Playlists with no corresponding entity
-        for playlist in playlists:
-            for id in playlist.streamIds:
-                if(not self.queueStreamService.exists(id)):
-                    data.playlists.append(playlist)
-                    break
-                
-            for id in playlist.streamSourceIds:
-                if(not self.streamSourceService.exists(id)):
-                    data.playlists.append(playlist)
-                    break
+        danglingIds = self.getDanglingIds(playlists)
+        data.playlists = [_ for _ in playlists if _.id in danglingIds]
                 
         return data
     
     def doPurgePlaylists(self, data: PlaylistDetailed) -> bool:
         """
-        Purge Playlists given as data for dangling IDs.
+        Purge Playlists given as data for dangling IDs, writing only Playlists with IDs removed.
             
         Args:
             data (PlaylistDetailed): Data to remove where Playlist-list is Playlists to update, and str-list are IDs to remove from any field in Playlists.
@@ -216,28 +196,49 @@ class SharedService():
             bool: Result.
         """
         
+        danglingIds = self.getDanglingIds(data.playlists)
         for playlist in data.playlists:
-            updatedStreamIds = []
-            updatedStreamSourceService = []
+            ids = danglingIds.get(playlist.id)
+            if(not ids):
+                continue
             
-            for id in playlist.streamIds:
-                if(self.queueStreamService.exists(id)):
-                    updatedStreamIds.append(id)
-                    
-            for id in playlist.streamSourceIds:
-                if(self.streamSourceService.exists(id)):
-                    updatedStreamSourceService.append(id)
-                
-            playlist.streamIds = updatedStreamIds
-            playlist.streamSourceIds = updatedStreamSourceService
+            playlist.streamIds = [_ for _ in playlist.streamIds if _ not in ids]
+            playlist.streamSourceIds = [_ for _ in playlist.streamSourceIds if _ not in ids]
             
-            self.playlistService.update(playlist)
+            result = self.playlistService.update(playlist)
+            if(not result):
+                printD("failed to update Playlist \"", playlist.name, "\".", color = BashColor.WARNING, debug = self.settings.debug)
+                return False
             
         return True
+    
+    def getDanglingIds(self, playlists: List[Playlist]) -> Dict[str, Set[str]]:
+        """
+        Get IDs in Playlists with no corresponding QueueStream or StreamSource, checked against the IDs of all stored entities read once.
+        
+        Args:
+            playlists (List[Playlist]): Playlists to check.
+            
+        Returns:
+            Dict[str, Set[str]]: Dangling IDs by ID of Playlist, only Playlists with any.
+        """
+        
+        # Soft-deleted entities still exist, so IDs of them are not dangling
+        queueStreamIds = set(self.queueStreamService.getAllIds(includeSoftDeleted = True))
+        streamSourceIds = set(self.streamSourceService.getAllIds(includeSoftDeleted = True))
+        
+        result = {}
+        for playlist in playlists:
+            ids = set(_ for _ in playlist.streamIds if _ not in queueStreamIds)
+            ids.update(_ for _ in playlist.streamSourceIds if _ not in streamSourceIds)
+            if(len(ids) > 0):
+                result[playlist.id] = ids
+                
+        return result
 
     def search(self, searchTerm: str, includeSoftDeleted: bool = False) -> PlaylistDetailed:
         """
-        Search names and URIs for Regex-term searchTerm and returns a Dict with results.
+        Search names and URIs for Regex-term searchTerm and returns a Dict with results, using the search indexes of the services.
 
         Args:
             searchTerm (str): Regex-enabled term to search for.
@@ -249,43 +250,23 @@ class SharedService():
         
         data = PlaylistDetailed()
         
-        queueStreams = self.queueStreamService.getAll(includeSoftDeleted)
-        streamSources = self.streamSourceService.getAll(includeSoftDeleted)
-        playlists = self.playlistService.getAllSorted(includeSoftDeleted)
+        try:
+            re.compile(searchTerm)
+        except re.error as e:
+            printS("Search term is not a valid Regex (", e, "), searching for it as plain text.", color = BashColor.WARNING)
+            searchTerm = re.escape(searchTerm)
         
-        for entity in queueStreams:
-            if(self.searchFields(searchTerm, entity.name, entity.uri) > 0):
-                data.queueStreams.append(entity)
-        for entity in streamSources:
-            if(self.searchFields(searchTerm, entity.name, entity.uri) > 0):
-                data.streamSources.append(entity)
-        for entity in playlists:
-            if(self.searchFields(searchTerm, entity.name) > 0):
-                data.playlists.append(entity)
+        # Only entities found in the search indexes are read
+        data.queueStreams = self.queueStreamService.getBySearchTerm(searchTerm, includeSoftDeleted)
+        data.streamSources = self.streamSourceService.getBySearchTerm(searchTerm, includeSoftDeleted)
+        data.playlists = self.playlistService.getBySearchTerm(searchTerm, includeSoftDeleted)
+        data.playlists.sort(key = lambda e: (e.favorite * -1, e.sortOrder, e.name)) # Same order as getAllSorted
         
         found = len(data.queueStreams) > 0 or len(data.streamSources) > 0 or len(data.playlists) > 0
         printS("No results", color = BashColor.WARNING, doPrint = not found)
         
         return data 
     
-    def searchFields(self, searchTerm: str, *fields) -> int:
-        """
-        Searches *fields for Regex-enabled searchTerm.
-
-        Args:
-            searchTerm (str): Regex-enabled term to search for.
-            fields (any): Fields to search.
-
-        Returns:
-            int: int of field first found in, 0 = not found, 1 = first field-argument etc.
-        """
-        
-        for i, field in enumerate(fields):
-            if(re.search(searchTerm, field, re.IGNORECASE)):
-                return i + 1
-        
-        return 0
-    
     def getAllSoftDeleted(self) -> PlaylistDetailed:
         """
         Returns a Dict with Lists of all soft deleted entities.
@@ -1,18 +1,20 @@
 import os
 
-import validators
 from enums.StreamSourceType import StreamSourceTypeUtil
-from grdService.BaseService import BaseService
+from LazyImport import LazyModule
 from model.StreamSource import StreamSource
+from services.EntityService import EntityService
 from Settings import Settings
 
+validators = LazyModule("validators")
+
 T = StreamSource
 
-class StreamSourceService(BaseService[T]):
+class StreamSourceService(EntityService[T]):
     settings = Settings()
 
     def __init__(self):
-        BaseService.__init__(self, T, self.settings.debug, os.path.join(self.settings.localStoragePath, "StreamSource"))
+        EntityService.__init__(self, T, self.settings.debug, os.path.join(self.settings.localStoragePath, "StreamSource"))
 
     def add(self, streamSource: T) -> T:
         """
@@ -30,5 +32,5 @@ class StreamSourceService(BaseService[T]):
             entity.isWeb = validators.url(entity.uri)
         entity.streamSourceTypeId = StreamSourceTypeUtil.strToStreamSourceType(entity.uri).value
         
-        return BaseService.add(self, entity)
+        return EntityService.add(self, entity)
         
\ No newline at end of file
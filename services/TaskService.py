@@ -0,0 +1,265 @@
+import contextvars
+import json
+import logging
+import os
+import re
+import threading
+import uuid
+from typing import Callable, Dict, List
+
+from grdUtil import PrintUtil
+from grdUtil.DateTimeUtil import getDateTime
+
+from enums.TaskStatus import TaskStatus
+from model.Task import Task
+from Settings import Settings
+
+
+def printS(*args, **kwargs) -> None:
+    """
+    Print like grdUtil.PrintUtil.printS, and write the line to the log of the running task, if any.
+    """
+
+    PrintUtil.printS(*args, **kwargs)
+    if(kwargs.get("doPrint", True)):
+        TaskService.logger.info("".join(str(_) for _ in args))
+
+
+def printD(*args, **kwargs) -> None:
+    """
+    Print like grdUtil.PrintUtil.printD, and write the line to the log of the running task, if any, if debug is enabled.
+    """
+
+    PrintUtil.printD(*args, **kwargs)
+    if(kwargs.get("debug", False)):
+        TaskService.logger.info("".join(str(_) for _ in args))
+
+
+class TaskService():
+    settings = Settings()
+    tasks: Dict[str, Task] = None
+    taskFunctions: Dict[str, Callable] = {}
+    # Set while a task runs, threads started by it get the ID too when started with a copy of its context
+    currentTaskId: contextvars.ContextVar = contextvars.ContextVar("taskId", default = None)
+    workers: List[threading.Thread] = []
+    condition: threading.Condition = threading.Condition()
+    logger: logging.Logger = logging.getLogger("tasks")
+    maxHistory: int = 100
+    maxLogLines: int = 1000
+
+    def __init__(self):
+        with TaskService.condition:
+            if(TaskService.tasks != None):
+                return
+
+            TaskService.tasks = self.load()
+            handler = TaskLogHandler(self)
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            TaskService.logger.addHandler(handler)
+            TaskService.logger.setLevel(logging.INFO)
+            TaskService.logger.propagate = False
+
+    def getTasksPath(self) -> str:
+        return os.path.join(self.settings.localStoragePath, "tasks.json")
+
+    def load(self) -> Dict[str, Task]:
+        """
+        Load tasks from file, queueing tasks that were running when the server stopped again.
+
+        Returns:
+            Dict[str, Task]: Tasks by ID, oldest first.
+        """
+
+        path = self.getTasksPath()
+        if(not os.path.exists(path)):
+            return {}
+
+        try:
+            with open(path, "r", encoding = "utf-8") as file:
+                tasks = [Task(**_) for _ in json.load(file)]
+        except (OSError, ValueError, TypeError):
+            return {}
+
+        for task in tasks:
+            if(task.status == TaskStatus.RUNNING.value):
+                task.status = TaskStatus.QUEUED.value
+                task.logs.append("Server stopped while running, queued again.")
+
+        return {task.id: task for task in tasks}
+
+    def save(self) -> None:
+        with TaskService.condition:
+            path = self.getTasksPath()
+            tempPath = path + ".tmp"
+            with open(tempPath, "w", encoding = "utf-8") as file:
+                json.dump([_.__dict__ for _ in TaskService.tasks.values()], file, default = str)
+            os.replace(tempPath, path)
+
+    def register(self, name: str, function: Callable) -> None:
+        """
+        Register function tasks with name run.
+
+        Args:
+            name (str): Name of task.
+            function (Callable): Function called with entityId and arguments of task.
+        """
+
+        TaskService.taskFunctions[name] = function
+
+    def enqueue(self, name: str, entityId: str = None, arguments: dict = None) -> Task:
+        """
+        Queue a task, or get the task already queued or running with the same name, entity, and arguments.
+
+        Args:
+            name (str): Name of registered task.
+            entityId (str, optional): ID of entity task is for. Defaults to None.
+            arguments (dict, optional): Other arguments of task function. Defaults to None.
+
+        Returns:
+            Task: Task queued.
+        """
+
+        _arguments = arguments if(arguments != None) else {}
+        with TaskService.condition:
+            for task in TaskService.tasks.values():
+                if(task.status in [TaskStatus.QUEUED.value, TaskStatus.RUNNING.value] and task.name == name and task.entityId == entityId and task.arguments == _arguments):
+                    return task
+
+            task = Task(name = name, entityId = entityId, arguments = _arguments, id = str(uuid.uuid4()))
+            TaskService.tasks[task.id] = task
+            self.save()
+            TaskService.condition.notify_all()
+
+        self.startWorkers()
+        return task
+
+    def startWorkers(self) -> None:
+        """
+        Start worker threads, up to taskWorkers in settings, if not already running.
+        """
+
+        with TaskService.condition:
+            TaskService.workers = [_ for _ in TaskService.workers if _.is_alive()]
+            while(len(TaskService.workers) < max(1, self.settings.taskWorkers)):
+                worker = threading.Thread(target = self.runWorker, daemon = True)
+                TaskService.workers.append(worker)
+                worker.start()
+
+    def runWorker(self) -> None:
+        """
+        Run queued tasks, oldest first, until the program exits.
+        """
+
+        while(True):
+            with TaskService.condition:
+                task = next((_ for _ in TaskService.tasks.values() if _.status == TaskStatus.QUEUED.value), None)
+                while(task == None):
+                    TaskService.condition.wait()
+                    task = next((_ for _ in TaskService.tasks.values() if _.status == TaskStatus.QUEUED.value), None)
+
+                task.status = TaskStatus.RUNNING.value
+                task.started = getDateTime()
+                self.save()
+
+            contextvars.copy_context().run(self.runTask, task)
+
+    def runTask(self, task: Task) -> None:
+        """
+        Run a task, logging output of it and of threads started with a copy of its context to the task.
+
+        Args:
+            task (Task): Task to run, marked as running.
+        """
+
+        TaskService.currentTaskId.set(task.id)
+        try:
+            function = TaskService.taskFunctions.get(task.name)
+            if(function == None):
+                raise LookupError(f"No task named \"{task.name}\" is registered.")
+
+            TaskService.logger.info("Task started, please wait...")
+            function(task.entityId, **task.arguments)
+            task.status = TaskStatus.DONE.value
+        except Exception as e:
+            TaskService.logger.info(f"ERROR: {str(e)}")
+            task.error = str(e)
+            task.status = TaskStatus.FAILED.value
+        finally:
+            with TaskService.condition:
+                task.completed = getDateTime()
+                self.removeOldTasks()
+                self.save()
+                TaskService.condition.notify_all()
+
+    def removeOldTasks(self) -> None:
+        """
+        Remove the oldest finished tasks, keeping maxHistory.
+        """
+
+        with TaskService.condition:
+            finishedIds = [_.id for _ in TaskService.tasks.values() if _.status in [TaskStatus.DONE.value, TaskStatus.FAILED.value]]
+            for id in finishedIds[:max(0, len(finishedIds) - self.maxHistory)]:
+                del TaskService.tasks[id]
+
+    def appendLog(self, taskId: str, line: str) -> None:
+        with TaskService.condition:
+            task = TaskService.tasks.get(taskId)
+            if(task == None):
+                return
+
+            task.logs.append(line)
+            if(len(task.logs) > self.maxLogLines):
+                del task.logs[:len(task.logs) - self.maxLogLines]
+            TaskService.condition.notify_all()
+
+    def get(self, id: str) -> Task:
+        with TaskService.condition:
+            return TaskService.tasks.get(id)
+
+    def getAll(self) -> List[Task]:
+        """
+        Get queued, running, and finished tasks, newest first.
+
+        Returns:
+            List[Task]: Tasks.
+        """
+
+        with TaskService.condition:
+            return list(reversed(TaskService.tasks.values()))
+
+    def waitForLogs(self, id: str, offset: int, timeout: float = 15) -> List[str]:
+        """
+        Wait until task has log lines after offset or is finished.
+
+        Args:
+            id (str): ID of task.
+            offset (int): Number of lines already read.
+            timeout (float, optional): Max seconds to wait. Defaults to 15.
+
+        Returns:
+            List[str]: New lines, empty if none before timeout or task finished.
+        """
+
+        with TaskService.condition:
+            task = TaskService.tasks.get(id)
+            if(task == None):
+                return []
+
+            TaskService.condition.wait_for(lambda: len(task.logs) > offset or task.status in [TaskStatus.DONE.value, TaskStatus.FAILED.value], timeout = timeout)
+            return task.logs[offset:]
+
+
+class TaskLogHandler(logging.Handler):
+    ansiRegex: re.Pattern = re.compile(r"\x1b\[[0-9;]*m")
+
+    def __init__(self, taskService: TaskService):
+        super().__init__()
+        self.taskService = taskService
+
+    def emit(self, record: logging.LogRecord) -> None:
+        # Handlers are called in the thread logging, so the task is found by its context
+        taskId = TaskService.currentTaskId.get()
+        if(taskId == None):
+            return
+
+        self.taskService.appendLog(taskId, self.ansiRegex.sub("", self.format(record)))
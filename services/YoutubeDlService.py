@@ -0,0 +1,107 @@
+import atexit
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List
+
+from LazyImport import LazyModule
+
+yt_dlp = LazyModule("yt_dlp")
+
+
+class YoutubeDlService():
+    idle: Dict[str, List["yt_dlp.YoutubeDL"]] = {}
+    lock: threading.Lock = threading.Lock()
+    created: int = 0
+    reused: int = 0
+    setupSeconds: float = 0.0
+    progressCallbacks: Dict[int, Callable[[dict], None]] = {}
+
+    @contextmanager
+    def use(self, profile: str, options: dict, overrides: dict = None, progressCallback: Callable[[dict], None] = None) -> Iterator["yt_dlp.YoutubeDL"]:
+        """
+        Borrow a long-lived YoutubeDL for an option profile, creating one only if all instances of the profile are in use.
+        Options read when YoutubeDL is created (e.g. format) must be part of the profile, options read per call (e.g. playlistend, outtmpl) can be overrides.
+        Any params changed during the use are restored when the context exits.
+        Progress hooks are only registered when YoutubeDL is created, so each instance has one hook calling the progressCallback of its current use.
+
+        Args:
+            profile (str): Name of option profile, instances are only shared between uses with the same profile.
+            options (dict): Options to create YoutubeDL with, must be the same for every use of profile.
+            overrides (dict, optional): Options set for this use only. Defaults to None.
+            progressCallback (Callable[[dict], None], optional): Function called with the progress dict of yt_dlp while downloading during this use. Defaults to None.
+
+        Yields:
+            yt_dlp.YoutubeDL: Instance, not to be used after the context exits.
+        """
+
+        ydl = None
+        with YoutubeDlService.lock:
+            instances = YoutubeDlService.idle.setdefault(profile, [])
+            if(len(instances) > 0):
+                ydl = instances.pop()
+                YoutubeDlService.reused += 1
+
+        if(ydl == None):
+            started = time.perf_counter()
+            ydl = yt_dlp.YoutubeDL(options)
+            ydl.add_progress_hook(self.getProgressHook(id(ydl)))
+            with YoutubeDlService.lock:
+                if(YoutubeDlService.created == 0):
+                    atexit.register(self.closeAll)
+                YoutubeDlService.setupSeconds += time.perf_counter() - started
+                YoutubeDlService.created += 1
+
+        previous = dict(ydl.params)
+        ydl.params.update(overrides or {})
+        if(progressCallback != None):
+            YoutubeDlService.progressCallbacks[id(ydl)] = progressCallback
+        try:
+            yield ydl
+        finally:
+            YoutubeDlService.progressCallbacks.pop(id(ydl), None)
+            ydl.params.clear()
+            ydl.params.update(previous)
+            with YoutubeDlService.lock:
+                YoutubeDlService.idle[profile].append(ydl)
+
+    def getProgressHook(self, key: int) -> Callable[[dict], None]:
+        """
+        Get progress hook for a YoutubeDL instance, calling the progressCallback of its current use, if any.
+
+        Args:
+            key (int): ID of YoutubeDL instance.
+
+        Returns:
+            Callable[[dict], None]: Progress hook.
+        """
+
+        def hook(progress: dict) -> None:
+            callback = YoutubeDlService.progressCallbacks.get(key)
+            if(callback != None):
+                callback(progress)
+
+        return hook
+
+    def getStatsString(self) -> str:
+        """
+        Get number of YoutubeDL instances created and reused, with estimated setup time saved by reuse.
+
+        Returns:
+            str: Stats of pool.
+        """
+
+        averageSetupSeconds = YoutubeDlService.setupSeconds / YoutubeDlService.created if(YoutubeDlService.created > 0) else 0.0
+        savedSeconds = averageSetupSeconds * YoutubeDlService.reused
+        return f"yt-dlp: {YoutubeDlService.created} instance(s) created in {YoutubeDlService.setupSeconds:.2f}s, {YoutubeDlService.reused} reuse(s), ~{savedSeconds:.2f}s setup saved."
+
+    def closeAll(self) -> None:
+        """
+        Close all idle YoutubeDL instances.
+        """
+
+        with YoutubeDlService.lock:
+            for instances in YoutubeDlService.idle.values():
+                for ydl in instances:
+                    ydl.close()
+            YoutubeDlService.idle = {}
@@ -0,0 +1,125 @@
+import json
+import os
+import threading
+import time
+from typing import Dict, List
+
+
+class DirectoryScanIndex():
+    indexPath: str = None
+    root: str = None
+    directories: Dict[str, dict] = None
+    pending: List[list] = None
+    lock: threading.RLock = None
+    # Directories modified this recently are listed again next scan, file systems with coarse timestamps could otherwise hide files added right after the scan
+    settleNanoseconds: int = 2 * 10**9
+
+    def __init__(self, indexPath: str, root: str):
+        self.indexPath = indexPath
+        self.root = os.path.normpath(root)
+        self.directories = {}
+        self.pending = []
+        self.lock = threading.RLock()
+        self.load()
+
+    def load(self) -> None:
+        """
+        Load index from file, if any and if it was made for the same root directory.
+        """
+
+        if(not os.path.exists(self.indexPath)):
+            return
+
+        try:
+            with open(self.indexPath, "r", encoding = "utf-8") as file:
+                index = json.load(file)
+        except (OSError, ValueError):
+            # Everything is new again, duplicates are filtered when added to Playlists
+            return
+
+        if(index.get("root") != self.root):
+            return
+
+        with self.lock:
+            self.directories = index["directories"]
+            self.pending = index["pending"]
+
+    def save(self) -> None:
+        """
+        Save index to file.
+        """
+
+        with self.lock:
+            directory = os.path.dirname(self.indexPath)
+            if(directory):
+                os.makedirs(directory, exist_ok = True)
+
+            tempPath = self.indexPath + ".tmp"
+            with open(tempPath, "w", encoding = "utf-8") as file:
+                json.dump({ "root": self.root, "directories": self.directories, "pending": self.pending }, file)
+            os.replace(tempPath, self.indexPath)
+
+    def scan(self) -> int:
+        """
+        Find files added under root since last scan and add them to pending, oldest first.
+        Every directory is stat'ed, but only directories whose modified time changed are listed, and only their files are stat'ed.
+        A file is new if its name was not in the directory, or it was replaced by a different file (inode).
+
+        Returns:
+            int: Number of new files found.
+        """
+
+        with self.lock:
+            newFiles = []
+            seenDirectories = set()
+            stack = [""]
+            while(len(stack) > 0):
+                relativeDirectory = stack.pop()
+                absoluteDirectory = os.path.join(self.root, relativeDirectory)
+                try:
+                    modified = os.stat(absoluteDirectory).st_mtime_ns
+                except OSError:
+                    continue
+
+                seenDirectories.add(relativeDirectory)
+                entry = self.directories.get(relativeDirectory)
+                if(entry != None and entry["mtime"] == modified):
+                    stack += [os.path.join(relativeDirectory, _) for _ in entry["subdirectories"]]
+                    continue
+
+                oldFiles = entry["files"] if(entry != None) else {}
+                files = {}
+                subdirectories = []
+                try:
+                    with os.scandir(absoluteDirectory) as iterator:
+                        for dirEntry in iterator:
+                            try:
+                                if(dirEntry.is_dir(follow_symlinks = False)):
+                                    subdirectories.append(dirEntry.name)
+                                    continue
+                                if(not dirEntry.is_file()):
+                                    continue
+
+                                stat = dirEntry.stat()
+                            except OSError:
+                                continue
+
+                            files[dirEntry.name] = [stat.st_size, stat.st_mtime_ns, stat.st_ino]
+                            oldFile = oldFiles.get(dirEntry.name)
+                            if(oldFile == None or oldFile[2] != stat.st_ino):
+                                newFiles.append([os.path.join(relativeDirectory, dirEntry.name), stat.st_mtime])
+                except OSError:
+                    continue
+
+                settled = time.time_ns() - modified > self.settleNanoseconds
+                self.directories[relativeDirectory] = { "mtime": modified if(settled) else None, "files": files, "subdirectories": subdirectories }
+                stack += [os.path.join(relativeDirectory, _) for _ in subdirectories]
+
+            for relativeDirectory in [_ for _ in self.directories.keys() if _ not in seenDirectories]:
+                del self.directories[relativeDirectory]
+
+            pendingPaths = set(_[0] for _ in self.pending)
+            newFiles = [_ for _ in newFiles if _[0] not in pendingPaths]
+            newFiles.sort(key = lambda _: _[1])
+            self.pending += newFiles
+            return len(newFiles)
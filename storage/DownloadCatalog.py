@@ -0,0 +1,166 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from typing import Dict
+from urllib.parse import urlsplit, urlunsplit
+
+
+class DownloadCatalog():
+    catalogPath: str = None
+    entries: Dict[str, dict] = None
+    lock: threading.RLock = None
+    youtubeIdRegex: re.Pattern = re.compile(r"(?:[?&]v=|youtu\.be/|/(?:shorts|live|embed)/)([\w-]{11})")
+
+    def __init__(self, catalogPath: str):
+        self.catalogPath = catalogPath
+        self.entries = {}
+        self.lock = threading.RLock()
+        self.load()
+
+    def load(self) -> None:
+        """
+        Load catalog from file, if any.
+        """
+
+        if(not os.path.exists(self.catalogPath)):
+            return
+
+        try:
+            with open(self.catalogPath, "r", encoding = "utf-8") as file:
+                entries = json.load(file)
+        except (OSError, ValueError):
+            # Files are only downloaded again, nothing is lost
+            return
+
+        with self.lock:
+            self.entries = entries
+
+    def save(self) -> None:
+        """
+        Save catalog to file.
+        """
+
+        with self.lock:
+            directory = os.path.dirname(self.catalogPath)
+            if(directory):
+                os.makedirs(directory, exist_ok = True)
+
+            tempPath = self.catalogPath + ".tmp"
+            with open(tempPath, "w", encoding = "utf-8") as file:
+                json.dump(self.entries, file)
+            os.replace(tempPath, self.catalogPath)
+
+    def getRemoteId(self, url: str) -> str:
+        """
+        Get ID of the remote stream behind URL, equal for different URLs of the same Youtube video, else the normalized URL.
+
+        Args:
+            url (str): URL of stream.
+
+        Returns:
+            str: Remote ID.
+        """
+
+        youtubeIdMatch = self.youtubeIdRegex.search(url)
+        if(youtubeIdMatch != None and re.search(r"(\.|\/)youtu(\.?)be(\.|\/)", url)):
+            return f"youtube:{youtubeIdMatch.group(1)}"
+
+        parts = urlsplit(url.strip())
+        netloc = parts.netloc.lower()
+        netloc = netloc[4:] if(netloc.startswith("www.")) else netloc
+        return "url:" + urlunsplit((parts.scheme.lower(), netloc, parts.path.rstrip("/"), parts.query, ""))
+
+    def getKey(self, url: str, directory: str) -> str:
+        return f"{directory}|{self.getRemoteId(url)}"
+
+    def getDownloaded(self, url: str, directory: str) -> str:
+        """
+        Get path of stream if it has been downloaded to directory and the file is still there with the same size.
+
+        Args:
+            url (str): URL of stream.
+            directory (str): Directory stream was downloaded to.
+
+        Returns:
+            str | None: Path of file if downloaded, else None.
+        """
+
+        key = self.getKey(url, directory)
+        with self.lock:
+            entry = self.entries.get(key)
+            if(entry == None or not entry["complete"]):
+                return None
+
+            try:
+                if(os.path.getsize(entry["path"]) == entry["size"]):
+                    return entry["path"]
+            except OSError:
+                pass
+
+            # Moved, deleted or changed, download again
+            del self.entries[key]
+            self.save()
+            return None
+
+    def getPartial(self, url: str, directory: str) -> str:
+        """
+        Get path of an interrupted download of stream to directory, so it can be resumed instead of started over with a new name.
+
+        Args:
+            url (str): URL of stream.
+            directory (str): Directory stream is downloaded to.
+
+        Returns:
+            str | None: Path download was started with, else None.
+        """
+
+        with self.lock:
+            entry = self.entries.get(self.getKey(url, directory))
+            if(entry == None or entry["complete"]):
+                return None
+
+            return entry["path"]
+
+    def start(self, url: str, directory: str, path: str) -> None:
+        """
+        Record that a download of stream to path has started.
+
+        Args:
+            url (str): URL of stream.
+            directory (str): Directory stream is downloaded to.
+            path (str): Path of file.
+        """
+
+        with self.lock:
+            self.entries[self.getKey(url, directory)] = { "url": url, "path": path, "size": None, "sha256": None, "complete": False, "updated": time.time() }
+            self.save()
+
+    def complete(self, url: str, directory: str, path: str) -> bool:
+        """
+        Record that stream has been downloaded to path, with size and hash of file.
+
+        Args:
+            url (str): URL of stream.
+            directory (str): Directory stream was downloaded to.
+            path (str): Path of file.
+
+        Returns:
+            bool: True if file exists and was recorded, else False.
+        """
+
+        if(not os.path.isfile(path)):
+            return False
+
+        sha256 = hashlib.sha256()
+        with open(path, "rb") as file:
+            for chunk in iter(lambda: file.read(1024 * 1024), b""):
+                sha256.update(chunk)
+
+        with self.lock:
+            self.entries[self.getKey(url, directory)] = { "url": url, "path": path, "size": os.path.getsize(path), "sha256": sha256.hexdigest(), "complete": True, "updated": time.time() }
+            self.save()
+
+        return True
@@ -0,0 +1,148 @@
+import copy
+import os
+import threading
+from collections import OrderedDict
+from typing import Any
+
+
+class EntityCache():
+    maxSize: int = None
+    hits: int = None
+    misses: int = None
+    evictions: int = None
+    entries: OrderedDict = None
+    lock: threading.Lock = None
+
+    def __init__(self, maxSize: int = 10000):
+        self.maxSize = maxSize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, path: str, validate: bool = True) -> Any:
+        """
+        Get a copy of the entity cached for the file path, if the file has not changed since it was cached.
+
+        Args:
+            path (str): Absolute path of file the entity was read from.
+            validate (bool, optional): Check that the file has not changed. Defaults to True, set to False if cached entities of changed files were already invalidated, e.g. once for a batch.
+
+        Returns:
+            Any | None: Copy of entity if cached and still valid, else None.
+        """
+
+        if(self.maxSize <= 0):
+            return None
+
+        with self.lock:
+            entry = self.entries.get(path)
+            if(entry == None):
+                self.misses += 1
+                return None
+
+        signature = self.getSignature(path) if(validate) else entry[0]
+        with self.lock:
+            if(signature == None or signature != entry[0]):
+                self.entries.pop(path, None)
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(path)
+            self.hits += 1
+
+        # Copy on read, so changes made by callers are not visible to others before they are saved
+        return self.copyEntity(entry[1])
+
+    def put(self, path: str, entity: Any) -> None:
+        """
+        Cache a copy of entity, read from file path, evicting the least recently used entity if full.
+
+        Args:
+            path (str): Absolute path of file the entity was read from.
+            entity (Any): Entity to cache.
+        """
+
+        if(self.maxSize <= 0 or entity == None):
+            return
+
+        signature = self.getSignature(path)
+        if(signature == None):
+            return
+
+        with self.lock:
+            self.entries[path] = (signature, self.copyEntity(entity))
+            self.entries.move_to_end(path)
+            while(len(self.entries) > self.maxSize):
+                self.entries.popitem(last = False)
+                self.evictions += 1
+
+    def copyEntity(self, entity: Any) -> Any:
+        """
+        Copy entity, including its lists, dicts, and sets, which is as deep as entities go.
+
+        Args:
+            entity (Any): Entity to copy.
+
+        Returns:
+            Any: Copy.
+        """
+
+        result = copy.copy(entity)
+        for name, value in vars(entity).items():
+            if(isinstance(value, (list, dict, set))):
+                vars(result)[name] = value.copy()
+
+        return result
+
+    def invalidate(self, path: str) -> None:
+        """
+        Remove entity cached for file path, if any.
+
+        Args:
+            path (str): Absolute path of file the entity was read from.
+        """
+
+        with self.lock:
+            self.entries.pop(path, None)
+
+    def clear(self) -> None:
+        """
+        Remove all cached entities and reset counters.
+        """
+
+        with self.lock:
+            self.entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def getSignature(self, path: str) -> tuple:
+        """
+        Get modified time (nanoseconds) and size of file, used to detect changes made outside this process.
+
+        Args:
+            path (str): Absolute path of file.
+
+        Returns:
+            tuple | None: Tuple of modified time and size, None if file does not exist.
+        """
+
+        try:
+            stat = os.stat(path)
+            return (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            return None
+
+    def getStatsString(self) -> str:
+        """
+        Get hits, misses, evictions, and size of cache as a string.
+
+        Returns:
+            str: Stats of cache.
+        """
+
+        total = self.hits + self.misses
+        hitRate = round(self.hits / total * 100, 1) if(total > 0) else 0.0
+        return f"Entity cache: {self.hits} hits, {self.misses} misses ({hitRate}% hit rate), {self.evictions} evictions, {len(self.entries)}/{self.maxSize} entities cached."
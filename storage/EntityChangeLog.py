@@ -0,0 +1,81 @@
+import os
+import uuid
+from typing import List, Tuple
+
+from storage.FileLock import FileLock
+
+
+class EntityChangeLog():
+    """
+    Log of IDs of entities changed, appended to by every process using the same storage, so what is derived from the entities is only updated with entities changed since.
+    A position in the log is the ID of the log, written on its first line, and the offset read up to. Once the log reaches maxSize it is started over with a new ID, and what was derived from the previous log is rebuilt.
+    """
+
+    logPath: str = None
+    maxSize: int = None
+    processLock: FileLock = None
+
+    def __init__(self, logPath: str, maxSize: int = 4 * 1024 * 1024):
+        self.logPath = logPath
+        self.maxSize = maxSize
+        self.processLock = FileLock(logPath + ".lock")
+
+    def start(self) -> None:
+        """
+        Start log over with a new ID.
+        """
+
+        with self.processLock:
+            directory = os.path.dirname(self.logPath)
+            if(directory):
+                os.makedirs(directory, exist_ok = True)
+
+            tempPath = self.logPath + ".tmp"
+            with open(tempPath, "w", encoding = "utf-8") as file:
+                file.write(uuid.uuid4().hex + "\n")
+            os.replace(tempPath, self.logPath)
+
+    def append(self, ids: List[str]) -> None:
+        """
+        Append IDs of entities changed to log.
+
+        Args:
+            ids (List[str]): IDs of entities.
+        """
+
+        ids = [_ for _ in ids if _ != None]
+        if(len(ids) == 0):
+            return
+
+        with self.processLock:
+            if(not os.path.exists(self.logPath) or os.path.getsize(self.logPath) >= self.maxSize):
+                self.start()
+
+            with open(self.logPath, "a", encoding = "utf-8") as file:
+                file.write("".join(f"{_}\n" for _ in ids))
+
+    def getChangedSince(self, position: list) -> Tuple[List[str], list]:
+        """
+        Get IDs of entities changed since position in log.
+
+        Args:
+            position (list | None): Position in log, e.g. when something derived from the entities was last updated.
+
+        Returns:
+            Tuple[List[str] | None, list]: IDs of entities changed, None if not known, e.g. position is None or of a previous log, and current position.
+        """
+
+        with self.processLock:
+            if(not os.path.exists(self.logPath)):
+                self.start()
+
+            with open(self.logPath, "rb") as file:
+                logId = file.readline().decode("utf-8").rstrip("\n")
+                if(not isinstance(position, list) or len(position) != 2 or position[0] != logId):
+                    return (None, [logId, file.seek(0, os.SEEK_END)])
+
+                file.seek(position[1])
+                content = file.read()
+
+        ids = list(dict.fromkeys(content.decode("utf-8").splitlines()))
+        return (ids, [logId, position[1] + len(content)])
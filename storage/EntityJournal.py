@@ -0,0 +1,476 @@
+import atexit
+import copy
+import json
+import os
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+from grdUtil.BashColor import BashColor
+from grdUtil.PrintUtil import printS
+
+from storage.FileLock import FileLock, isProcessRunning
+
+
+class EntityJournal():
+    """
+    Journal of entity updates not yet written to their files. Every process appends to its own journal file next to journalPath, named by its PID.
+    Journals of processes no longer running are replayed by the next process started, while holding a lock shared by the processes, which is also held while compacting.
+    Updates in journals of other processes are read when an entity is got, so they are seen before they are compacted.
+    Every record has the time it was written and the signature of the entity file it updates, a record is outdated once the file was written after it, e.g. directly by another process.
+    """
+
+    journalPath: str = None
+    compactingPath: str = None
+    journalPattern: re.Pattern = None
+    compactSeconds: int = None
+    fsyncBatchSize: int = None
+    othersRefreshSeconds: float = 1.0
+    pending: Dict[str, Any] = None
+    compacting: Dict[str, Any] = None
+    unclaimed: Dict[str, dict] = None
+    recorded: Dict[str, Tuple[int, list]] = None
+    lastRecordTime: int = None
+    writers: Dict[str, Tuple[type, Callable]] = None
+    others: Dict[str, dict] = None
+    othersRefreshed: float = None
+    unsynced: int = None
+    file = None
+    lock: threading.RLock = None
+    foldLock: threading.RLock = None
+    processLock: FileLock = None
+    stopEvent: threading.Event = None
+
+    def __init__(self, journalPath: str, compactSeconds: int = 30, fsyncBatchSize: int = 32):
+        base, extension = os.path.splitext(journalPath)
+        self.journalPath = f"{base}.{os.getpid()}{extension}"
+        self.compactingPath = self.journalPath + ".compacting"
+        self.journalPattern = re.compile(re.escape(os.path.basename(base)) + r"\.(\d+)" + re.escape(extension) + r"(\.compacting)?$")
+        self.compactSeconds = compactSeconds
+        self.fsyncBatchSize = fsyncBatchSize
+        self.pending = {}
+        self.compacting = {}
+        self.unclaimed = {}
+        self.recorded = {}
+        self.lastRecordTime = 0
+        self.writers = {}
+        self.others = {}
+        self.othersRefreshed = 0.0
+        self.unsynced = 0
+        self.lock = threading.RLock()
+        self.foldLock = threading.RLock()
+        self.processLock = FileLock(journalPath + ".lock")
+        self.stopEvent = threading.Event()
+
+        directory = os.path.dirname(self.journalPath)
+        if(directory):
+            os.makedirs(directory, exist_ok = True)
+
+        with self.processLock:
+            # Replay journals of processes no longer running, including one left by an earlier process with the same PID.
+            # The latest record of an entity in any of them wins, and is dropped if its file was written after it.
+            replayed = []
+            for pid, paths in self.getJournalPaths().items():
+                if(pid != os.getpid() and isProcessRunning(pid)):
+                    continue
+
+                for path in paths:
+                    for entityPath, record in self.readRecords(path).items():
+                        latest = self.unclaimed.get(entityPath)
+                        if(latest == None or record["time"] > latest["time"]):
+                            self.unclaimed[entityPath] = record
+                    replayed.append(path)
+            self.unclaimed = {k: v for k, v in self.unclaimed.items() if v["data"] != None and not self.isOutdated(k, v)}
+
+            tempPath = self.journalPath + ".tmp"
+            with open(tempPath, "w", encoding = "utf-8") as file:
+                for record in self.unclaimed.values():
+                    file.write(json.dumps(record) + "\n")
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(tempPath, self.journalPath)
+            for path in replayed:
+                if(path != self.journalPath and os.path.exists(path)):
+                    os.remove(path)
+
+        self.file = open(self.journalPath, "a", encoding = "utf-8")
+        atexit.register(self.close)
+
+        if(self.compactSeconds > 0):
+            threading.Thread(target = self.runCompactor, daemon = True).start()
+
+    def getJournalPaths(self) -> Dict[int, List[str]]:
+        """
+        Get journal files of all processes, including files of interrupted compactions.
+
+        Returns:
+            Dict[int, List[str]]: Paths by PID of process owning them.
+        """
+
+        directory = os.path.dirname(self.journalPath) or "."
+        result = {}
+        for entry in os.scandir(directory):
+            match = self.journalPattern.match(entry.name)
+            if(match != None):
+                result.setdefault(int(match.group(1)), []).append(entry.path)
+
+        return result
+
+    def readRecords(self, path: str) -> Dict[str, dict]:
+        """
+        Read records in a journal file, later records for the same entity replacing earlier ones.
+
+        Args:
+            path (str): Path of journal file.
+
+        Returns:
+            Dict[str, dict]: Records with "path", "data" (None if the entity was written to its file directly), "time", and "signature", by entity file path.
+        """
+
+        records = {}
+        if(not os.path.exists(path)):
+            return records
+
+        with open(path, "r", encoding = "utf-8") as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Last line may be partially written if the program was killed while appending
+                    continue
+                records[record["path"]] = record
+
+        return records
+
+    def getSignature(self, path: str) -> list:
+        """
+        Get signature (modified time in nanoseconds and size) of entity file.
+
+        Args:
+            path (str): Path of file entity is stored in.
+
+        Returns:
+            list | None: Signature, None if file does not exist.
+        """
+
+        try:
+            stat = os.stat(path)
+            return [stat.st_mtime_ns, stat.st_size]
+        except OSError:
+            return None
+
+    def isOutdated(self, path: str, record: dict) -> bool:
+        """
+        Check if entity file was written after a record was journaled, so the record is not newer than what is stored.
+
+        Args:
+            path (str): Path of file entity is stored in.
+            record (dict): Record of entity.
+
+        Returns:
+            bool: Result.
+        """
+
+        # Signature is of the file when the entity was first journaled, any write since is newer, or of this record by an interrupted compaction
+        return self.getSignature(path) != record["signature"]
+
+    def register(self, storagePath: str, entityType: type, writer: Callable) -> None:
+        """
+        Register how entities stored in a directory are written to their files, and claim records for them from the journal.
+
+        Args:
+            storagePath (str): Directory entities are stored in.
+            entityType (type): Type of entities.
+            writer (Callable): Function writing an entity to its file.
+        """
+
+        storagePath = os.path.normpath(storagePath)
+        with self.lock:
+            self.writers[storagePath] = (entityType, writer)
+            for path in [_ for _ in self.unclaimed.keys() if os.path.dirname(os.path.normpath(_)) == storagePath]:
+                record = self.unclaimed.pop(path)
+                self.pending[path] = entityType(**record["data"])
+                self.recorded[path] = (record["time"], record["signature"])
+
+    def get(self, path: str) -> Any:
+        """
+        Get a copy of the entity for file path, if it has updates not yet written to its file, by this or another process.
+
+        Args:
+            path (str): Path of file entity is stored in.
+
+        Returns:
+            Any | None: Copy of entity if in journal, else None.
+        """
+
+        with self.lock:
+            entity = self.pending.get(path)
+            if(entity == None):
+                entity = self.compacting.get(path)
+            if(entity == None):
+                entity = self.getFromOthers(path)
+
+        return copy.deepcopy(entity) if(entity != None) else None
+
+    def getFromOthers(self, path: str) -> Any:
+        """
+        Get the latest entity for file path in journals of other processes.
+
+        Args:
+            path (str): Path of file entity is stored in.
+
+        Returns:
+            Any | None: Entity if in a journal of another process and its file was not written since, else None.
+        """
+
+        with self.lock:
+            self.refreshOthers()
+            latest = None
+            for journal in self.others.values():
+                record = journal["records"].get(path)
+                if(record != None and (latest == None or record["time"] > latest["time"])):
+                    latest = record
+
+            if(latest == None or latest["data"] == None or self.isOutdated(path, latest)):
+                return None
+
+            writer = self.writers.get(os.path.dirname(os.path.normpath(path)))
+            if(writer == None):
+                return None
+
+            return writer[0](**latest["data"])
+
+    def refreshOthers(self) -> None:
+        """
+        Read records appended to journals of other processes since last read, at most once per othersRefreshSeconds.
+        Records of a journal are dropped when it is removed, after its entities were written to their files.
+        """
+
+        with self.lock:
+            now = time.monotonic()
+            if(now - self.othersRefreshed < self.othersRefreshSeconds):
+                return
+
+            self.othersRefreshed = now
+            found = set()
+            for pid, paths in self.getJournalPaths().items():
+                if(pid == os.getpid()):
+                    continue
+
+                for path in paths:
+                    try:
+                        self.readOther(path)
+                        found.add(path)
+                    except OSError:
+                        # Removed by its process after it was listed
+                        continue
+
+            for path in [_ for _ in self.others.keys() if _ not in found]:
+                self.others.pop(path)
+
+    def readOther(self, path: str) -> None:
+        """
+        Read complete records appended to a journal of another process since last read. The journal is read from start if it was replaced.
+
+        Args:
+            path (str): Path of journal file.
+        """
+
+        with open(path, "rb") as file:
+            stat = os.fstat(file.fileno())
+            journal = self.others.get(path)
+            if(journal == None or journal["inode"] != stat.st_ino or stat.st_size < journal["offset"]):
+                journal = {"inode": stat.st_ino, "offset": 0, "records": {}}
+                self.others[path] = journal
+
+            file.seek(journal["offset"])
+            content = file.read()
+
+        # Last line may still be written by the other process
+        end = content.rfind(b"\n") + 1
+        for line in content[:end].splitlines():
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+
+            journal["records"][record["path"]] = record
+        journal["offset"] += end
+
+    def append(self, path: str, entity: Any) -> None:
+        """
+        Append an update of entity to the journal. The entity file is updated by the next compaction.
+
+        Args:
+            path (str): Path of file entity is stored in.
+            entity (Any): Updated entity.
+        """
+
+        with self.lock:
+            self.pending[path] = copy.deepcopy(entity)
+            self.writeRecord(path, entity.__dict__)
+            self.sync(force = False)
+
+    def appendMany(self, entities: Dict[str, Any]) -> None:
+        """
+        Append updates of several entities to the journal in one write, synced to disk once.
+
+        Args:
+            entities (Dict[str, Any]): Updated entities by path of file they are stored in.
+        """
+
+        if(len(entities) == 0):
+            return
+
+        with self.lock:
+            for path, entity in entities.items():
+                self.pending[path] = copy.deepcopy(entity)
+                self.writeRecord(path, entity.__dict__)
+
+            self.sync()
+
+    def discard(self, path: str) -> Any:
+        """
+        Remove entity from the journal, to be written to its file directly.
+
+        Args:
+            path (str): Path of file entity is stored in.
+
+        Returns:
+            Any | None: Latest entity from journal if any, else None.
+        """
+
+        with self.foldLock, self.lock:
+            entity = self.pending.pop(path, None)
+            compactingEntity = self.compacting.pop(path, None)
+            if(entity == None):
+                entity = compactingEntity
+            if(entity != None):
+                # Tombstone, so a replay does not overwrite what is written directly
+                self.writeRecord(path, None)
+                self.sync(force = False)
+
+        return entity
+
+    def writeRecord(self, path: str, data: dict) -> None:
+        """
+        Write a record to the journal file, with a time later than any record before it in this process, and the signature of the entity file when the entity was first journaled.
+
+        Args:
+            path (str): Path of file entity is stored in.
+            data (dict | None): Entity data, None if the entity is written to its file directly.
+        """
+
+        self.lastRecordTime = max(time.time_ns(), self.lastRecordTime + 1)
+        if(data == None):
+            self.recorded.pop(path, None)
+            record = {"path": path, "data": None, "time": self.lastRecordTime, "signature": None}
+        else:
+            recorded = self.recorded.get(path)
+            signature = recorded[1] if(recorded != None) else self.getSignature(path)
+            self.recorded[path] = (self.lastRecordTime, signature)
+            record = {"path": path, "data": data, "time": self.lastRecordTime, "signature": signature}
+
+        self.file.write(json.dumps(record, default = str) + "\n")
+        self.file.flush()
+        self.unsynced += 1
+
+    def sync(self, force: bool = True) -> None:
+        """
+        Sync journal file to disk.
+
+        Args:
+            force (bool, optional): Sync even if fewer than fsyncBatchSize records were written since last sync. Defaults to True.
+        """
+
+        with self.lock:
+            if(self.unsynced > 0 and (force or self.unsynced >= self.fsyncBatchSize) and not self.file.closed):
+                os.fsync(self.file.fileno())
+                self.unsynced = 0
+
+    def compact(self) -> int:
+        """
+        Write entities in journal to their files and start a new journal.
+
+        Returns:
+            int: Number of entities written.
+        """
+
+        with self.foldLock, self.processLock:
+            with self.lock:
+                if(len(self.pending) == 0 or self.file.closed):
+                    return 0
+
+                self.sync()
+                self.file.close()
+                os.replace(self.journalPath, self.compactingPath)
+                self.file = open(self.journalPath, "a", encoding = "utf-8")
+                for record in self.unclaimed.values():
+                    self.file.write(json.dumps(record) + "\n")
+                    self.unsynced += 1
+
+                self.compacting = self.pending
+                compactingRecorded = self.recorded
+                self.pending = {}
+                self.recorded = {}
+
+            written = 0
+            failed = {}
+            for path, entity in self.compacting.items():
+                writer = self.writers.get(os.path.dirname(os.path.normpath(path)))
+                signature = compactingRecorded[path][1]
+                # Written directly since it was journaled, e.g. by another process, what is stored is newer
+                if(self.getSignature(path) != signature):
+                    printS("Skipped writing ", path, " from journal, it was changed since.", color = BashColor.WARNING)
+                    continue
+
+                try:
+                    writer[1](entity)
+                    written += 1
+                except Exception as e:
+                    printS("Could not write ", path, " from journal: ", e, color = BashColor.ERROR)
+                    failed[path] = entity
+
+            with self.lock:
+                for path, entity in self.compacting.items():
+                    if(path in failed and path not in self.pending):
+                        self.recorded[path] = compactingRecorded[path]
+                        self.pending[path] = entity
+                        self.writeRecord(path, entity.__dict__)
+                    elif(path not in failed and path in self.pending):
+                        # Journaled again while written, the record must be based on what was written
+                        self.recorded.pop(path, None)
+                        self.writeRecord(path, self.pending[path].__dict__)
+                self.compacting = {}
+                self.sync()
+                os.remove(self.compactingPath)
+
+        return written
+
+    def runCompactor(self) -> None:
+        """
+        Compact the journal periodically until closed.
+        """
+
+        while(not self.stopEvent.wait(self.compactSeconds)):
+            try:
+                self.compact()
+            except Exception as e:
+                printS("Compacting journal failed: ", e, color = BashColor.ERROR)
+
+    def close(self) -> None:
+        """
+        Stop the compactor, write all entities in journal to their files, and close the journal. The journal file is removed if all entities were written.
+        """
+
+        self.stopEvent.set()
+        self.compact()
+        with self.processLock, self.lock:
+            if(self.file.closed):
+                return
+
+            self.sync()
+            self.file.close()
+            if(len(self.pending) == 0 and len(self.unclaimed) == 0):
+                os.remove(self.journalPath)
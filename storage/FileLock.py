@@ -0,0 +1,94 @@
+import os
+import threading
+
+from LazyImport import LazyModule
+
+if(os.name == "nt"):
+    import msvcrt
+else:
+    import fcntl
+
+psutil = LazyModule("psutil")
+
+
+def isProcessRunning(pid: int) -> bool:
+    """
+    Check if a process with PID is running, e.g. the owner of a file.
+
+    Args:
+        pid (int): ID of process.
+
+    Returns:
+        bool: Result.
+    """
+
+    if(pid == os.getpid()):
+        return True
+
+    return psutil.pid_exists(pid)
+
+
+class FileLock():
+    """
+    Lock held by one process at a time, on a lock file, and by one thread at a time within the process. Can be entered again by the thread holding it.
+    """
+
+    lockPath: str = None
+    threadLock: threading.RLock = None
+    file = None
+    depth: int = None
+
+    def __init__(self, lockPath: str):
+        self.lockPath = lockPath
+        self.threadLock = threading.RLock()
+        self.depth = 0
+
+    def __enter__(self) -> "FileLock":
+        self.threadLock.acquire()
+        try:
+            if(self.depth == 0):
+                directory = os.path.dirname(self.lockPath)
+                if(directory):
+                    os.makedirs(directory, exist_ok = True)
+
+                self.file = open(self.lockPath, "a+")
+                self.lockFile()
+        except:
+            if(self.file != None):
+                self.file.close()
+                self.file = None
+            self.threadLock.release()
+            raise
+
+        self.depth += 1
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.depth -= 1
+        if(self.depth == 0):
+            self.unlockFile()
+            self.file.close()
+            self.file = None
+
+        self.threadLock.release()
+
+    def lockFile(self) -> None:
+        if(os.name == "nt"):
+            self.file.seek(0)
+            while(True):
+                try:
+                    msvcrt.locking(self.file.fileno(), msvcrt.LK_LOCK, 1)
+                    return
+                except OSError:
+                    # LK_LOCK gives up after about 10 seconds, keep waiting
+                    continue
+
+        fcntl.flock(self.file.fileno(), fcntl.LOCK_EX)
+
+    def unlockFile(self) -> None:
+        if(os.name == "nt"):
+            self.file.seek(0)
+            msvcrt.locking(self.file.fileno(), msvcrt.LK_UNLCK, 1)
+            return
+
+        fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
@@ -0,0 +1,146 @@
+import contextvars
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Callable, Dict, Tuple
+
+from LazyImport import LazyModule
+
+requests = LazyModule("requests")
+
+
+class HttpCache():
+    directory: str = None
+    ttlSeconds: int = None
+    stats: contextvars.ContextVar = None
+    lock: threading.Lock = None
+
+    def __init__(self, directory: str, ttlSeconds: int = 900):
+        self.directory = directory
+        self.ttlSeconds = ttlSeconds
+        self.stats = contextvars.ContextVar("httpCacheStats", default = None)
+        self.lock = threading.Lock()
+
+    def getPaths(self, key: str) -> Tuple[str, str]:
+        name = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return (os.path.join(self.directory, f"{name}.json"), os.path.join(self.directory, f"{name}.body"))
+
+    def get(self, url: str, key: str = None, getFunction: Callable = None, timeout: int = None, changedSince: float = None) -> Tuple[int, bytes, bool]:
+        """
+        Get content of URL, sending If-None-Match/If-Modified-Since if a response is cached, or using the cached response without a request if it has no validators and is younger than the TTL.
+
+        Args:
+            url (str): URL to get.
+            key (str, optional): Key to cache response by, e.g. StreamSource ID and URL so sources do not share "not modified" state. Defaults to url.
+            getFunction (Callable, optional): Function doing the request, with the same signature as requests.get. Defaults to None, requests.get.
+            timeout (int, optional): Timeout of request in seconds. Defaults to None, the default of getFunction.
+            changedSince (float, optional): Timestamp content was last used, e.g. when its source was last updated. Cached content stored after it is reported as changed, so content is not lost if it was cached but not used. Defaults to None, never used.
+
+        Returns:
+            Tuple[int, bytes, bool]: Status code (200 if served from cache), content, and if content changed since last time it was cached or since changedSince.
+        """
+
+        metaPath, bodyPath = self.getPaths(key or url)
+        meta = None
+        if(self.ttlSeconds >= 0 and os.path.exists(metaPath) and os.path.exists(bodyPath)):
+            try:
+                with open(metaPath, "r", encoding = "utf-8") as file:
+                    meta = json.load(file)
+            except (OSError, ValueError):
+                meta = None
+
+        headers = {}
+        if(meta != None):
+            hasValidators = meta.get("etag") != None or meta.get("lastModified") != None
+            if(not hasValidators and time.time() - meta["stored"] < self.ttlSeconds):
+                self.addStat("hits")
+                return (200, self.readBody(bodyPath), self.isChangedSince(meta, changedSince))
+
+            if(meta.get("etag") != None):
+                headers["If-None-Match"] = meta["etag"]
+            if(meta.get("lastModified") != None):
+                headers["If-Modified-Since"] = meta["lastModified"]
+
+        _getFunction = getFunction if(getFunction != None) else requests.get
+        response = _getFunction(url, headers = headers, timeout = timeout)
+        if(response.status_code == 304 and meta != None):
+            self.addStat("notModified")
+            meta["stored"] = time.time()
+            self.writeMeta(metaPath, meta)
+            return (200, self.readBody(bodyPath), self.isChangedSince(meta, changedSince))
+
+        self.addStat("misses")
+
+        if(response.status_code == 200 and self.ttlSeconds >= 0):
+            os.makedirs(self.directory, exist_ok = True)
+            tempPath = bodyPath + ".tmp"
+            with open(tempPath, "wb") as file:
+                file.write(response.content)
+            os.replace(tempPath, bodyPath)
+            self.writeMeta(metaPath, {
+                "url": url,
+                "etag": response.headers.get("ETag"),
+                "lastModified": response.headers.get("Last-Modified"),
+                "stored": time.time(),
+                "changed": time.time()})
+
+        return (response.status_code, response.content, True)
+
+    def readBody(self, bodyPath: str) -> bytes:
+        with open(bodyPath, "rb") as file:
+            return file.read()
+
+    def writeMeta(self, metaPath: str, meta: dict) -> None:
+        tempPath = metaPath + ".tmp"
+        with open(tempPath, "w", encoding = "utf-8") as file:
+            json.dump(meta, file)
+        os.replace(tempPath, metaPath)
+
+    def isChangedSince(self, meta: dict, changedSince: float) -> bool:
+        """
+        Check if cached content was stored after a timestamp.
+
+        Args:
+            meta (dict): Metadata of cached response.
+            changedSince (float | None): Timestamp, None if never used.
+
+        Returns:
+            bool: Result.
+        """
+
+        return changedSince == None or meta.get("changed", 0) > changedSince
+
+    def startStats(self) -> Dict[str, int]:
+        """
+        Start counting hits, not modified responses, and misses for the current call, e.g. one fetch, including threads started with a copy of its context.
+
+        Returns:
+            Dict[str, int]: Counters of the current call.
+        """
+
+        stats = {"hits": 0, "notModified": 0, "misses": 0}
+        self.stats.set(stats)
+        return stats
+
+    def addStat(self, name: str) -> None:
+        stats = self.stats.get()
+        if(stats == None):
+            return
+
+        with self.lock:
+            stats[name] += 1
+
+    def getStatsString(self, stats: Dict[str, int]) -> str:
+        """
+        Get hits, not modified responses, and misses as a string.
+
+        Args:
+            stats (Dict[str, int]): Counters from startStats.
+
+        Returns:
+            str: Stats of cache.
+        """
+
+        return f"HTTP cache: {stats['hits']} served from cache (TTL), {stats['notModified']} not modified (304), {stats['misses']} downloaded."
@@ -0,0 +1,297 @@
+import atexit
+import json
+import os
+import threading
+from typing import Callable, Dict, List, Set
+from urllib.parse import urlsplit, urlunsplit
+
+
+class PlaylistDedupIndex():
+    indexDirectory: str = None
+    streams: Dict[str, Dict[str, List[str]]] = None
+    positions: Dict[str, object] = None
+    keyCounts: Dict[str, Dict[str, int]] = None
+    changed: Set[str] = None
+    lock: threading.RLock = None
+
+    def __init__(self, indexDirectory: str):
+        self.indexDirectory = indexDirectory
+        self.streams = {}
+        self.positions = {}
+        self.keyCounts = {}
+        self.changed = set()
+        self.lock = threading.RLock()
+        atexit.register(self.saveChanged)
+
+    def getIndexPath(self, playlistId: str) -> str:
+        return os.path.join(self.indexDirectory, f"{playlistId}.json")
+
+    def normalizeUri(self, uri: str) -> str:
+        """
+        Normalize URI so trivially different URIs for the same stream are equal, e.g. case of host, "www.", and trailing slash.
+
+        Args:
+            uri (str): URI to normalize.
+
+        Returns:
+            str: Normalized URI.
+        """
+
+        uri = uri.strip()
+        parts = urlsplit(uri)
+        if(not parts.netloc):
+            return os.path.normcase(os.path.normpath(uri))
+
+        netloc = parts.netloc.lower()
+        if(netloc.startswith("www.")):
+            netloc = netloc[4:]
+
+        return urlunsplit((parts.scheme.lower(), netloc, parts.path.rstrip("/"), parts.query, ""))
+
+    def getKeys(self, stream: object) -> List[str]:
+        """
+        Get keys a stream is considered a duplicate by: normalized URI, remote ID, and name.
+
+        Args:
+            stream (QueueStream): Stream to get keys for.
+
+        Returns:
+            List[str]: Keys.
+        """
+
+        keys = []
+        if(stream.uri):
+            keys.append("uri:" + self.normalizeUri(stream.uri))
+        if(getattr(stream, "remoteId", None)):
+            keys.append("remoteId:" + str(stream.remoteId))
+        if(stream.name):
+            keys.append("name:" + " ".join(stream.name.split()).casefold())
+
+        return keys
+
+    def load(self, playlistId: str) -> None:
+        """
+        Load index of Playlist from file, if not already loaded.
+
+        Args:
+            playlistId (str): ID of Playlist.
+        """
+
+        with self.lock:
+            if(playlistId in self.streams):
+                return
+
+            streams = {}
+            position = None
+            path = self.getIndexPath(playlistId)
+            if(os.path.exists(path)):
+                try:
+                    with open(path, "r", encoding = "utf-8") as file:
+                        data = json.load(file)
+                    streams = data["streams"]
+                    position = data["position"]
+                except (OSError, ValueError, KeyError):
+                    # Index is rebuilt from the QueueStreams when synced
+                    streams = {}
+                    position = None
+
+            self.streams[playlistId] = {}
+            self.positions[playlistId] = position
+            self.keyCounts[playlistId] = {}
+            for streamId, keys in streams.items():
+                self.setEntry(playlistId, streamId, keys)
+
+    def save(self, playlistId: str) -> None:
+        """
+        Save index of Playlist to file.
+
+        Args:
+            playlistId (str): ID of Playlist.
+        """
+
+        with self.lock:
+            streams = self.streams.get(playlistId)
+            if(streams == None):
+                return
+
+            os.makedirs(self.indexDirectory, exist_ok = True)
+            path = self.getIndexPath(playlistId)
+            tempPath = path + ".tmp"
+            with open(tempPath, "w", encoding = "utf-8") as file:
+                json.dump({"position": self.positions.get(playlistId), "streams": streams}, file)
+            os.replace(tempPath, path)
+            self.changed.discard(playlistId)
+
+    def saveChanged(self) -> None:
+        """
+        Save indexes of Playlists changed by updated QueueStreams since they were last saved.
+        """
+
+        with self.lock:
+            for playlistId in list(self.changed):
+                self.save(playlistId)
+
+    def getPosition(self, playlistId: str) -> object:
+        """
+        Get position in the changes of QueueStreams index of Playlist was last synced at.
+
+        Args:
+            playlistId (str): ID of Playlist.
+
+        Returns:
+            object | None: Position, None if never synced.
+        """
+
+        with self.lock:
+            self.load(playlistId)
+            return self.positions[playlistId]
+
+    def sync(self, playlistId: str, streamIds: List[str], changedIds: List[str], position: object, getStreams: Callable) -> bool:
+        """
+        Bring index of Playlist up to date with its stream IDs, reading only streams not already indexed or changed since it was last synced.
+
+        Args:
+            playlistId (str): ID of Playlist.
+            streamIds (List[str]): IDs of streams currently in Playlist.
+            changedIds (List[str] | None): IDs of streams changed since position index was last synced at, None if not known and every stream is read.
+            position (object): Current position in the changes of streams, saved with the index.
+            getStreams (Callable): Function getting streams, including soft-deleted, by a list of IDs, None where a stream was not found.
+
+        Returns:
+            bool: True if index changed.
+        """
+
+        with self.lock:
+            self.load(playlistId)
+            indexed = self.streams[playlistId]
+            currentIds = set(streamIds)
+
+            removedIds = [_ for _ in indexed.keys() if _ not in currentIds]
+            for streamId in removedIds:
+                self.removeStream(playlistId, streamId)
+
+            # Streams added to Playlist since, e.g. by another process, and indexed streams changed since
+            readIds = [_ for _ in dict.fromkeys(streamIds) if _ not in indexed]
+            if(changedIds == None):
+                readIds.extend(indexed.keys())
+            else:
+                readIds.extend(_ for _ in dict.fromkeys(changedIds) if _ in indexed)
+
+            if(len(readIds) > 0):
+                for streamId, stream in zip(readIds, getStreams(readIds)):
+                    # Soft-deleted and missing streams are indexed without keys, so they are not read again until changed
+                    self.setEntry(playlistId, streamId, self.getStreamKeys(stream))
+
+            positionChanged = self.positions[playlistId] != position
+            self.positions[playlistId] = position
+            return len(removedIds) + len(readIds) > 0 or positionChanged or playlistId in self.changed
+
+    def getStreamKeys(self, stream: object) -> List[str]:
+        if(stream == None or stream.deleted != None):
+            return []
+
+        return self.getKeys(stream)
+
+    def setEntry(self, playlistId: str, streamId: str, keys: List[str]) -> None:
+        self.removeStream(playlistId, streamId)
+        self.streams[playlistId][streamId] = keys
+        counts = self.keyCounts[playlistId]
+        for key in keys:
+            counts[key] = counts.get(key, 0) + 1
+
+    def addStream(self, playlistId: str, stream: object) -> None:
+        """
+        Add stream to index of Playlist.
+
+        Args:
+            playlistId (str): ID of Playlist.
+            stream (QueueStream): Stream to add.
+        """
+
+        with self.lock:
+            self.load(playlistId)
+            self.setEntry(playlistId, stream.id, self.getStreamKeys(stream))
+
+    def updateStream(self, stream: object) -> None:
+        """
+        Re-index stream in every loaded index of a Playlist it is in, e.g. after its name or URI was edited, or it was soft-deleted or restored.
+        Indexes not loaded are re-indexed from the changes of streams when synced.
+
+        Args:
+            stream (QueueStream): Stream updated.
+        """
+
+        with self.lock:
+            for playlistId, streams in self.streams.items():
+                if(stream.id in streams):
+                    self.setEntry(playlistId, stream.id, self.getStreamKeys(stream))
+                    self.changed.add(playlistId)
+
+    def clearStream(self, streamId: str) -> None:
+        """
+        Remove keys of stream from every loaded index of a Playlist it is in, e.g. after it was permanently removed.
+
+        Args:
+            streamId (str): ID of stream removed.
+        """
+
+        with self.lock:
+            for playlistId, streams in self.streams.items():
+                if(streamId in streams):
+                    self.setEntry(playlistId, streamId, [])
+                    self.changed.add(playlistId)
+
+    def removeStream(self, playlistId: str, streamId: str) -> None:
+        """
+        Remove stream from index of Playlist.
+
+        Args:
+            playlistId (str): ID of Playlist.
+            streamId (str): ID of stream to remove.
+        """
+
+        with self.lock:
+            self.load(playlistId)
+            entry = self.streams[playlistId].pop(streamId, None)
+            if(entry == None):
+                return
+
+            counts = self.keyCounts[playlistId]
+            for key in entry:
+                counts[key] -= 1
+                if(counts[key] <= 0):
+                    del counts[key]
+
+    def removePlaylist(self, playlistId: str) -> None:
+        """
+        Remove index of Playlist, including its file.
+
+        Args:
+            playlistId (str): ID of Playlist.
+        """
+
+        with self.lock:
+            self.streams.pop(playlistId, None)
+            self.positions.pop(playlistId, None)
+            self.keyCounts.pop(playlistId, None)
+            self.changed.discard(playlistId)
+            path = self.getIndexPath(playlistId)
+            if(os.path.exists(path)):
+                os.remove(path)
+
+    def contains(self, playlistId: str, stream: object) -> bool:
+        """
+        Check if a stream with the same URI, remote ID, or name is in index of Playlist.
+
+        Args:
+            playlistId (str): ID of Playlist.
+            stream (QueueStream): Stream to check.
+
+        Returns:
+            bool: Result.
+        """
+
+        with self.lock:
+            self.load(playlistId)
+            counts = self.keyCounts[playlistId]
+            return any(key in counts for key in self.getKeys(stream))
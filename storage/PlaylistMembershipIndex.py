@@ -0,0 +1,169 @@
+import atexit
+import json
+import os
+import threading
+from typing import Callable, Dict, List, Set
+
+
+class PlaylistMembershipIndex():
+    indexPath: str = None
+    playlists: Dict[str, dict] = None
+    owners: Dict[str, Set[str]] = None
+    dirty: bool = None
+    lock: threading.RLock = None
+
+    def __init__(self, indexPath: str):
+        self.indexPath = indexPath
+        self.playlists = {}
+        self.owners = {}
+        self.dirty = False
+        self.lock = threading.RLock()
+
+        self.load()
+        atexit.register(self.save)
+
+    def load(self) -> None:
+        """
+        Load index from file, if any.
+        """
+
+        if(not os.path.exists(self.indexPath)):
+            return
+
+        try:
+            with open(self.indexPath, "r", encoding = "utf-8") as file:
+                playlists = json.load(file)
+        except (OSError, ValueError):
+            # Index is rebuilt from the Playlists when synced
+            return
+
+        with self.lock:
+            self.playlists = {}
+            self.owners = {}
+            for playlistId, entry in playlists.items():
+                self.addEntry(playlistId, entry)
+
+    def save(self) -> None:
+        """
+        Save index to file, if changed since last save.
+        """
+
+        with self.lock:
+            if(not self.dirty):
+                return
+
+            directory = os.path.dirname(self.indexPath)
+            if(directory):
+                os.makedirs(directory, exist_ok = True)
+
+            tempPath = self.indexPath + ".tmp"
+            with open(tempPath, "w", encoding = "utf-8") as file:
+                json.dump(self.playlists, file)
+            os.replace(tempPath, self.indexPath)
+            self.dirty = False
+
+    def sync(self, signatures: Dict[str, tuple], getPlaylists: Callable) -> int:
+        """
+        Bring index up to date with stored Playlists, re-reading only Playlists changed since they were indexed.
+
+        Args:
+            signatures (Dict[str, tuple | None]): Signature (e.g. modified time and size of file) of every stored Playlist by ID, None if unknown.
+            getPlaylists (Callable): Function getting Playlists, including soft-deleted, by a list of IDs.
+
+        Returns:
+            int: Number of Playlists re-indexed or removed from index.
+        """
+
+        with self.lock:
+            removedIds = [_ for _ in self.playlists.keys() if _ not in signatures]
+            for playlistId in removedIds:
+                self.removePlaylist(playlistId)
+
+            changedIds = []
+            for playlistId, signature in signatures.items():
+                entry = self.playlists.get(playlistId)
+                if(entry == None or signature == None or entry["signature"] != list(signature)):
+                    changedIds.append(playlistId)
+
+            for playlistId, playlist in zip(changedIds, getPlaylists(changedIds)):
+                if(playlist == None):
+                    self.removePlaylist(playlistId)
+                else:
+                    self.setPlaylist(playlist, signatures[playlistId])
+
+        self.save()
+        return len(removedIds) + len(changedIds)
+
+    def addEntry(self, playlistId: str, entry: dict) -> None:
+        self.playlists[playlistId] = entry
+        for id in entry["streamIds"] + entry["streamSourceIds"]:
+            self.owners.setdefault(id, set()).add(playlistId)
+
+    def setPlaylist(self, playlist: object, signature: tuple = None) -> None:
+        """
+        Index the QueueStreams and StreamSources of Playlist, replacing what was indexed for it before.
+
+        Args:
+            playlist (Playlist): Playlist to index.
+            signature (tuple, optional): Signature of the stored Playlist. Defaults to None.
+        """
+
+        with self.lock:
+            self.removePlaylist(playlist.id)
+            self.addEntry(playlist.id, {
+                "signature": list(signature) if(signature != None) else None,
+                "deleted": playlist.deleted != None,
+                "streamIds": list(playlist.streamIds),
+                "streamSourceIds": list(playlist.streamSourceIds)})
+            self.dirty = True
+
+    def removePlaylist(self, playlistId: str) -> None:
+        """
+        Remove Playlist from index.
+
+        Args:
+            playlistId (str): ID of Playlist to remove.
+        """
+
+        with self.lock:
+            entry = self.playlists.pop(playlistId, None)
+            if(entry == None):
+                return
+
+            for id in entry["streamIds"] + entry["streamSourceIds"]:
+                owners = self.owners.get(id)
+                if(owners != None):
+                    owners.discard(playlistId)
+                    if(len(owners) == 0):
+                        del self.owners[id]
+            self.dirty = True
+
+    def getPlaylistIds(self, id: str, includeSoftDeleted: bool = False) -> List[str]:
+        """
+        Get IDs of Playlists containing a QueueStream or StreamSource.
+
+        Args:
+            id (str): ID of QueueStream or StreamSource.
+            includeSoftDeleted (bool, optional): Should include soft-deleted Playlists. Defaults to False.
+
+        Returns:
+            List[str]: IDs of Playlists.
+        """
+
+        with self.lock:
+            owners = self.owners.get(id, set())
+            return [_ for _ in owners if includeSoftDeleted or not self.playlists[_]["deleted"]]
+
+    def isLinked(self, id: str, includeSoftDeleted: bool = False) -> bool:
+        """
+        Check if a QueueStream or StreamSource is in any Playlist.
+
+        Args:
+            id (str): ID of QueueStream or StreamSource.
+            includeSoftDeleted (bool, optional): Should include soft-deleted Playlists. Defaults to False.
+
+        Returns:
+            bool: Result.
+        """
+
+        return len(self.getPlaylistIds(id, includeSoftDeleted)) > 0
@@ -0,0 +1,251 @@
+import base64
+import bisect
+import json
+import os
+import threading
+from typing import Callable, Dict, List
+
+from storage.WatchedIndex import WatchedIndex
+
+
+class PlaylistStateIndex():
+    watchedFlag: int = 1
+    deletedFlag: int = 2
+    missingFlag: int = 4
+    indexDirectory: str = None
+    playlists: Dict[str, dict] = None
+    positions: Dict[str, Dict[str, List[int]]] = None
+    lock: threading.RLock = None
+
+    def __init__(self, indexDirectory: str):
+        self.indexDirectory = indexDirectory
+        self.playlists = {}
+        self.positions = {}
+        self.lock = threading.RLock()
+
+    def getIndexPath(self, playlistId: str) -> str:
+        """
+        Get path of file states of Playlist are saved in.
+
+        Args:
+            playlistId (str): ID of Playlist.
+
+        Returns:
+            str: Absolute file path.
+        """
+
+        return os.path.join(self.indexDirectory, f"{playlistId}.json")
+
+    def load(self, playlistId: str) -> dict:
+        """
+        Load states of Playlist from file, if not already loaded.
+
+        Args:
+            playlistId (str): ID of Playlist.
+
+        Returns:
+            dict | None: States, None if not indexed.
+        """
+
+        with self.lock:
+            if(playlistId in self.playlists):
+                return self.playlists[playlistId]
+
+            path = self.getIndexPath(playlistId)
+            if(not os.path.exists(path)):
+                return None
+
+            try:
+                with open(path, "r", encoding = "utf-8") as file:
+                    states = json.load(file)
+                states["flags"] = bytearray(base64.b64decode(states["flags"]))
+            except (OSError, ValueError, KeyError):
+                # States are rebuilt from the watched index when synced
+                return None
+
+            self.setStates(playlistId, states)
+            return states
+
+    def save(self, playlistId: str) -> None:
+        """
+        Save states of Playlist to file.
+
+        Args:
+            playlistId (str): ID of Playlist.
+        """
+
+        with self.lock:
+            states = self.playlists.get(playlistId)
+            if(states == None):
+                return
+
+            data = dict(states)
+            data.pop("playableSlots", None)
+            data["flags"] = base64.b64encode(bytes(states["flags"])).decode("ascii")
+
+            os.makedirs(self.indexDirectory, exist_ok = True)
+            path = self.getIndexPath(playlistId)
+            tempPath = path + ".tmp"
+            with open(tempPath, "w", encoding = "utf-8") as file:
+                json.dump(data, file)
+            os.replace(tempPath, path)
+
+    def setStates(self, playlistId: str, states: dict) -> None:
+        """
+        Set states of Playlist and map each stream ID to its slots.
+
+        Args:
+            playlistId (str): ID of Playlist.
+            states (dict): States, see sync().
+        """
+
+        self.playlists[playlistId] = states
+        positions = {}
+        for i, streamId in enumerate(states["streamIds"]):
+            positions.setdefault(streamId, []).append(i)
+        self.positions[playlistId] = positions
+
+    def setSlot(self, states: dict, i: int, entry: dict) -> None:
+        """
+        Set state of slot i from an entry of the watched index.
+
+        Args:
+            states (dict): States of Playlist.
+            i (int): Index of slot, same as index in streamIds of Playlist.
+            entry (dict | None): Entry of watched index, None if QueueStream was not found.
+        """
+
+        # Playable slots are found again when next used
+        states.pop("playableSlots", None)
+        if(entry == None):
+            states["flags"][i] = self.missingFlag
+            states["watched"][i] = None
+            states["deleted"][i] = None
+            return
+
+        states["flags"][i] = (self.watchedFlag if(entry["watched"]) else 0) | (self.deletedFlag if(entry["deleted"]) else 0)
+        states["watched"][i] = entry["watchedAt"]
+        states["deleted"][i] = entry["deletedAt"]
+
+    def sync(self, playlistId: str, streamIds: List[str], watchedIndex: WatchedIndex, indexStreams: Callable, getChangedIds: Callable) -> dict:
+        """
+        Bring states of Playlist up to date with its stream IDs and the watched index.
+        States are rebuilt from the watched index if stream IDs changed or changes of QueueStreams since the states were saved are not known, otherwise only QueueStreams changed since, by any process, are read and their slots updated.
+
+        Args:
+            playlistId (str): ID of Playlist.
+            streamIds (List[str]): IDs of streams currently in Playlist.
+            watchedIndex (WatchedIndex): Index of watched and deleted state of all QueueStreams.
+            indexStreams (Callable): Function reading and indexing QueueStreams in the watched index, by a list of IDs.
+            getChangedIds (Callable): Function getting IDs of QueueStreams changed since a position in the changes of QueueStreams, None if not known, and the current position.
+
+        Returns:
+            dict: States of Playlist, with "streamIds", "flags" (one byte of watchedFlag, deletedFlag, and missingFlag per slot), and "watched" and "deleted" timestamps per slot.
+        """
+
+        with self.lock:
+            states = self.load(playlistId)
+            changedIds = None
+            if(states != None and states["streamIds"] == streamIds):
+                changedIds, position = getChangedIds(states.get("position"))
+
+            if(changedIds != None):
+                if(position == states.get("position")):
+                    return states
+
+                positions = self.positions[playlistId]
+                changedIds = [_ for _ in changedIds if _ in positions]
+                if(len(changedIds) > 0):
+                    indexStreams(changedIds)
+                for streamId in changedIds:
+                    for i in positions[streamId]:
+                        self.setSlot(states, i, watchedIndex.getEntry(streamId))
+            else:
+                missingIds = [_ for _ in dict.fromkeys(streamIds) if not watchedIndex.contains(_)]
+                if(len(missingIds) > 0):
+                    indexStreams(missingIds)
+
+                # Watched index has every change up to its position, changes after it may be missing and are read next sync
+                position = watchedIndex.position
+                states = {
+                    "streamIds": list(streamIds),
+                    "flags": bytearray(len(streamIds)),
+                    "watched": [None] * len(streamIds),
+                    "deleted": [None] * len(streamIds)}
+                for i, streamId in enumerate(streamIds):
+                    self.setSlot(states, i, watchedIndex.getEntry(streamId))
+                self.setStates(playlistId, states)
+
+            states["position"] = position
+            self.save(playlistId)
+
+            return states
+
+    def removePlaylist(self, playlistId: str) -> None:
+        """
+        Remove states of Playlist, including its file.
+
+        Args:
+            playlistId (str): ID of Playlist.
+        """
+
+        with self.lock:
+            self.playlists.pop(playlistId, None)
+            self.positions.pop(playlistId, None)
+            path = self.getIndexPath(playlistId)
+            if(os.path.exists(path)):
+                os.remove(path)
+
+    def findIndex(self, states: dict, index: int, includeWatched: bool = False) -> int:
+        """
+        Find first slot from index with a QueueStream that can be played: found, not soft-deleted, and not watched.
+        Playable slots are kept with the states until a slot changes, so each find is a binary search.
+
+        Args:
+            states (dict): States of Playlist.
+            index (int): Index to start at.
+            includeWatched (bool, optional): Watched QueueStreams can be played. Defaults to False.
+
+        Returns:
+            int | None: Index, None if no slot from index can be played.
+        """
+
+        mask = self.deletedFlag | self.missingFlag | (0 if(includeWatched) else self.watchedFlag)
+        playableSlots = states.setdefault("playableSlots", {})
+        slots = playableSlots.get(mask)
+        if(slots == None):
+            slots = [i for i, flag in enumerate(states["flags"]) if flag & mask == 0]
+            playableSlots[mask] = slots
+
+        position = bisect.bisect_left(slots, max(0, index))
+        return slots[position] if(position < len(slots)) else None
+
+    def getIndices(self, states: dict, watched: bool = None, includeSoftDeleted: bool = False) -> List[int]:
+        """
+        Get slots of QueueStreams found, by watched state.
+
+        Args:
+            states (dict): States of Playlist.
+            watched (bool, optional): Only watched QueueStreams if True, only unwatched if False. Defaults to None, both.
+            includeSoftDeleted (bool, optional): Should include soft-deleted QueueStreams. Defaults to False.
+
+        Returns:
+            List[int]: Indices of slots.
+        """
+
+        mask = self.missingFlag | (0 if(includeSoftDeleted) else self.deletedFlag) | (0 if(watched == None) else self.watchedFlag)
+        expected = self.watchedFlag if(watched) else 0
+        return [i for i, flag in enumerate(states["flags"]) if flag & mask == expected]
+
+    def getMissingIndices(self, states: dict) -> List[int]:
+        """
+        Get slots of QueueStreams not found, e.g. removed without being removed from Playlist.
+
+        Args:
+            states (dict): States of Playlist.
+
+        Returns:
+            List[int]: Indices of slots.
+        """
+
+        return [i for i, flag in enumerate(states["flags"]) if flag & self.missingFlag]
@@ -0,0 +1,211 @@
+import atexit
+import json
+import os
+import re
+import threading
+from bisect import bisect_right
+from typing import Callable, Dict, List
+
+
+class SearchIndex():
+    indexPath: str = None
+    entities: Dict[str, list] = None
+    dirty: bool = None
+    lock: threading.RLock = None
+    text: str = None
+    lineStarts: List[int] = None
+    lineIds: List[str] = None
+    nextEntityLines: List[int] = None
+    regexCharacters: str = ".^$*+?{}[]\\|()"
+
+    def __init__(self, indexPath: str):
+        self.indexPath = indexPath
+        self.entities = {}
+        self.dirty = False
+        self.lock = threading.RLock()
+
+        self.load()
+        atexit.register(self.save)
+
+    def load(self) -> None:
+        """
+        Load index from file, if any.
+        """
+
+        if(not os.path.exists(self.indexPath)):
+            return
+
+        try:
+            with open(self.indexPath, "r", encoding = "utf-8") as file:
+                entities = json.load(file)
+        except (OSError, ValueError):
+            # Index is rebuilt from the entities when synced
+            return
+
+        with self.lock:
+            self.entities = entities
+            self.text = None
+
+    def save(self) -> None:
+        """
+        Save index to file, if changed since last save.
+        """
+
+        with self.lock:
+            if(not self.dirty):
+                return
+
+            directory = os.path.dirname(self.indexPath)
+            if(directory):
+                os.makedirs(directory, exist_ok = True)
+
+            tempPath = self.indexPath + ".tmp"
+            with open(tempPath, "w", encoding = "utf-8") as file:
+                json.dump(self.entities, file)
+            os.replace(tempPath, self.indexPath)
+            self.dirty = False
+
+    def sync(self, signatures: Dict[str, tuple], getEntities: Callable, getFields: Callable) -> int:
+        """
+        Bring index up to date with stored entities, re-reading only entities changed since they were indexed.
+
+        Args:
+            signatures (Dict[str, tuple | None]): Signature (e.g. modified time and size of file) of every stored entity by ID, None if unknown.
+            getEntities (Callable): Function getting entities, including soft-deleted, by a list of IDs.
+            getFields (Callable): Function getting the searchable fields of an entity.
+
+        Returns:
+            int: Number of entities re-indexed or removed from index.
+        """
+
+        with self.lock:
+            removedIds = [_ for _ in self.entities.keys() if _ not in signatures]
+            for id in removedIds:
+                self.removeEntity(id)
+
+            changedIds = []
+            for id, signature in signatures.items():
+                entry = self.entities.get(id)
+                if(entry == None or signature == None or entry[0] != list(signature)):
+                    changedIds.append(id)
+
+            for id, entity in zip(changedIds, getEntities(changedIds)):
+                if(entity == None):
+                    self.removeEntity(id)
+                else:
+                    self.setEntity(id, getFields(entity), entity.deleted != None, signatures[id])
+
+        self.save()
+        return len(removedIds) + len(changedIds)
+
+    def setEntity(self, id: str, fields: List[str], deleted: bool, signature: tuple = None) -> None:
+        """
+        Index searchable fields of entity.
+
+        Args:
+            id (str): ID of entity.
+            fields (List[str]): Fields to search, e.g. name and URI.
+            deleted (bool): Entity is soft-deleted.
+            signature (tuple, optional): Signature of the stored entity. Defaults to None.
+        """
+
+        entry = [list(signature) if(signature != None) else None, deleted] + [_ if(_ != None) else "" for _ in fields]
+        with self.lock:
+            previous = self.entities.get(id)
+            self.entities[id] = entry
+            self.dirty = True
+            # Text searched is only rebuilt if what can be found changed
+            if(previous == None or previous[2:] != entry[2:]):
+                self.text = None
+
+    def removeEntity(self, id: str) -> None:
+        """
+        Remove entity from index.
+
+        Args:
+            id (str): ID of entity to remove.
+        """
+
+        with self.lock:
+            if(self.entities.pop(id, None) != None):
+                self.dirty = True
+                self.text = None
+
+    def buildText(self) -> None:
+        """
+        Join fields of all entities to one text with one field per line, so a search is a single scan instead of one per field.
+        """
+
+        lines = []
+        lineIds = []
+        nextEntityLines = []
+        for id, entry in self.entities.items():
+            fields = entry[2:]
+            nextEntityLine = len(lines) + len(fields)
+            for field in fields:
+                lines.append(field.replace("\n", " "))
+                lineIds.append(id)
+                nextEntityLines.append(nextEntityLine)
+
+        lineStarts = []
+        position = 0
+        for line in lines:
+            lineStarts.append(position)
+            position += len(line) + 1
+
+        self.text = "\n".join(lines)
+        self.lineStarts = lineStarts
+        self.lineIds = lineIds
+        self.nextEntityLines = nextEntityLines
+
+    def search(self, searchTerm: str, includeSoftDeleted: bool = False) -> List[str]:
+        """
+        Find entities with a field matching searchTerm, ignoring case, like re.search on each field.
+        Terms without Regex characters are found as plain substrings. Terms with Regex characters are scanned for in all fields, and checked against the fields of each entity found.
+
+        Args:
+            searchTerm (str): Regex-enabled term to search for.
+            includeSoftDeleted (bool, optional): Should include soft deleted entities. Defaults to False.
+
+        Returns:
+            List[str]: IDs of entities found.
+
+        Raises:
+            re.error: searchTerm is not a valid Regex.
+        """
+
+        # Plain terms are escaped rather than lowered and found with str.find, lowering can change the length of text so positions would not match lines
+        isPlain = all(_ not in self.regexCharacters for _ in searchTerm)
+        pattern = re.compile(re.escape(searchTerm) if(isPlain) else searchTerm, re.IGNORECASE | re.MULTILINE)
+        fieldPattern = re.compile(searchTerm, re.IGNORECASE) if(not isPlain) else None
+
+        with self.lock:
+            if(self.text == None):
+                self.buildText()
+
+            result = {}
+            position = 0
+            while(position <= len(self.text)):
+                match = pattern.search(self.text, position)
+                if(match == None):
+                    break
+
+                start = match.start()
+                line = bisect_right(self.lineStarts, start) - 1
+                if(line < 0):
+                    break
+
+                id = self.lineIds[line]
+                entry = self.entities[id]
+                if(includeSoftDeleted or not entry[1]):
+                    # A Regex match could span several lines, only fields matching by themselves count
+                    if(isPlain or any(fieldPattern.search(_) for _ in entry[2:])):
+                        result[id] = True
+
+                # Every field of the entity was checked, continue at the next entity
+                nextLine = self.nextEntityLines[line]
+                if(nextLine >= len(self.lineStarts)):
+                    break
+                position = self.lineStarts[nextLine]
+
+            return list(result.keys())
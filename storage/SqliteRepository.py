@@ -0,0 +1,374 @@
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from typing import Dict, List, Tuple
+
+from grdUtil.DateTimeUtil import getDateTime
+
+
+class SqliteRepository():
+    connections: Dict[str, sqlite3.Connection] = {}
+    locks: Dict[str, threading.RLock] = {}
+    connectionsLock: threading.Lock = threading.Lock()
+    databasePath: str = None
+    tableName: str = None
+    entityType: type = None
+
+    def __init__(self, databasePath: str, tableName: str, entityType: type):
+        self.databasePath = databasePath
+        self.tableName = tableName
+        self.entityType = entityType
+
+        with self.lock():
+            connection = self.connection()
+            connection.execute(f"CREATE TABLE IF NOT EXISTS {tableName} (id TEXT PRIMARY KEY, streamSourceId TEXT, watched TEXT, deleted TEXT, data TEXT NOT NULL)")
+            connection.execute(f"CREATE INDEX IF NOT EXISTS ix_{tableName}_streamSourceId ON {tableName} (streamSourceId)")
+            connection.execute(f"CREATE INDEX IF NOT EXISTS ix_{tableName}_watched ON {tableName} (watched)")
+            connection.execute(f"CREATE INDEX IF NOT EXISTS ix_{tableName}_deleted ON {tableName} (deleted)")
+            # Every write, by any process, marks the entity changed with the next number, so changes since a number can be queried
+            connection.execute(f"CREATE TABLE IF NOT EXISTS {tableName}Changes (id TEXT PRIMARY KEY, changed INTEGER NOT NULL)")
+            connection.execute(f"CREATE INDEX IF NOT EXISTS ix_{tableName}Changes_changed ON {tableName}Changes (changed)")
+            for event, row in [("INSERT", "NEW"), ("UPDATE", "NEW"), ("DELETE", "OLD")]:
+                connection.execute(f"CREATE TRIGGER IF NOT EXISTS tr_{tableName}_{event.lower()} AFTER {event} ON {tableName} BEGIN "
+                    f"INSERT OR REPLACE INTO {tableName}Changes (id, changed) VALUES ({row}.id, (SELECT COALESCE(MAX(changed), 0) + 1 FROM {tableName}Changes)); END")
+            connection.commit()
+
+    def connection(self) -> sqlite3.Connection:
+        """
+        Get the connection to the database, shared by all repositories using the same file.
+
+        Returns:
+            sqlite3.Connection: Connection.
+        """
+
+        with SqliteRepository.connectionsLock:
+            connection = SqliteRepository.connections.get(self.databasePath)
+            if(connection == None):
+                directory = os.path.dirname(self.databasePath)
+                if(directory):
+                    os.makedirs(directory, exist_ok = True)
+
+                connection = sqlite3.connect(self.databasePath, check_same_thread = False)
+                connection.execute("PRAGMA journal_mode=WAL")
+                connection.execute("PRAGMA synchronous=NORMAL")
+                SqliteRepository.connections[self.databasePath] = connection
+                SqliteRepository.locks[self.databasePath] = threading.RLock()
+
+        return connection
+
+    def lock(self) -> threading.RLock:
+        """
+        Get the lock guarding the connection to the database.
+
+        Returns:
+            threading.RLock: Lock.
+        """
+
+        self.connection()
+        return SqliteRepository.locks[self.databasePath]
+
+    def toRow(self, entity: object) -> tuple:
+        """
+        Map entity to a row, indexed columns first and the full entity as JSON last.
+
+        Args:
+            entity (object): Entity to map.
+
+        Returns:
+            tuple: Row of id, streamSourceId, watched, deleted, data.
+        """
+
+        data = entity.__dict__
+        watched = data.get("watched")
+        deleted = data.get("deleted")
+        return (entity.id,
+            data.get("streamSourceId"),
+            str(watched) if(watched != None) else None,
+            str(deleted) if(deleted != None) else None,
+            json.dumps(data, default = str))
+
+    def toEntity(self, data: str) -> object:
+        """
+        Map JSON data of a row to entity.
+
+        Args:
+            data (str): JSON data.
+
+        Returns:
+            object: Entity.
+        """
+
+        return self.entityType(**json.loads(data))
+
+    def deletedClause(self, includeSoftDeleted: bool) -> str:
+        return "" if(includeSoftDeleted) else " AND deleted IS NULL"
+
+    def get(self, id: str, includeSoftDeleted: bool = False) -> object:
+        """
+        Get entity by ID.
+
+        Args:
+            id (str): ID of entity to get.
+            includeSoftDeleted (bool, optional): Should include soft-deleted entities. Defaults to False.
+
+        Returns:
+            object | None: Entity if found, else None.
+        """
+
+        with self.lock():
+            row = self.connection().execute(f"SELECT data FROM {self.tableName} WHERE id = ?{self.deletedClause(includeSoftDeleted)}", (id,)).fetchone()
+
+        return self.toEntity(row[0]) if(row != None) else None
+
+    def getMany(self, ids: List[str], includeSoftDeleted: bool = False) -> List[object]:
+        """
+        Get entities by IDs.
+
+        Args:
+            ids (List[str]): IDs of entities to get.
+            includeSoftDeleted (bool, optional): Should include soft-deleted entities. Defaults to False.
+
+        Returns:
+            List[object | None]: Entities in the same order as ids, None where an entity was not found.
+        """
+
+        uniqueIds = list(dict.fromkeys(ids))
+        found = {}
+        # Stay below the default limit of 999 parameters per query
+        for i in range(0, len(uniqueIds), 900):
+            chunk = uniqueIds[i:i + 900]
+            placeholders = ",".join("?" * len(chunk))
+            with self.lock():
+                rows = self.connection().execute(f"SELECT id, data FROM {self.tableName} WHERE id IN ({placeholders}){self.deletedClause(includeSoftDeleted)}", chunk).fetchall()
+            for row in rows:
+                found[row[0]] = self.toEntity(row[1])
+
+        return [found.get(id) for id in ids]
+
+    def getAll(self, includeSoftDeleted: bool = False) -> List[object]:
+        """
+        Get all entities.
+
+        Args:
+            includeSoftDeleted (bool, optional): Should include soft-deleted entities. Defaults to False.
+
+        Returns:
+            List[object]: Entities.
+        """
+
+        with self.lock():
+            rows = self.connection().execute(f"SELECT data FROM {self.tableName} WHERE 1 = 1{self.deletedClause(includeSoftDeleted)}").fetchall()
+
+        return [self.toEntity(row[0]) for row in rows]
+
+    def getAllIds(self, includeSoftDeleted: bool = False) -> List[str]:
+        """
+        Get IDs of all entities.
+
+        Args:
+            includeSoftDeleted (bool, optional): Should include soft-deleted entities. Defaults to False.
+
+        Returns:
+            List[str]: IDs.
+        """
+
+        with self.lock():
+            rows = self.connection().execute(f"SELECT id FROM {self.tableName} WHERE 1 = 1{self.deletedClause(includeSoftDeleted)}").fetchall()
+
+        return [row[0] for row in rows]
+
+    def getDataVersion(self) -> int:
+        """
+        Get version of the database, changed when another connection, e.g. of another process, commits.
+
+        Returns:
+            int: Version.
+        """
+
+        with self.lock():
+            return self.connection().execute("PRAGMA data_version").fetchone()[0]
+
+    def getChangedSince(self, position: int) -> Tuple[List[str], int]:
+        """
+        Get IDs of entities added, changed, or removed since position.
+
+        Args:
+            position (int | None): Number of the last change seen, e.g. when something derived from the entities was last updated.
+
+        Returns:
+            Tuple[List[str] | None, int]: IDs of entities changed, None if position is None, and number of the last change.
+        """
+
+        with self.lock():
+            connection = self.connection()
+            if(not isinstance(position, int)):
+                return (None, connection.execute(f"SELECT COALESCE(MAX(changed), 0) FROM {self.tableName}Changes").fetchone()[0])
+
+            rows = connection.execute(f"SELECT id, changed FROM {self.tableName}Changes WHERE changed > ? ORDER BY changed", (position,)).fetchall()
+
+        return ([row[0] for row in rows], rows[-1][1] if(len(rows) > 0) else position)
+
+    def exists(self, id: str) -> bool:
+        """
+        Check if entity with ID exists, including soft-deleted entities.
+
+        Args:
+            id (str): ID of entity.
+
+        Returns:
+            bool: Result.
+        """
+
+        with self.lock():
+            row = self.connection().execute(f"SELECT 1 FROM {self.tableName} WHERE id = ?", (id,)).fetchone()
+
+        return row != None
+
+    def add(self, entity: object) -> object:
+        """
+        Add entity, generating an ID if it has none. Aborts if an entity already exists with that ID.
+
+        Args:
+            entity (object): Entity to add.
+
+        Returns:
+            object | None: Entity if added, else None.
+        """
+
+        if(entity.id == None):
+            entity.id = str(uuid.uuid4())
+
+        try:
+            with self.lock():
+                connection = self.connection()
+                connection.execute(f"INSERT INTO {self.tableName} (id, streamSourceId, watched, deleted, data) VALUES (?, ?, ?, ?, ?)", self.toRow(entity))
+                connection.commit()
+        except sqlite3.IntegrityError:
+            return None
+
+        return entity
+
+    def update(self, entity: object, *args, **kwargs) -> object:
+        """
+        Update an existing entity.
+
+        Args:
+            entity (object): Entity to update.
+
+        Returns:
+            object | None: Entity if updated, else None.
+        """
+
+        row = self.toRow(entity)
+        with self.lock():
+            connection = self.connection()
+            cursor = connection.execute(f"UPDATE {self.tableName} SET streamSourceId = ?, watched = ?, deleted = ?, data = ? WHERE id = ?", row[1:] + row[:1])
+            connection.commit()
+
+        return entity if(cursor.rowcount > 0) else None
+
+    def upsertMany(self, entities: List[object]) -> int:
+        """
+        Add or replace entities in one transaction.
+
+        Args:
+            entities (List[object]): Entities to save.
+
+        Returns:
+            int: Number of entities saved.
+        """
+
+        rows = [self.toRow(_) for _ in entities if _ != None and _.id != None]
+        with self.lock():
+            connection = self.connection()
+            connection.executemany(f"INSERT OR REPLACE INTO {self.tableName} (id, streamSourceId, watched, deleted, data) VALUES (?, ?, ?, ?, ?)", rows)
+            connection.commit()
+
+        return len(rows)
+
+    def delete(self, id: str) -> object:
+        """
+        Soft delete entity with ID.
+
+        Args:
+            id (str): ID of entity to delete.
+
+        Returns:
+            object | None: Entity if deleted, else None.
+        """
+
+        entity = self.get(id)
+        if(entity == None):
+            return None
+
+        entity.deleted = getDateTime()
+        return self.update(entity)
+
+    def restore(self, id: str) -> object:
+        """
+        Restore soft deleted entity with ID.
+
+        Args:
+            id (str): ID of entity to restore.
+
+        Returns:
+            object | None: Entity if restored, else None.
+        """
+
+        entity = self.get(id, includeSoftDeleted = True)
+        if(entity == None):
+            return None
+
+        entity.deleted = None
+        return self.update(entity)
+
+    def remove(self, id: str, includeSoftDeleted: bool = False) -> object:
+        """
+        Permanently remove entity with ID.
+
+        Args:
+            id (str): ID of entity to remove.
+            includeSoftDeleted (bool, optional): Should include soft-deleted entities. Defaults to False.
+
+        Returns:
+            object | None: Entity if removed, else None.
+        """
+
+        entity = self.get(id, includeSoftDeleted)
+        if(entity == None):
+            return None
+
+        with self.lock():
+            connection = self.connection()
+            connection.execute(f"DELETE FROM {self.tableName} WHERE id = ?", (id,))
+            connection.commit()
+
+        return entity
+
+    def removeMany(self, ids: List[str]) -> List[str]:
+        """
+        Permanently remove entities with IDs in one transaction.
+
+        Args:
+            ids (List[str]): IDs of entities to remove, including soft-deleted entities.
+
+        Returns:
+            List[str]: IDs of entities removed.
+        """
+
+        uniqueIds = list(dict.fromkeys(ids))
+        removed = []
+        with self.lock():
+            connection = self.connection()
+            # Stay below the default limit of 999 parameters per query
+            for i in range(0, len(uniqueIds), 900):
+                chunk = uniqueIds[i:i + 900]
+                placeholders = ",".join("?" * len(chunk))
+                rows = connection.execute(f"SELECT id FROM {self.tableName} WHERE id IN ({placeholders})", chunk).fetchall()
+                removed.extend(row[0] for row in rows)
+                connection.execute(f"DELETE FROM {self.tableName} WHERE id IN ({placeholders})", chunk)
+            connection.commit()
+
+        return removed
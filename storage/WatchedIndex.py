@@ -0,0 +1,212 @@
+import atexit
+import json
+import os
+import threading
+from typing import Callable, Dict, List
+
+
+class WatchedIndex():
+    indexPath: str = None
+    streams: Dict[str, dict] = None
+    position: object = None
+    dirty: bool = None
+    lock: threading.RLock = None
+
+    def __init__(self, indexPath: str):
+        self.indexPath = indexPath
+        self.streams = {}
+        self.dirty = False
+        self.lock = threading.RLock()
+
+        self.load()
+        atexit.register(self.save)
+
+    def load(self) -> None:
+        """
+        Load index from file, if any.
+        """
+
+        if(not os.path.exists(self.indexPath)):
+            return
+
+        try:
+            with open(self.indexPath, "r", encoding = "utf-8") as file:
+                data = json.load(file)
+            streams = data["streams"]
+            position = data["position"]
+        except (OSError, ValueError, KeyError):
+            # Index is rebuilt from the QueueStreams when synced
+            return
+
+        with self.lock:
+            self.streams = streams
+            self.position = position
+
+    def save(self) -> None:
+        """
+        Save index to file, if changed since last save.
+        """
+
+        with self.lock:
+            if(not self.dirty):
+                return
+
+            directory = os.path.dirname(self.indexPath)
+            if(directory):
+                os.makedirs(directory, exist_ok = True)
+
+            tempPath = self.indexPath + ".tmp"
+            with open(tempPath, "w", encoding = "utf-8") as file:
+                json.dump({"position": self.position, "streams": self.streams}, file)
+            os.replace(tempPath, self.indexPath)
+            self.dirty = False
+
+    def sync(self, signatures: Dict[str, tuple], getStreams: Callable, position: object = None) -> int:
+        """
+        Bring index up to date with every stored QueueStream, re-reading only QueueStreams changed since they were indexed, e.g. when changes since the index was last synced are not known.
+
+        Args:
+            signatures (Dict[str, tuple | None]): Signature (e.g. modified time and size of file) of every stored QueueStream by ID, None if unknown.
+            getStreams (Callable): Function getting QueueStreams, including soft-deleted, by a list of IDs.
+            position (object, optional): Position in the changes of QueueStreams taken before signatures, saved with the index. Defaults to None.
+
+        Returns:
+            int: Number of QueueStreams re-indexed or removed from index.
+        """
+
+        with self.lock:
+            self.setPosition(position)
+            removedIds = [_ for _ in self.streams.keys() if _ not in signatures]
+            for streamId in removedIds:
+                self.removeStream(streamId)
+
+            changedIds = []
+            for streamId, signature in signatures.items():
+                entry = self.streams.get(streamId)
+                if(entry == None or signature == None or entry["signature"] != list(signature)):
+                    changedIds.append(streamId)
+
+            for streamId, stream in zip(changedIds, getStreams(changedIds)):
+                if(stream == None):
+                    self.removeStream(streamId)
+                else:
+                    self.setStream(stream, signatures[streamId])
+
+        self.save()
+        return len(removedIds) + len(changedIds)
+
+    def syncChanged(self, changedIds: List[str], getStreams: Callable, getSignature: Callable, position: object) -> int:
+        """
+        Bring index up to date with QueueStreams changed since the index was last synced, reading only those.
+
+        Args:
+            changedIds (List[str]): IDs of QueueStreams added, changed, or removed since position index was last synced at.
+            getStreams (Callable): Function getting QueueStreams, including soft-deleted, by a list of IDs, None where a QueueStream was not found.
+            getSignature (Callable): Function getting signature of a stored QueueStream by ID.
+            position (object): Current position in the changes of QueueStreams, saved with the index.
+
+        Returns:
+            int: Number of QueueStreams re-indexed or removed from index.
+        """
+
+        with self.lock:
+            self.setPosition(position)
+            for streamId, stream in zip(changedIds, getStreams(changedIds)):
+                if(stream == None):
+                    self.removeStream(streamId)
+                else:
+                    self.setStream(stream, getSignature(streamId))
+
+        self.save()
+        return len(changedIds)
+
+    def setPosition(self, position: object) -> None:
+        with self.lock:
+            if(self.position != position):
+                self.position = position
+                self.dirty = True
+
+    def setStream(self, stream: object, signature: tuple = None) -> None:
+        """
+        Index watched and deleted state of QueueStream.
+
+        Args:
+            stream (QueueStream): QueueStream to index.
+            signature (tuple, optional): Signature of the stored QueueStream. Defaults to None.
+        """
+
+        entry = {
+            "signature": list(signature) if(signature != None) else None,
+            "watched": stream.watched != None,
+            "deleted": stream.deleted != None,
+            "watchedAt": str(stream.watched) if(stream.watched != None) else None,
+            "deletedAt": str(stream.deleted) if(stream.deleted != None) else None}
+        with self.lock:
+            self.streams[stream.id] = entry
+            self.dirty = True
+
+    def removeStream(self, streamId: str) -> None:
+        """
+        Remove QueueStream from index.
+
+        Args:
+            streamId (str): ID of QueueStream to remove.
+        """
+
+        with self.lock:
+            if(self.streams.pop(streamId, None) != None):
+                self.dirty = True
+
+    def getEntry(self, streamId: str) -> dict:
+        """
+        Get indexed state of QueueStream.
+
+        Args:
+            streamId (str): ID of QueueStream.
+
+        Returns:
+            dict | None: Copy of entry with watched and deleted state and timestamps, None if QueueStream is not in index.
+        """
+
+        with self.lock:
+            entry = self.streams.get(streamId)
+            return dict(entry) if(entry != None) else None
+
+    def contains(self, streamId: str) -> bool:
+        with self.lock:
+            return streamId in self.streams
+
+    def isWatched(self, streamId: str, signature: tuple = None) -> bool:
+        """
+        Get watched state of QueueStream.
+
+        Args:
+            streamId (str): ID of QueueStream.
+            signature (tuple, optional): Current signature of the stored QueueStream, an entry indexed with another signature is outdated. Defaults to None, not checked.
+
+        Returns:
+            bool | None: Watched state, None if QueueStream is not in index or the entry is outdated.
+        """
+
+        with self.lock:
+            entry = self.streams.get(streamId)
+            if(entry == None or (signature != None and entry["signature"] != list(signature))):
+                return None
+
+            return entry["watched"]
+
+    def isPlayable(self, streamId: str, includeWatched: bool = False) -> bool:
+        """
+        Check if QueueStream exists, is not soft-deleted, and is not watched.
+
+        Args:
+            streamId (str): ID of QueueStream.
+            includeWatched (bool, optional): Watched QueueStreams are playable. Defaults to False.
+
+        Returns:
+            bool: Result.
+        """
+
+        with self.lock:
+            entry = self.streams.get(streamId)
+            return entry != None and not entry["deleted"] and (includeWatched or not entry["watched"])
@@ -0,0 +1,135 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import textwrap
+import unittest
+
+rootPath = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, rootPath)
+
+from storage.EntityJournal import EntityJournal
+
+
+class Item():
+    def __init__(self, id: str = None, value: int = None):
+        self.id = id
+        self.value = value
+
+
+def writeItem(item: Item, storagePath: str) -> None:
+    with open(os.path.join(storagePath, f"{item.id}.json"), "w", encoding = "utf-8") as file:
+        json.dump(item.__dict__, file)
+
+
+processScript = textwrap.dedent("""
+    import json, os, sys
+    sys.path.insert(0, sys.argv[1])
+    from storage.EntityJournal import EntityJournal
+
+    class Item():
+        def __init__(self, id = None, value = None):
+            self.id = id
+            self.value = value
+
+    def writeItem(item):
+        with open(os.path.join(sys.argv[3], item.id + ".json"), "w", encoding = "utf-8") as file:
+            json.dump(item.__dict__, file)
+
+    journal = EntityJournal(sys.argv[2], compactSeconds = 0)
+    journal.register(sys.argv[3], Item, writeItem)
+    seen = journal.get(os.path.join(sys.argv[3], "x.json"))
+    print(json.dumps(seen.value if(seen != None) else None), flush = True)
+    if(sys.argv[4] == "crash"):
+        journal.append(os.path.join(sys.argv[3], "y.json"), Item("y", 2))
+        # Killed without closing, leaving its journal behind
+        os._exit(0)
+    journal.close()
+""")
+
+
+class TestEntityJournal(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.journalPath = os.path.join(self.directory.name, "journal.jsonl")
+        self.storagePath = os.path.join(self.directory.name, "Item")
+        os.makedirs(self.storagePath)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def getPath(self, id: str) -> str:
+        return os.path.join(self.storagePath, f"{id}.json")
+
+    def runProcess(self, mode: str) -> object:
+        result = subprocess.run([sys.executable, "-c", processScript, rootPath, self.journalPath, self.storagePath, mode], capture_output = True, text = True, check = True)
+        return json.loads(result.stdout.strip().splitlines()[-1])
+
+    def readItem(self, id: str) -> dict:
+        with open(self.getPath(id), "r", encoding = "utf-8") as file:
+            return json.load(file)
+
+    def test_twoProcessesOnSamePath(self):
+        journal = EntityJournal(self.journalPath, compactSeconds = 0)
+        journal.register(self.storagePath, Item, lambda _: writeItem(_, self.storagePath))
+        journal.append(self.getPath("x"), Item("x", 1))
+
+        # Second process sees pending update of first, and leaves its journal behind
+        self.assertEqual(self.runProcess("crash"), 1)
+        self.assertIn(self.getPath("x"), journal.readRecords(journal.journalPath))
+        self.assertFalse(os.path.exists(self.getPath("x")))
+
+        # First process still appends to its own journal, and sees pending update of second
+        journal.othersRefreshed = 0.0
+        self.assertEqual(journal.get(self.getPath("y")).value, 2)
+        journal.append(self.getPath("z"), Item("z", 3))
+        records = journal.readRecords(journal.journalPath)
+        self.assertEqual(records[self.getPath("x")]["data"]["value"], 1)
+        self.assertEqual(records[self.getPath("z")]["data"]["value"], 3)
+
+        # Third process replays journal of second, but not of first which is still running
+        self.assertEqual(self.runProcess("close"), 1)
+        self.assertEqual(self.readItem("y")["value"], 2)
+        self.assertFalse(os.path.exists(self.getPath("x")))
+        self.assertEqual(list(journal.getJournalPaths().keys()), [os.getpid()])
+
+        journal.close()
+        self.assertEqual(self.readItem("x")["value"], 1)
+        self.assertEqual(self.readItem("z")["value"], 3)
+        self.assertFalse(os.path.exists(journal.journalPath))
+
+    def test_writtenDirectlyHidesOtherProcess(self):
+        journal = EntityJournal(self.journalPath, compactSeconds = 0)
+        journal.register(self.storagePath, Item, lambda _: writeItem(_, self.storagePath))
+
+        self.runProcess("crash")
+        journal.othersRefreshed = 0.0
+        self.assertEqual(journal.get(self.getPath("y")).value, 2)
+
+        journal.discard(self.getPath("y"))
+        writeItem(Item("y", 5), self.storagePath)
+        self.assertIsNone(journal.get(self.getPath("y")))
+        journal.close()
+
+    def test_replayDoesNotRevertNewerWrite(self):
+        # First process journals y and is killed, y is then written directly, replay by a third process must keep the direct write
+        self.runProcess("crash")
+        writeItem(Item("y", 5), self.storagePath)
+
+        self.runProcess("close")
+        self.assertEqual(self.readItem("y")["value"], 5)
+        self.assertEqual(len(os.listdir(self.directory.name)), 2)
+
+    def test_replayMergesJournalsByTime(self):
+        # Journals of two processes no longer running, the latest record wins regardless of which journal is read first
+        for pid, value, recordTime in [(999999998, 7, 2), (999999999, 6, 1)]:
+            with open(os.path.join(self.directory.name, f"journal.{pid}.jsonl"), "w", encoding = "utf-8") as file:
+                file.write(json.dumps({"path": self.getPath("y"), "data": {"id": "y", "value": value}, "time": recordTime, "signature": None}) + "\n")
+
+        self.runProcess("close")
+        self.assertEqual(self.readItem("y")["value"], 7)
+
+
+if __name__ == "__main__":
+    unittest.main()
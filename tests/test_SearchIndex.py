@@ -0,0 +1,45 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from storage.SearchIndex import SearchIndex
+
+
+class TestSearchIndex(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.index = SearchIndex(os.path.join(self.directory.name, "SearchIndex.json"))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_plainTermAfterTextChangingLengthWhenLowered(self):
+        # "İ".lower() is two characters, positions in lowered text would map to later entities
+        self.index.setEntity("a", ["İ" * 40, "u"], False)
+        self.index.setEntity("b", ["foo", "u"], False)
+        self.index.setEntity("c", ["bar", "u"], False)
+
+        self.assertEqual(self.index.search("foo"), ["b"])
+        self.assertEqual(self.index.search("FOO"), ["b"])
+        self.assertEqual(self.index.search("u"), ["a", "b", "c"])
+
+    def test_regexTermMatchesFieldsOnly(self):
+        self.index.setEntity("a", ["foo", "bar"], False)
+        self.index.setEntity("b", ["foo bar", "baz"], False)
+
+        # Matches across the fields of a, one field per line, but not in a field
+        self.assertEqual(self.index.search("foo\\sbar"), ["b"])
+
+    def test_softDeleted(self):
+        self.index.setEntity("a", ["foo"], True)
+        self.index.setEntity("b", ["foo"], False)
+
+        self.assertEqual(self.index.search("foo"), ["b"])
+        self.assertEqual(self.index.search("foo", includeSoftDeleted = True), ["a", "b"])
+
+
+if __name__ == "__main__":
+    unittest.main()